@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Ajuste la gestion des connexions MySQL pour ASGI (voir DB_CONN_MAX_AGE).
+os.environ.setdefault('DJANGO_SERVER_GATEWAY', 'asgi')
 
 application = get_asgi_application()
+
+# Tâches de maintenance périodiques dans le processus web (SCHEDULER_ENABLED,
+# voir demandes/scheduler.py).
+from demandes.scheduler import scheduler  # noqa: E402
+
+scheduler.start()
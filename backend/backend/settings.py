@@ -10,8 +10,14 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+from dotenv import load_dotenv
+
+load_dotenv()  # Charge les variables du .env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,6 +52,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'demandes.middleware.ProfilingMiddleware',
+    'demandes.middleware.CompressionMiddleware',
+    'demandes.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,6 +88,19 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Connexions persistantes : chaque worker WSGI garde sa connexion MySQL
+# DB_CONN_MAX_AGE secondes au lieu d'en ouvrir une par requête, et la
+# vérifie avant réutilisation (CONN_HEALTH_CHECKS). Sous ASGI (voir asgi.py),
+# les vues async ouvrent leurs connexions dans des threads éphémères : on
+# désactive donc la persistance par défaut et le nombre de connexions est
+# borné par ASGI_THREADS ; un pooler externe (ProxySQL) peut prendre le relais.
+SERVER_GATEWAY = os.getenv('DJANGO_SERVER_GATEWAY', 'wsgi')
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '0' if SERVER_GATEWAY == 'asgi' else '60'))
+
+# Sous ASGI, les lectures les plus fréquentes sont servies par des vues async
+# (demandes/async_views.py) au lieu d'occuper un thread pendant toute la vue.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', '1' if SERVER_GATEWAY == 'asgi' else '0') == '1'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.mysql',
@@ -87,8 +109,12 @@ DATABASES = {
         'PASSWORD': '',
         'HOST': 'localhost',
         'PORT': '3306',
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
         'OPTIONS': {
-            'init_command': "SET default_storage_engine=INNODB; SET GLOBAL innodb_default_row_format='DYNAMIC';",
+            # Le réglage global innodb_default_row_format est appliqué une
+            # seule fois par la migration 0002, pas à chaque connexion.
+            'init_command': "SET default_storage_engine=INNODB",
         }
     }
 }
@@ -158,14 +184,165 @@ SIMPLE_JWT = {
 }
 
 CORS_ALLOW_ALL_ORIGINS = True  
-
-# backend/settings.py
-from dotenv import load_dotenv
-import os
-load_dotenv()  # Charge les variables du .env
+# En-tête envoyé par le frontend sur les créations (demandes/idempotency.py).
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
+
+# Compression des réponses (demandes.middleware.CompressionMiddleware) :
+# encodages par ordre de préférence, ignorés si le module n'est pas installé
+# (br : brotli, zstd : zstandard).
+COMPRESSION_ENCODINGS = ['zstd', 'br', 'gzip']
+COMPRESSION_LEVELS = {'zstd': 3, 'br': 5, 'gzip': 6}
+COMPRESSION_MIN_SIZE = 1024
+
+# Cache du détail des demandes : LRU par processus, plus un cache Django
+# partagé si un alias est donné (ex. 'default' avec Redis ou Memcached).
+REQUEST_DETAIL_CACHE_SIZE = 2048
+REQUEST_DETAIL_CACHE_ALIAS = os.getenv('REQUEST_DETAIL_CACHE_ALIAS') or None
+REQUEST_DETAIL_CACHE_TIMEOUT = 3600
+# Durée de vie d'une entrée du LRU local : sans cache partagé, délai maximal
+# avant qu'un processus voie une modification faite par un autre.
+REQUEST_DETAIL_CACHE_LOCAL_TTL = 5
+
+# Archivage des demandes résolues ou rejetées (commande archive_requests).
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 180))
+ARCHIVE_BATCH_SIZE = 500
+
+# Rétention (commande apply_retention).
+NOTIFICATION_RETENTION_PER_USER = 200
+NOTIFICATION_READ_RETENTION_DAYS = 90
+AI_HISTORY_COMPACT_AFTER_DAYS = 30
+AI_HISTORY_COMPACT_MAX_CHARS = 4000
+RETENTION_BATCH_SIZE = 1000
+
+# Suppressions différées (deletion.py) : taille des lots, et purge dans un
+# thread du processus web (sinon, uniquement via la commande purge_deleted).
+DELETION_BATCH_SIZE = 500
+DELETION_IN_PROCESS = True
+
+# Planificateur intégré (demandes/scheduler.py, tâches dans demandes/jobs.py) :
+# démarré par wsgi.py / asgi.py, une seule exécution par tâche tous workers
+# confondus. Sans lui, la commande run_scheduler tourne dans un processus dédié.
+# SCHEDULER_JOBS remplace la planification d'une tâche (secondes ou expression
+# cron, None pour la désactiver), ex. {'apply_retention': '0 4 * * *'}.
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', '1') == '1'
+SCHEDULER_TICK = 30
+SCHEDULER_LOCK_TIMEOUT = 3600
+SCHEDULER_HISTORY_SIZE = 100
+SCHEDULER_JOBS = {}
+
+# Idempotency-Key (demandes/idempotency.py) : durée de conservation des
+# réponses rejouables, et délai après lequel une réservation restée en cours
+# (processus arrêté) peut être reprise.
+IDEMPOTENCY_KEY_TTL = 86400
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+# /api/batch/ : nombre de sous-requêtes par lot et threads pour les lectures parallèles.
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+# Durée de conservation des traces de suppression du flux /api/changes/ ;
+# un curseur plus ancien impose une resynchronisation complète (410).
+TOMBSTONE_RETENTION_DAYS = 30
+# Fenêtre relue par le flux de changements derrière le dernier curseur :
+# durée maximale d'une transaction entre le calcul d'updated_at et son commit.
+CHANGES_OVERLAP_SECONDS = 5
+
+# Budgets de requêtes SQL par vue (demandes/query_budget.py) :
+# 'raise' en test, 'warn' en développement, 'off' en production.
+QUERY_BUDGET_MODE = 'warn' if DEBUG else 'off'
+QUERY_BUDGET_MAX_REPEATS = 5
+
+# Profilage à la demande (demandes/profiling.py), désactivé par défaut : jeton
+# signé valable PROFILING_TOKEN_MAX_AGE secondes, signataire revérifié comme
+# admin actif toutes les PROFILING_ADMIN_CHECK_SECONDS secondes au plus, au plus
+# PROFILING_MAX_CONCURRENT requêtes profilées à la fois, PROFILING_MAX_FILES
+# profils conservés dans PROFILING_DIR.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '0') == '1'
+PROFILING_DIR = os.getenv('PROFILING_DIR', BASE_DIR / 'profiles')
+PROFILING_TOKEN_MAX_AGE = 600
+PROFILING_ADMIN_CHECK_SECONDS = 60
+PROFILING_MAX_CONCURRENT = 1
+PROFILING_MAX_FILES = 50
+PROFILING_TOP_FUNCTIONS = 30
+
+# Journalisation JSON (demandes/log.py) : la vue pose l'enregistrement dans
+# une file, un thread l'écrit sur stderr. LOGGING_SAMPLING garde une fraction
+# des enregistrements sous WARNING, par logger (le plus proche parent listé).
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO')
+LOGGING_SAMPLING = {
+    'demandes.views': float(os.getenv('LOG_SAMPLING_VIEWS', 1.0)),
+}
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'sampling': {'()': 'demandes.log.SamplingFilter', 'rates': LOGGING_SAMPLING},
+    },
+    'handlers': {
+        'queue': {
+            'class': 'demandes.log.QueueingHandler',
+            'maxsize': 10000,
+            'filters': ['sampling'],
+        },
+    },
+    'root': {'handlers': ['queue'], 'level': 'WARNING'},
+    'loggers': {
+        'django': {'handlers': ['queue'], 'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO'), 'propagate': False},
+        'demandes': {'handlers': ['queue'], 'level': LOG_LEVEL, 'propagate': False},
+    },
+}
 
 MISTRAL_API_KEY = os.getenv('MISTRAL_API_KEY')
 
-
-
-
+# Index FAQ de l'assistant (demandes/faq_index.py) : au-delà de
+# FAQ_MIN_SIMILARITY (cosinus), la réponse vient d'une demande résolue
+# sans appel à Mistral. L'index est reconstruit après FAQ_INDEX_MAX_AGE secondes.
+FAQ_INDEX_ENABLED = True
+FAQ_MIN_SIMILARITY = float(os.getenv('FAQ_MIN_SIMILARITY', 0.5))
+FAQ_INDEX_DIMENSIONS = 256
+FAQ_INDEX_MAX_DOCUMENTS = 20000
+FAQ_INDEX_MAX_AGE = 3600
+
+# Doublons (demandes/duplicates.py) : signature MinHash découpée en bandes
+# LSH ; similarité de Jaccard estimée minimale pour signaler un doublon.
+DUPLICATE_INDEX_ENABLED = True
+DUPLICATE_SIGNATURE_SIZE = 64
+DUPLICATE_LSH_BANDS = 16
+DUPLICATE_MIN_SIMILARITY = 0.5
+DUPLICATE_INDEX_MAX_AGE = 3600
+
+# Classement automatique (demandes/classifier.py, commandes train_classifier
+# et classify_requests) : une catégorie n'est attribuée qu'au-delà de
+# CLASSIFIER_MIN_CONFIDENCE.
+CLASSIFIER_MODEL_PATH = os.getenv('CLASSIFIER_MODEL_PATH', BASE_DIR / 'classifier.npz')
+CLASSIFIER_FEATURES = 2 ** 16
+CLASSIFIER_ALPHA = 0.1
+CLASSIFIER_MIN_CONFIDENCE = 0.6
+
+# File de travail des admins (demandes/priority.py, /api/queue/, commande
+# refresh_priorities). Points par jour d'ancienneté et bonus tant que la
+# demande est en attente, multipliés par Category.priority_weight ; points
+# par avis mécontent du client et par étoile manquante de l'avis d'une
+# demande rouverte. Une prise en charge expire après PRIORITY_CLAIM_TTL secondes.
+PRIORITY_AGE_WEIGHT = 1.0
+PRIORITY_WAITING_BONUS = 2.0
+PRIORITY_CLIENT_WEIGHT = 3.0
+PRIORITY_CLIENT_MAX_FEEDBACKS = 3
+PRIORITY_UNHAPPY_RATING = 2
+PRIORITY_FEEDBACK_WEIGHT = 2.0
+PRIORITY_CLAIM_TTL = 900
+PRIORITY_QUEUE_MAX_LIMIT = 50
+
+
+# Réplicas MySQL en lecture, ex. DB_REPLICA_HOSTS="10.0.0.2,10.0.0.3".
+# Les lectures des requêtes GET y sont envoyées par demandes.routers.ReplicaRouter ;
+# après une écriture, le client reste sur 'default' pendant REPLICA_PIN_SECONDS.
+DATABASE_REPLICAS = []
+for index, host in enumerate(h.strip() for h in os.getenv('DB_REPLICA_HOSTS', '').split(',') if h.strip()):
+    alias = f'replica{index + 1}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['demandes.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = 5
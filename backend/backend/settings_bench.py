@@ -0,0 +1,19 @@
+"""
+Settings for local benchmarks (generate_synthetic_data, benchmark_api):
+a file-based SQLite database and no query-budget instrumentation.
+"""
+
+from .settings_test import *  # noqa: F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ['localhost', 'testserver']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_bench.sqlite3',
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+QUERY_BUDGET_MODE = 'off'
@@ -0,0 +1,30 @@
+"""
+Settings used by the test suite: SQLite instead of MySQL, fast hashing and
+strict query budgets.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_test.sqlite3',
+    },
+    # Seconde base SQLite pour tester le routage vers les répliques ;
+    # activée au cas par cas avec override_settings(DATABASE_REPLICAS=['replica']).
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_test_replica.sqlite3',
+    },
+}
+DATABASE_REPLICAS = []
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+QUERY_BUDGET_MODE = 'raise'
+
+# Les tests appellent deletion.purge_pending() explicitement.
+DELETION_IN_PROCESS = False
+
+# Les tests appellent scheduler.run_pending() / run_now() explicitement.
+SCHEDULER_ENABLED = False
@@ -14,9 +14,10 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from demandes.views import AIAssistantView, AIAssistantHistoryView, RequestUpdateView, LoginView,NotificationListView, UserProfileView, UserListCreateView, UserDetailView, RegisterView,ChangePasswordView,  logout_view,RequestDeleteView,  RequestViewSet, CreateRequestAPIView,add_feedback, get_request_by_id,UpdateRequestStatusView,CustomTokenObtainPairView,StatsView, get_all_requests, FeedbackListView
+from demandes.views import AIAssistantView, AIAssistantHistoryView, RequestUpdateView, LoginView,NotificationListView, UserProfileView, UserListCreateView, UserDetailView, RegisterView,ChangePasswordView,  logout_view,RequestDeleteView,  RequestViewSet, CreateRequestAPIView,add_feedback, get_request_by_id,UpdateRequestStatusView,CustomTokenObtainPairView,StatsView, SLAStatsView, CompressionStatsView, ChangesView, RequestHistoryView, NotificationHistoryView, FeedbackSummaryView, BatchView, DuplicateClustersView, CategoryListView, QueueView, ProfileTokenView, ProfileListView, ProfileDownloadView, JobListView, JobRunListView, get_all_requests, FeedbackListView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 urlpatterns = [
@@ -26,6 +27,8 @@ urlpatterns = [
     path('api/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/register/', RegisterView.as_view()),
     path('api/requests/all/', get_all_requests, name='get_all_requests'),
+    path('api/requests/history/', RequestHistoryView.as_view(), name='request-history'),
+    path('api/requests/duplicates/', DuplicateClustersView.as_view(), name='request-duplicates'),
     path('api/requests/', RequestViewSet.as_view({'get': 'list', 'post': 'create'}), name='request-list'),
     path('api/requests/<int:request_id>/status/', UpdateRequestStatusView.as_view(), name='update-request-status'),
     path('api/requests/<int:request_id>/feedback/', add_feedback, name='add-feedback'),
@@ -35,14 +38,33 @@ urlpatterns = [
     path('notifications/', NotificationListView.as_view(), name='notification-list'),
     path('notifications/<int:pk>/read/', NotificationListView.as_view(), name='notification-mark-read'),
     path('notifications/<int:pk>/', NotificationListView.as_view(), name='notification-detail'),
+    path('notifications/history/', NotificationHistoryView.as_view(), name='notification-history'),
+    path('api/categories/', CategoryListView.as_view(), name='category-list'),
+    path('api/queue/', QueueView.as_view(), name='queue'),
+    path('api/queue/<int:request_id>/', QueueView.as_view(), name='queue-release'),
     path('api/feedbacks/', FeedbackListView.as_view(), name='feedback-list'),
+    path('api/feedbacks/summary/', FeedbackSummaryView.as_view(), name='feedback-summary'),
+    path('api/changes/', ChangesView.as_view(), name='changes'),
+    path('api/batch/', BatchView.as_view(), name='batch'),
     path('api/users/me/', UserProfileView.as_view(), name='user-profile'),
     path('api/users/', UserListCreateView.as_view(), name='user-list-create'),
     path('api/users/<int:pk>/', UserDetailView.as_view(), name='user-detail'),
     path('api/change-password/', ChangePasswordView.as_view(), name='change-password'),
     path('api/requests/create/', CreateRequestAPIView.as_view(), name='create-request'),
     path('api/stats/', StatsView.as_view(), name='stats'),
+    path('api/stats/sla/', SLAStatsView.as_view(), name='stats-sla'),
+    path('api/profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('api/profiles/token/', ProfileTokenView.as_view(), name='profile-token'),
+    path('api/profiles/<str:profile_id>/', ProfileDownloadView.as_view(), name='profile-download'),
+    path('api/jobs/', JobListView.as_view(), name='job-list'),
+    path('api/jobs/<str:name>/runs/', JobRunListView.as_view(), name='job-runs'),
+    path('api/metrics/compression/', CompressionStatsView.as_view(), name='compression-stats'),
     path('api/logout/', logout_view),
     path('api/ai-assistant/', AIAssistantView.as_view(), name='ai_assistant'),
     path('api/ai-assistant/history/', AIAssistantHistoryView.as_view(), name='ai_assistant_history'),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    from demandes.async_views import urlpatterns as async_urlpatterns
+
+    urlpatterns = async_urlpatterns + urlpatterns
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Tâches de maintenance périodiques dans le processus web (SCHEDULER_ENABLED,
+# voir demandes/scheduler.py).
+from demandes.scheduler import scheduler  # noqa: E402
+
+scheduler.start()
@@ -0,0 +1,17 @@
+import pytest
+
+from demandes.query_budget import QueryBudget
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Fabrique de budgets stricts pour les tests :
+
+        def test_list(client, query_budget):
+            with query_budget(max_queries=2, max_repeats=1):
+                client.get('/api/requests/')
+    """
+    def make(max_queries=None, max_repeats=None):
+        return QueryBudget(max_queries=max_queries, max_repeats=max_repeats, mode='raise')
+    return make
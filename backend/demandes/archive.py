@@ -0,0 +1,213 @@
+"""
+Archivage des demandes résolues ou rejetées depuis plus de
+``ARCHIVE_AFTER_DAYS`` jours.
+
+Chaque lot est déplacé dans une transaction : copie vers ArchivedRequest /
+ArchivedNotification, traces de suppression pour /api/changes/, totaux
+ajoutés à StatsRollup, puis suppression directe des lignes chaudes (sans
+passer par le collecteur de Django, qui chargerait chaque objet pour
+envoyer ses signaux). Les lectures passent par ``request_detail`` et
+``history`` qui couvrent les deux tables.
+"""
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import categories
+from .fast_serializers import (
+    RequestReadSerializer, NotificationReadSerializer,
+    ArchivedRequestReadSerializer, ArchivedNotificationReadSerializer,
+)
+from .models import (
+    Request, Feedback, Notification, RequestStatusEvent, Tombstone,
+    ArchivedRequest, ArchivedNotification, StatsRollup,
+)
+from .signals import invalidate_request_details
+
+ARCHIVABLE_STATUSES = ('resolue', 'rejetee')
+
+REQUEST_FIELDS = (
+    'id', 'user_id', 'status', 'category_id', 'admin_comment', 'title', 'description',
+    'created_at', 'updated_at', 'resolved_at', 'rating',
+)
+FEEDBACK_FIELDS = ('feedback__id', 'feedback__rating', 'feedback__comment', 'feedback__created_at', 'feedback__user__username')
+
+
+def cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'ARCHIVE_AFTER_DAYS', 180)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable(before):
+    return Request.objects.filter(status__in=ARCHIVABLE_STATUSES, updated_at__lt=before)
+
+
+def archive_batch(before, batch_size=None):
+    """Archive au plus ``batch_size`` demandes ; renvoie (demandes, notifications) déplacées."""
+    batch_size = batch_size or getattr(settings, 'ARCHIVE_BATCH_SIZE', 500)
+    with transaction.atomic():
+        # skip_locked : deux archivages concurrents se partagent les lignes.
+        ids = list(
+            archivable(before).order_by('updated_at')
+            .select_for_update(skip_locked=True)
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0, 0
+
+        history = {}
+        for request_id, *event in RequestStatusEvent.objects.filter(request_id__in=ids).order_by('created_at').values_list(
+            'request_id', 'from_status', 'to_status', 'actor_id', 'created_at', 'seconds_in_previous',
+        ):
+            history.setdefault(request_id, []).append(event)
+
+        archived, rollup = [], {}
+        for row in Request.objects.filter(pk__in=ids).values(*REQUEST_FIELDS, *FEEDBACK_FIELDS):
+            feedback = None
+            if row['feedback__id'] is not None:
+                feedback = {
+                    'id': row['feedback__id'],
+                    'rating': row['feedback__rating'],
+                    'comment': row['feedback__comment'],
+                    'created_at': row['feedback__created_at'],
+                    'request_id': row['id'],
+                    'request_title': row['title'],
+                    'client_name': row['feedback__user__username'],
+                }
+            archived.append(ArchivedRequest(
+                **{field: row[field] for field in REQUEST_FIELDS},
+                feedback=feedback,
+                status_history=history.get(row['id'], []),
+            ))
+
+            totals = rollup.setdefault(row['status'], {
+                'archived_requests': 0, 'archived_notifications': 0, 'resolved_requests': 0,
+                'resolution_seconds': 0.0, 'rating_count': 0, 'rating_sum': 0,
+            })
+            totals['archived_requests'] += 1
+            if row['status'] == 'resolue' and row['resolved_at'] is not None:
+                totals['resolved_requests'] += 1
+                totals['resolution_seconds'] += (row['resolved_at'] - row['created_at']).total_seconds()
+            if feedback is not None:
+                totals['rating_count'] += 1
+                totals['rating_sum'] += feedback['rating']
+
+        statuses = {request.id: request.status for request in archived}
+        notifications = [
+            ArchivedNotification(**row)
+            for row in Notification.objects.filter(request_id__in=ids).values(
+                'id', 'user_id', 'request_id', 'message', 'is_read', 'created_at',
+            )
+        ]
+        for notification in notifications:
+            rollup[statuses[notification.request_id]]['archived_notifications'] += 1
+
+        ArchivedRequest.objects.bulk_create(archived)
+        ArchivedNotification.objects.bulk_create(notifications)
+        # Les notifications disparaissent avec la trace de leur demande.
+        Tombstone.objects.bulk_create(
+            Tombstone(model='request', object_id=request.id, owner_id=request.user_id) for request in archived
+        )
+        for model in (Notification, RequestStatusEvent, Feedback):
+            queryset = model.objects.filter(request_id__in=ids)
+            queryset._raw_delete(queryset.db)
+        queryset = Request.objects.filter(pk__in=ids)
+        categories.remove_requests(queryset)
+        queryset._raw_delete(queryset.db)
+
+        for status_name, totals in rollup.items():
+            StatsRollup.objects.get_or_create(status=status_name)
+            StatsRollup.objects.filter(status=status_name).update(
+                **{field: F(field) + value for field, value in totals.items()}
+            )
+        invalidate_request_details(*ids)
+    return len(archived), len(notifications)
+
+
+def archive(before=None, batch_size=None, limit=None):
+    """Archive par lots jusqu'à épuisement (ou ``limit`` demandes) ; renvoie les totaux."""
+    before = before or cutoff()
+    moved_requests = moved_notifications = 0
+    while limit is None or moved_requests < limit:
+        size = batch_size or getattr(settings, 'ARCHIVE_BATCH_SIZE', 500)
+        if limit is not None:
+            size = min(size, limit - moved_requests)
+        requests, notifications = archive_batch(before, size)
+        if not requests:
+            break
+        moved_requests += requests
+        moved_notifications += notifications
+    return moved_requests, moved_notifications
+
+
+def request_detail(pk):
+    """Détail d'une demande archivée, même forme que RequestSerializer, ou None."""
+    rows = ArchivedRequestReadSerializer.serialize(ArchivedRequest.objects.filter(pk=pk))
+    if not rows:
+        return None
+    return {**rows[0], 'archived': True}
+
+
+async def arequest_detail(pk):
+    rows = await ArchivedRequestReadSerializer.aserialize(ArchivedRequest.objects.filter(pk=pk))
+    if not rows:
+        return None
+    return {**rows[0], 'archived': True}
+
+
+def _before(before):
+    """Lignes avant la position ``before`` : (date, id), ou (date, None) pour tout ce qui précède la date."""
+    moment, pk = before
+    if pk is None:
+        return Q(created_at__lt=moment)
+    return Q(created_at__lt=moment) | Q(created_at=moment, id__lt=pk)
+
+
+def _merged(hot, archived, limit):
+    # Deux listes déjà triées par (date, id) décroissants : fusion puis coupe.
+    # Une ligne garde son id en passant aux archives : l'ordre est le même partout.
+    rows = heapq.merge(
+        ({**row, 'archived': False} for row in hot),
+        ({**row, 'archived': True} for row in archived),
+        key=lambda row: (row['created_at'], row['id']), reverse=True,
+    )
+    return [row for row, _ in zip(rows, range(limit))]
+
+
+def history(user=None, before=None, limit=100):
+    """Demandes chaudes et archivées (de ``user`` si donné), les plus récentes d'abord."""
+    hot, archived = Request.objects.all(), ArchivedRequest.objects.all()
+    if user is not None:
+        hot, archived = hot.filter(user=user), archived.filter(user=user)
+    if before is not None:
+        hot, archived = hot.filter(_before(before)), archived.filter(_before(before))
+    return _merged(
+        RequestReadSerializer.serialize(hot.order_by('-created_at', '-id')[:limit]),
+        ArchivedRequestReadSerializer.serialize(archived.order_by('-created_at', '-id')[:limit]),
+        limit,
+    )
+
+
+def notification_history(user, before=None, limit=100):
+    hot, archived = Notification.objects.filter(user=user), ArchivedNotification.objects.filter(user=user)
+    if before is not None:
+        hot, archived = hot.filter(_before(before)), archived.filter(_before(before))
+    return _merged(
+        NotificationReadSerializer.serialize(hot.order_by('-created_at', '-id')[:limit]),
+        ArchivedNotificationReadSerializer.serialize(archived.order_by('-created_at', '-id')[:limit]),
+        limit,
+    )
+
+
+def rollup_totals():
+    """{statut: totaux archivés} pour compléter les agrégats de StatsView."""
+    return {row['status']: row for row in StatsRollup.objects.values()}
+
+
+async def arollup_totals():
+    return {row['status']: row async for row in StatsRollup.objects.values()}
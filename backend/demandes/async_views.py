@@ -0,0 +1,216 @@
+"""
+Vues async des endpoints de lecture les plus appelés, servies sous ASGI
+(``ASYNC_READ_VIEWS``, activé par défaut quand ``SERVER_GATEWAY == 'asgi'``).
+
+DRF n'a pas de vues async : ces vues authentifient elles-mêmes le JWT,
+comme JWTAuthentication (une requête SQL pour l'utilisateur), lisent avec
+l'ORM async et rendent avec ORJSONRenderer. Les réponses ont la même forme
+que celles des vues DRF de views.py.
+
+``read_view`` sert GET avec la vue async et passe les autres méthodes à la
+vue synchrone d'origine : POST /api/requests/ reste RequestViewSet.create.
+Avec les middlewares du projet capables d'async (middleware.py), une requête
+GET ne passe plus par un thread le temps de toute la vue, seulement le temps
+de chaque requête SQL.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Sum
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.urls import path
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import archive, feedback_stats, routers, views
+from .detail_cache import request_details
+from .fast_serializers import AIConversationReadSerializer, NotificationReadSerializer, RequestReadSerializer
+from .models import AIConversation, Notification, Request
+from .query_budget import query_budget
+from .renderers import ORJSONRenderer
+from .serializers import RequestSerializer
+
+User = get_user_model()
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        ORJSONRenderer().render(data), status=status, headers=headers, content_type='application/json',
+    )
+
+
+def auth_error(exc_class):
+    return json_response(
+        {'detail': str(exc_class.default_detail)}, status=exc_class.status_code,
+        headers={'WWW-Authenticate': f'{api_settings.AUTH_HEADER_TYPES[0]} realm="api"'},
+    )
+
+
+async def authenticate(request):
+    """
+    Utilisateur du jeton de l'en-tête Authorization : AnonymousUser sans
+    jeton, None si le jeton ou l'utilisateur est invalide.
+    """
+    parts = request.META.get(api_settings.AUTH_HEADER_NAME, '').split()
+    if not parts or parts[0] not in api_settings.AUTH_HEADER_TYPES:
+        return AnonymousUser()
+    if len(parts) != 2:
+        return None
+    try:
+        user_id = AccessToken(parts[1])[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None
+    return await User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}, is_active=True).afirst()
+
+
+def async_api(anonymous=False):
+    """Authentifie la requête avant la vue ; ``anonymous`` équivaut à AllowAny."""
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            # Sous-requêtes de /api/batch/ : utilisateur déjà authentifié (voir batch.py).
+            user = getattr(request, '_force_auth_user', None) or await authenticate(request)
+            if user is None:
+                return auth_error(AuthenticationFailed)
+            if not (anonymous or user.is_authenticated):
+                return auth_error(NotAuthenticated)
+            request.user = user
+            return await view(request, *args, **kwargs)
+        return inner
+    return decorator
+
+
+def read_view(async_get, fallback=None):
+    """Vue servant GET par ``async_get`` et les autres méthodes par la vue synchrone ``fallback``."""
+    sync_fallback = sync_to_async(fallback) if fallback is not None else None
+
+    async def view(request, *args, **kwargs):
+        if request.method == 'GET':
+            return await async_get(request, *args, **kwargs)
+        if sync_fallback is None:
+            return HttpResponseNotAllowed(['GET'])
+        return await sync_fallback(request, *args, **kwargs)
+
+    # Comme les vues DRF : l'authentification JWT ne repose pas sur les cookies.
+    view.csrf_exempt = True
+    view.query_budget = async_get.query_budget
+    view.async_get = async_get
+    view.fallback = fallback
+    return view
+
+
+@async_api(anonymous=True)
+@query_budget(max_queries=1)
+async def request_list(request):
+    if request.user.is_anonymous:
+        return json_response([])
+    return json_response(await RequestReadSerializer.aserialize(Request.objects.filter(user=request.user)))
+
+
+@async_api(anonymous=True)
+@query_budget(max_queries=2)
+async def request_detail(request, request_id):
+    # Même logique que get_request_by_id ; le cache partagé éventuel est synchrone.
+    if request_details.shared is None:
+        version = request_details.version(request_id)
+        payload = request_details.get(request_id, version)
+    else:
+        version = await sync_to_async(request_details.version)(request_id)
+        payload = await sync_to_async(request_details.get)(request_id, version)
+    if payload is None:
+        with routers.use_primary():
+            request_obj = await Request.objects.select_related(
+                'user', 'category', 'feedback__user',
+            ).filter(id=request_id).afirst()
+            if request_obj is not None:
+                payload = dict(RequestSerializer(request_obj).data)
+            else:
+                payload = await archive.arequest_detail(request_id)
+        if payload is None:
+            return json_response({"error": "Demande introuvable"}, status=status.HTTP_404_NOT_FOUND)
+        if request_details.shared is None:
+            request_details.set(request_id, version, payload)
+        else:
+            await sync_to_async(request_details.set)(request_id, version, payload)
+    return json_response(payload)
+
+
+@async_api()
+@query_budget(max_queries=1)
+async def notification_list(request):
+    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
+    return json_response(await NotificationReadSerializer.aserialize(notifications))
+
+
+@async_api()
+@query_budget(max_queries=5)
+async def stats(request):
+    # Même calcul que StatsView.get.
+    archived = await archive.arollup_totals()
+
+    status_dict = {'en_attente': 0, 'en_cours': 0, 'resolue': 0, 'rejetee': 0}
+    async for item in Request.objects.values('status').annotate(count=Count('status')).order_by():
+        status_dict[item['status']] = item['count']
+    for status_name, totals in archived.items():
+        status_dict[status_name] += totals['archived_requests']
+    total_requests = sum(status_dict.values())
+
+    rating_count, rating_sum = await feedback_stats.aaverages()
+    avg_rating = rating_sum / rating_count if rating_count else 0
+
+    resolution = await Request.objects.filter(status='resolue', resolved_at__isnull=False).aaggregate(
+        total=Sum(ExpressionWrapper(F('resolved_at') - F('created_at'), output_field=DurationField())),
+        count=Count('id'),
+    )
+    resolution_seconds = resolution['total'].total_seconds() if resolution['total'] else 0
+    resolution_seconds += sum(t['resolution_seconds'] for t in archived.values())
+    resolved_count = resolution['count'] + sum(t['resolved_requests'] for t in archived.values())
+    avg_resolution_time = resolution_seconds / resolved_count / 86400 if resolved_count else 0
+
+    recent_requests = [
+        {'id': pk, 'title': title, 'status': status_name, 'created_at': created_at, 'category': category}
+        async for pk, title, status_name, created_at, category in Request.objects.order_by('-created_at').values_list(
+            'id', 'title', 'status', 'created_at', 'category__name',
+        )[:5]
+    ]
+
+    return json_response({
+        'total': total_requests,
+        'statusCounts': status_dict,
+        'avgRating': round(avg_rating, 1),
+        'avgResolutionTime': round(avg_resolution_time, 1),  # en jours
+        'recentRequests': recent_requests,
+    })
+
+
+@async_api()
+@query_budget(max_queries=1)
+async def ai_history(request):
+    try:
+        conversations = AIConversation.objects.filter(user=request.user).order_by('created_at')
+        return json_response(await AIConversationReadSerializer.aserialize(conversations))
+    except Exception as e:
+        views.logger.exception("Assistant : échec de la lecture de l'historique", extra={'user_id': request.user.id})
+        return json_response(
+            {'error': f'Erreur lors de la récupération de l\'historique: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+# Placées avant celles de backend/urls.py quand ASYNC_READ_VIEWS est actif.
+urlpatterns = [
+    path('api/requests/', read_view(
+        request_list, views.RequestViewSet.as_view({'get': 'list', 'post': 'create'}),
+    ), name='request-list'),
+    path('api/requests/<int:request_id>/', read_view(request_detail, views.get_request_by_id), name='get-request-by-id'),
+    path('notifications/', read_view(notification_list, views.NotificationListView.as_view()), name='notification-list'),
+    path('api/stats/', read_view(stats, views.StatsView.as_view()), name='stats'),
+    path('api/ai-assistant/history/', read_view(
+        ai_history, views.AIAssistantHistoryView.as_view(),
+    ), name='ai_assistant_history'),
+]
@@ -0,0 +1,161 @@
+"""
+Exécution des sous-requêtes de /api/batch/.
+
+Chaque sous-requête est une copie de la requête HTTP d'origine (en-têtes,
+cookies) avec sa propre méthode, son chemin et son corps JSON. Elle est
+passée directement à la vue résolue, sans repasser par les middlewares :
+l'utilisateur déjà authentifié est transmis via ``_force_auth_user``, ce
+que DRF (comme async_views.async_api) reconnaît comme une authentification
+forcée. Les sous-requêtes s'exécutent dans l'ordre sur la connexion de la
+requête ; avec ``parallel``, les lectures consécutives sont lancées
+ensemble dans des threads, chaque écriture restant une barrière. Chaque
+thread ouvre alors sa propre connexion à la base (fermée à la fin de sa
+sous-requête) au lieu de partager celle de la requête : utile pour des
+lectures lentes, plus coûteux que l'exécution en série pour des petites.
+"""
+import contextvars
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+ALLOWED_METHODS = SAFE_METHODS + ('POST', 'PUT', 'PATCH', 'DELETE')
+# En-têtes propres au corps de la requête d'origine, et clé d'idempotence :
+# chaque sous-requête donne la sienne (``idempotency_key``) si besoin.
+BODY_KEYS = ('CONTENT_LENGTH', 'CONTENT_TYPE', 'wsgi.input', 'QUERY_STRING', 'HTTP_IDEMPOTENCY_KEY')
+
+
+class BatchError(ValueError):
+    pass
+
+
+def parse_operations(data):
+    """Valide la liste des sous-requêtes ; lève BatchError avec un message utilisateur."""
+    operations = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise BatchError("'requests' doit être une liste non vide")
+    max_requests = getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+    if len(operations) > max_requests:
+        raise BatchError(f"Au plus {max_requests} sous-requêtes par lot")
+
+    parsed = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or not isinstance(operation.get('path'), str):
+            raise BatchError(f"Sous-requête {index} : 'path' est requis")
+        method = str(operation.get('method', 'GET')).upper()
+        if method not in ALLOWED_METHODS:
+            raise BatchError(f"Sous-requête {index} : méthode {method} non autorisée")
+        idempotency_key = operation.get('idempotency_key')
+        if idempotency_key is not None and not isinstance(idempotency_key, str):
+            raise BatchError(f"Sous-requête {index} : 'idempotency_key' doit être une chaîne")
+        parsed.append({
+            'id': operation.get('id', index),
+            'method': method,
+            'path': operation['path'],
+            'body': operation.get('body'),
+            'idempotency_key': idempotency_key,
+        })
+    return parsed
+
+
+def build_request(parent, operation):
+    path, _, query = operation['path'].partition('?')
+    body = b'' if operation['body'] is None else json.dumps(operation['body']).encode()
+    environ = {key: value for key, value in parent.META.items() if key not in BODY_KEYS}
+    environ.update({
+        'REQUEST_METHOD': operation['method'],
+        'PATH_INFO': path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': BytesIO(body),
+    })
+    if operation.get('idempotency_key'):
+        environ['HTTP_IDEMPOTENCY_KEY'] = operation['idempotency_key']
+    request = WSGIRequest(environ)
+    # Authentification partagée : DRF utilise ces attributs sans relire le JWT.
+    request._force_auth_user = parent.user
+    request._force_auth_token = parent.auth
+    request.user = parent.user
+    return request
+
+
+def response_body(response):
+    data = getattr(response, 'data', None)
+    if data is not None or not hasattr(response, 'content'):
+        return data
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+    if not content:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(content)
+    return content.decode(response.charset or 'utf-8', errors='replace')
+
+
+def execute(parent, operation):
+    result = {'id': operation['id']}
+    path = operation['path'].partition('?')[0]
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return {**result, 'status': 404, 'body': {'error': 'Chemin introuvable'}}
+    if match.url_name == 'batch':
+        return {**result, 'status': 400, 'body': {'error': 'Les lots imbriqués ne sont pas autorisés'}}
+
+    view = match.func
+    if iscoroutinefunction(view):
+        # Vue async (async_views.py, sous ASGI) : exécutée jusqu'au bout dans ce thread.
+        view = async_to_sync(view)
+    try:
+        response = view(build_request(parent, operation), *match.args, **match.kwargs)
+    except Exception:
+        logger.exception("Échec de la sous-requête %s %s", operation['method'], path)
+        return {**result, 'status': 500, 'body': {'error': 'Erreur interne'}}
+    return {**result, 'status': response.status_code, 'body': response_body(response)}
+
+
+def _execute_in_thread(context, parent, operation):
+    try:
+        # Le contexte copié transmet l'état de routage des répliques.
+        return context.run(execute, parent, operation)
+    finally:
+        connections.close_all()
+
+
+def run(parent, operations, parallel=False):
+    """Résultats des sous-requêtes, dans l'ordre de ``operations``."""
+    if not parallel:
+        return [execute(parent, operation) for operation in operations]
+
+    results, group = [], []
+    max_workers = getattr(settings, 'BATCH_MAX_WORKERS', 4)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch') as pool:
+        def flush():
+            if len(group) == 1:
+                results.append(execute(parent, group[0]))
+            elif group:
+                futures = [
+                    pool.submit(_execute_in_thread, contextvars.copy_context(), parent, operation)
+                    for operation in group
+                ]
+                results.extend(future.result() for future in futures)
+            group.clear()
+
+        for operation in operations:
+            if operation['method'] in SAFE_METHODS:
+                group.append(operation)
+                continue
+            flush()
+            results.append(execute(parent, operation))
+        flush()
+    return results
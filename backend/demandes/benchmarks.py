@@ -0,0 +1,91 @@
+import json
+import math
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def percentile(values, pct):
+    """Percentile par rang le plus proche, sans interpolation."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(timings, queries=None, sizes=None):
+    """Résume une série de durées (en secondes) en millisecondes et débit."""
+    total = sum(timings)
+    summary = {
+        'calls': len(timings),
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3) if timings else 0.0,
+        'throughput_rps': round(len(timings) / total, 1) if total else 0.0,
+    }
+    if queries is not None:
+        summary['queries_per_call'] = round(statistics.fmean(queries), 2) if queries else 0.0
+    if sizes is not None:
+        summary['bytes_per_call'] = int(statistics.fmean(sizes)) if sizes else 0
+    return summary
+
+
+def timed(func, iterations, warmup=0):
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def default_output(name):
+    return Path(settings.BASE_DIR) / 'benchmarks' / f"{name}-{git_revision() or 'local'}.json"
+
+
+def write_results(path, results):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        'revision': git_revision(),
+        'created_at': timezone.now().isoformat(),
+        'database': settings.DATABASES['default']['ENGINE'],
+        **results,
+    }
+    path.write_text(json.dumps(payload, indent=2, ensure_ascii=False, default=str))
+    return path
+
+
+def compare_results(previous, current, metrics=('p50_ms', 'p99_ms', 'queries_per_call')):
+    """Lignes de comparaison « avant -> après » par entrée de ``current['results']``."""
+    lines = []
+    for name, after in current['results'].items():
+        before = previous.get('results', {}).get(name)
+        if not before:
+            lines.append(f"{name}: nouveau")
+            continue
+        parts = []
+        for metric in metrics:
+            if metric in before and metric in after:
+                old, new = before[metric], after[metric]
+                change = f" ({(new - old) / old * 100:+.1f}%)" if old else ''
+                parts.append(f"{metric} {old} -> {new}{change}")
+        lines.append(f"{name}: " + ', '.join(parts))
+    return lines
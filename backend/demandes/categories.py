@@ -0,0 +1,59 @@
+"""
+Compteurs de demandes par catégorie (Category.open_requests / resolved_requests).
+
+Ils comptent les demandes actives (non marquées supprimées) de la table
+Request : les signaux de Request les ajustent à chaque enregistrement, et
+les mises à jour en masse (suppression différée, archivage, reclassement)
+appellent ``adjust`` avec les lignes concernées, dans leur transaction.
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F
+
+from .models import Category
+
+BUCKETS = {
+    'en_attente': 'open_requests',
+    'en_cours': 'open_requests',
+    'resolue': 'resolved_requests',
+}
+
+
+def counted(category_id, status, deleted_at=None):
+    """Compteur touché par une demande : (catégorie, champ), ou None."""
+    field = BUCKETS.get(status)
+    if field is None or category_id is None or deleted_at is not None:
+        return None
+    return category_id, field
+
+
+def adjust(changes):
+    """Applique ``changes`` : {(catégorie, champ): variation}, une requête par catégorie."""
+    by_category = defaultdict(dict)
+    for (category_id, field), delta in changes.items():
+        if delta:
+            by_category[category_id][field] = F(field) + delta
+    for category_id, increments in by_category.items():
+        Category.objects.filter(pk=category_id).update(**increments)
+
+
+def move(old, new):
+    if old == new:
+        return
+    changes = Counter()
+    if old is not None:
+        changes[old] -= 1
+    if new is not None:
+        changes[new] += 1
+    adjust(changes)
+
+
+def remove_requests(queryset):
+    """Retire des compteurs les demandes de ``queryset``, avant leur mise à l'écart en masse."""
+    changes = Counter()
+    for row in queryset.order_by().values('category_id', 'status').annotate(total=Count('id')):
+        key = counted(row['category_id'], row['status'])
+        if key is not None:
+            changes[key] -= row['total']
+    adjust(changes)
+
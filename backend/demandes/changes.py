@@ -0,0 +1,157 @@
+"""
+Flux de changements pour la synchronisation incrémentale des clients.
+
+Le curseur est la position ``<horodatage en µs>_<type>_<id>`` du dernier
+changement renvoyé : les changements sont triés sur (horodatage, type, id),
+si bien que des lignes mises à jour au même instant (``update()`` en masse)
+ne se perdent pas entre deux pages. Une seule requête UNION sur les index
+``updated_at`` / ``deleted_at`` détecte ce qui a changé ; les lignes
+complètes ne sont lues que pour les types effectivement modifiés.
+
+``auto_now`` est calculé par l'application avant le commit : une transaction
+plus lente peut valider une ligne derrière un curseur déjà distribué. La
+dernière page renvoie donc un curseur reculé de ``CHANGES_OVERLAP_SECONDS``,
+et les changements de cette fenêtre sont relus (les clients appliquent les
+mises à jour par id, un doublon est sans effet).
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q, F, Value, CharField
+from django.utils import timezone
+
+from .fast_serializers import RequestReadSerializer, FeedbackReadSerializer, NotificationReadSerializer
+from .models import Request, Feedback, Notification, Tombstone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class CursorExpired(Exception):
+    pass
+
+
+KINDS = ('feedback', 'notification', 'request')
+
+
+def encode_cursor(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def decode_cursor(value):
+    if value in (None, ''):
+        return None
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+def encode_position(moment, kind='', pk=0):
+    return f'{encode_cursor(moment)}_{kind}_{pk}'
+
+
+def decode_position(value):
+    """(horodatage, type, id) ; un ancien curseur sans type ni id relit tout l'instant."""
+    if value in (None, ''):
+        return None
+    micros, *rest = value.split('_')
+    if not rest:
+        return decode_cursor(micros), '', 0
+    if len(rest) != 2 or rest[0] not in ('', *KINDS):
+        raise ValueError(value)
+    return decode_cursor(micros), rest[0], int(rest[1])
+
+
+def after(position, timestamp, kind, pk):
+    """Condition (horodatage, type, id) > ``position`` ; ``kind`` est un nom de champ pour les traces."""
+    moment, last_kind, last_pk = position
+    condition = Q(**{f'{timestamp}__gt': moment})
+    if kind == 'model':
+        return (
+            condition | Q(**{timestamp: moment, 'model__gt': last_kind})
+            | Q(**{timestamp: moment, 'model': last_kind, f'{pk}__gt': last_pk})
+        )
+    if kind > last_kind:
+        return condition | Q(**{timestamp: moment})
+    if kind == last_kind:
+        return condition | Q(**{timestamp: moment, f'{pk}__gt': last_pk})
+    return condition
+
+
+def scoped_querysets(user):
+    """Objets visibles par l'utilisateur : tout pour un admin, les siens pour un client."""
+    requests = Request.objects.all()
+    feedbacks = Feedback.objects.all()
+    if user.role != 'admin':
+        requests = requests.filter(user=user)
+        feedbacks = feedbacks.filter(user=user)
+    notifications = Notification.objects.filter(user=user)
+
+    tombstones = Tombstone.objects.filter(owner_id=user.id)
+    if user.role == 'admin':
+        tombstones = Tombstone.objects.filter(Q(model__in=['request', 'feedback']) | Q(model='notification', owner_id=user.id))
+    return requests, feedbacks, notifications, tombstones
+
+
+def changed_keys(user, position, limit):
+    """(type, opération, id, horodatage) des changements après ``position``, en une requête."""
+    requests, feedbacks, notifications, tombstones = scoped_querysets(user)
+    if position is not None:
+        requests = requests.filter(after(position, 'updated_at', 'request', 'pk'))
+        feedbacks = feedbacks.filter(after(position, 'updated_at', 'feedback', 'pk'))
+        notifications = notifications.filter(after(position, 'updated_at', 'notification', 'pk'))
+        tombstones = tombstones.filter(after(position, 'deleted_at', 'model', 'object_id'))
+
+    def keys(queryset, kind, op, pk='pk', timestamp='updated_at'):
+        return queryset.annotate(
+            kind=Value(kind, output_field=CharField()) if kind else F('model'),
+            op=Value(op, output_field=CharField()),
+            changed_at=F(timestamp),
+            key=F(pk),
+        ).values_list('kind', 'op', 'key', 'changed_at').order_by()
+
+    union = keys(requests, 'request', 'upsert').union(
+        keys(feedbacks, 'feedback', 'upsert'),
+        keys(notifications, 'notification', 'upsert'),
+        keys(tombstones, None, 'delete', pk='object_id', timestamp='deleted_at'),
+        all=True,
+    )
+    return list(union.order_by('changed_at', 'kind', 'key')[:limit + 1])
+
+
+def changes_since(user, cursor=None, limit=500):
+    """
+    Changements visibles par ``user`` après ``cursor``, ou None s'il n'y en a
+    aucun. Lève CursorExpired si les traces de suppression ont pu être purgées.
+    """
+    position = decode_position(cursor)
+    now = timezone.now()
+    retention = getattr(settings, 'TOMBSTONE_RETENTION_DAYS', 30)
+    if position is not None and position[0] < now - timedelta(days=retention):
+        raise CursorExpired()
+
+    rows = changed_keys(user, position, limit)
+    if not rows:
+        return None
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    upserts = {'request': [], 'feedback': [], 'notification': []}
+    deleted = {'request': [], 'feedback': [], 'notification': []}
+    for kind, op, pk, _ in rows:
+        (upserts if op == 'upsert' else deleted)[kind].append(pk)
+
+    serializers = {
+        'request': (Request, RequestReadSerializer),
+        'feedback': (Feedback, FeedbackReadSerializer),
+        'notification': (Notification, NotificationReadSerializer),
+    }
+    kind, _, pk, changed_at = rows[-1]
+    next_position = encode_position(changed_at, kind, pk)
+    settled = now - timedelta(seconds=getattr(settings, 'CHANGES_OVERLAP_SECONDS', 5))
+    if not has_more and changed_at > settled:
+        # Une transaction encore en cours peut valider derrière ce curseur.
+        next_position = encode_position(max(settled, position[0]) if position else settled)
+    payload = {'cursor': next_position, 'has_more': has_more}
+    for kind, (model, serializer) in serializers.items():
+        ids = upserts[kind]
+        payload[f'{kind}s'] = serializer.serialize(model.objects.filter(pk__in=ids).order_by('pk')) if ids else []
+    payload['deleted'] = {f'{kind}s': ids for kind, ids in deleted.items()}
+    return payload
@@ -0,0 +1,233 @@
+"""
+Classement automatique des demandes par catégorie.
+
+Bayésien naïf multinomial sur les mots et paires de mots du titre et de la
+description, hachés sur ``CLASSIFIER_FEATURES`` colonnes. Le modèle est
+entraîné par la commande train_classifier à partir des demandes déjà
+classées (actives et archivées), enregistré dans ``CLASSIFIER_MODEL_PATH``
+puis relu par chaque processus quand le fichier change.
+
+Une prédiction n'est retenue qu'au-delà de ``CLASSIFIER_MIN_CONFIDENCE``,
+sinon la demande garde la catégorie par défaut. La prédiction d'un lot se
+fait en quelques opérations NumPy sur les caractéristiques de tout le lot ;
+``reclassify`` (commande classify_requests) s'en sert pour reclasser
+l'arriéré.
+"""
+import os
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import feedback_stats
+from . import categories, priority
+from .models import Category, Request, ArchivedRequest, Feedback
+from .signals import invalidate_request_details
+from .text import features, token_hash
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy est optionnel
+    np = None
+
+DEFAULT_CATEGORY = Category.DEFAULT
+
+
+def request_text(title, description):
+    return f'{title or ""} {description or ""}'
+
+
+def hashed_counts(texts, n_features):
+    """Matrice creuse (lignes, colonnes, effectifs) des caractéristiques de ``texts``."""
+    rows, columns = [], []
+    for row, text in enumerate(texts):
+        hashes = [token_hash(feature) % n_features for feature in features(text)]
+        rows.extend([row] * len(hashes))
+        columns.extend(hashes)
+    cells = np.array(rows, dtype=np.int64) * n_features + np.array(columns, dtype=np.int64)
+    cells, counts = np.unique(cells, return_counts=True)
+    return cells // n_features, cells % n_features, counts.astype(np.float32)
+
+
+class NaiveBayes:
+    def __init__(self, categories, log_prior, log_prob):
+        self.categories = list(categories)
+        self.log_prior = log_prior
+        self.log_prob = log_prob
+
+    @property
+    def n_features(self):
+        return self.log_prob.shape[1]
+
+    @classmethod
+    def train(cls, texts, labels, n_features=None, alpha=None):
+        n_features = n_features or getattr(settings, 'CLASSIFIER_FEATURES', 2 ** 16)
+        alpha = alpha if alpha is not None else getattr(settings, 'CLASSIFIER_ALPHA', 0.1)
+        names = sorted(set(labels))
+        index = {category: position for position, category in enumerate(names)}
+        classes = np.array([index[label] for label in labels], dtype=np.int64)
+
+        rows, columns, counts = hashed_counts(texts, n_features)
+        totals = np.zeros((len(names), n_features), dtype=np.float64)
+        np.add.at(totals, (classes[rows], columns), counts)
+        totals += alpha
+        log_prob = np.log(totals) - np.log(totals.sum(axis=1, keepdims=True))
+        log_prior = np.log(np.bincount(classes, minlength=len(names)) / len(labels))
+        return cls(names, log_prior.astype(np.float32), log_prob.astype(np.float32))
+
+    def _probabilities(self, rows, columns, counts, size):
+        scores = np.tile(self.log_prior, (size, 1))
+        for position in range(len(self.categories)):
+            scores[:, position] += np.bincount(rows, weights=counts * self.log_prob[position, columns], minlength=size)
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, texts):
+        return self._probabilities(*hashed_counts(texts, self.n_features), len(texts))
+
+    def predict(self, texts, min_confidence=None):
+        """Liste de (catégorie, confiance) ; catégorie None sous ``min_confidence``."""
+        if min_confidence is None:
+            min_confidence = getattr(settings, 'CLASSIFIER_MIN_CONFIDENCE', 0.6)
+        rows, columns, counts = hashed_counts(texts, self.n_features)
+        probabilities = self._probabilities(rows, columns, counts, len(texts))
+        best = probabilities.argmax(axis=1)
+        confidences = probabilities[np.arange(len(texts)), best]
+        # Un texte sans aucun mot significatif n'aurait que la probabilité a priori.
+        accepted = (confidences >= min_confidence) & (np.bincount(rows, minlength=len(texts)) > 0)
+        return [
+            (self.categories[position] if ok else None, float(confidence))
+            for position, confidence, ok in zip(best, confidences, accepted)
+        ]
+
+    def save(self, path):
+        with open(path, 'wb') as output:
+            np.savez(output, categories=np.array(self.categories), log_prior=self.log_prior, log_prob=self.log_prob)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['categories'].tolist(), data['log_prior'], data['log_prob'])
+
+
+def training_data():
+    """Textes et catégories des demandes classées à la main, actives et archivées."""
+    texts, labels = [], []
+    for model in (Request.objects, ArchivedRequest.objects):
+        for title, description, category in model.exclude(category__name=DEFAULT_CATEGORY).values_list(
+            'title', 'description', 'category__name',
+        ).iterator(chunk_size=2000):
+            texts.append(request_text(title, description))
+            labels.append(category)
+    return texts, labels
+
+
+def model_path():
+    return str(getattr(settings, 'CLASSIFIER_MODEL_PATH', 'classifier.npz'))
+
+
+class ModelStore:
+    """Modèle courant du processus, relu quand le fichier est remplacé."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._model = None
+        self._loaded = None
+
+    def get(self):
+        if np is None:
+            return None
+        path = model_path()
+        try:
+            stamp = (path, os.stat(path).st_mtime_ns)
+        except OSError:
+            return None
+        with self._lock:
+            if self._loaded != stamp:
+                self._model, self._loaded = NaiveBayes.load(path), stamp
+            return self._model
+
+    def clear(self):
+        with self._lock:
+            self._model = self._loaded = None
+
+
+model_store = ModelStore()
+
+
+def suggest(title, description):
+    """Catégorie prédite pour une nouvelle demande, ou None (pas de modèle, confiance trop faible)."""
+    model = model_store.get()
+    if model is None:
+        return None
+    return model.predict([request_text(title, description)])[0][0]
+
+
+def reclassify(queryset, batch_size=1000, dry_run=False):
+    """
+    Reclasse les demandes de ``queryset`` par lots ; renvoie
+    {'scanned': n, 'changed': n, 'by_category': {catégorie: n}}.
+    """
+    model = model_store.get()
+    result = {'scanned': 0, 'changed': 0, 'by_category': defaultdict(int)}
+    if model is None:
+        return result
+    last = 0
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=last).order_by('pk')
+            .values_list('pk', 'title', 'description', 'category__name', 'category_id', 'status')[:batch_size]
+        )
+        if not rows:
+            break
+        last = rows[-1][0]
+        result['scanned'] += len(rows)
+        predictions = model.predict([request_text(title, description) for _, title, description, *_ in rows])
+        moves = {
+            pk: (category_id, new, status)
+            for (pk, _, _, old, category_id, status), (new, _) in zip(rows, predictions)
+            if new is not None and new != old
+        }
+        for _, new, _ in moves.values():
+            result['by_category'][new] += 1
+        result['changed'] += len(moves)
+        if moves and not dry_run:
+            _apply_moves(moves)
+            invalidate_request_details(*moves)
+    result['by_category'] = dict(result['by_category'])
+    return result
+
+
+def _apply_moves(moves):
+    """``moves`` : {pk: (ancienne catégorie (id), nouvelle catégorie (nom), statut)}."""
+    targets = {name: Category.objects.resolve(name).pk for name in {new for _, new, _ in moves.values()}}
+    by_category, counters = defaultdict(list), Counter()
+    for pk, (old_id, new, status) in moves.items():
+        by_category[targets[new]].append(pk)
+        for category_id, delta in ((old_id, -1), (targets[new], 1)):
+            key = categories.counted(category_id, status)
+            if key is not None:
+                counters[key] += delta
+    with transaction.atomic():
+        now = timezone.now()
+        for category_id, pks in by_category.items():
+            # update() ne renseigne pas updated_at, dont dépend /api/changes/.
+            Request.all_objects.filter(pk__in=pks).update(category_id=category_id, updated_at=now)
+        categories.adjust(counters)
+        # Les avis des demandes reclassées changent de catégorie dans les agrégats.
+        ratings = defaultdict(list)
+        for request_id, created_at, rating in Feedback.objects.filter(request_id__in=list(moves)).values_list(
+            'request_id', 'created_at', 'rating',
+        ):
+            old_id, new, _ = moves[request_id]
+            period = feedback_stats.period_of(created_at)
+            ratings[old_id, period, -1].append(rating)
+            ratings[targets[new], period, 1].append(rating)
+        for (category_id, period, sign), values in ratings.items():
+            feedback_stats.apply(category_id, period, values, sign=sign)
+        # Le poids de la nouvelle catégorie entre dans le score de priorité.
+        pks = list(moves)
+        transaction.on_commit(lambda: priority.refresh(Request.objects.filter(pk__in=pks)))
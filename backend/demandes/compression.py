@@ -0,0 +1,156 @@
+import threading
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli est optionnel
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard est optionnel
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'application/xml')
+
+
+class GzipCodec:
+    name = 'gzip'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self, chunks):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            # Z_SYNC_FLUSH : chaque morceau est décodable dès réception.
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+class BrotliCodec:
+    name = 'br'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.level)
+
+    def stream(self, chunks):
+        compressor = brotli.Compressor(quality=self.level)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class ZstdCodec:
+    name = 'zstd'
+
+    def __init__(self, level):
+        self.level = level
+
+    # Un ZstdCompressor ne doit pas être partagé entre threads.
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def stream(self, chunks):
+        compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def available_codecs():
+    """Codecs utilisables, dans l'ordre de préférence du serveur."""
+    levels = getattr(settings, 'COMPRESSION_LEVELS', {})
+    factories = {
+        'zstd': (ZstdCodec, zstandard, 3),
+        'br': (BrotliCodec, brotli, 5),
+        'gzip': (GzipCodec, zlib, 6),
+    }
+    codecs = []
+    for name in getattr(settings, 'COMPRESSION_ENCODINGS', ['zstd', 'br', 'gzip']):
+        codec_class, module, default_level = factories[name]
+        if module is not None:
+            codecs.append(codec_class(levels.get(name, default_level)))
+    return codecs
+
+
+def parse_accept_encoding(header):
+    """{encodage: qualité} à partir de l'en-tête Accept-Encoding."""
+    accepted = {}
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token] = quality
+    return accepted
+
+
+def negotiate(header, codecs):
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    candidates = [codec for codec in codecs if accepted.get(codec.name, wildcard) > 0]
+    if not candidates:
+        return None
+    # La qualité du client prime, puis l'ordre de préférence du serveur.
+    return max(candidates, key=lambda codec: (accepted.get(codec.name, wildcard), -codecs.index(codec)))
+
+
+class CompressionStats:
+    """Compteurs d'octets économisés par endpoint, partagés entre threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, endpoint, encoding, original, compressed):
+        with self._lock:
+            entry = self._stats.setdefault(endpoint, {
+                'responses': 0, 'original_bytes': 0, 'compressed_bytes': 0, 'encodings': {},
+            })
+            entry['responses'] += 1
+            entry['original_bytes'] += original
+            entry['compressed_bytes'] += compressed
+            entry['encodings'][encoding] = entry['encodings'].get(encoding, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for endpoint, entry in self._stats.items():
+                saved = entry['original_bytes'] - entry['compressed_bytes']
+                result[endpoint] = {
+                    **entry,
+                    'encodings': dict(entry['encodings']),
+                    'saved_bytes': saved,
+                    'ratio': round(entry['compressed_bytes'] / entry['original_bytes'], 3) if entry['original_bytes'] else None,
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+stats = CompressionStats()
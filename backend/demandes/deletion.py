@@ -0,0 +1,179 @@
+"""
+Suppression différée des demandes et des utilisateurs.
+
+Les vues ne font que marquer l'objet (``deleted_at``) ; ``purge_pending``
+supprime ensuite les lignes dépendantes par lots de taille fixe, par
+suppression directe (``_raw_delete``), sans que le collecteur de Django
+ne charge chaque objet ni ne garde les verrous pendant toute la cascade.
+Les signaux post_delete ne sont donc pas envoyés : les traces pour
+/api/changes/ et l'invalidation du cache de détail sont faites ici.
+
+``worker.wake()`` lance la purge dans un thread du processus après le
+commit ; la commande purge_deleted fait le même travail hors ligne.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import (
+    User, Request, Feedback, Notification, RequestStatusEvent, AIConversation, Tombstone,
+    ArchivedRequest, ArchivedNotification,
+)
+from . import categories, feedback_stats
+from .duplicates import duplicate_index
+from .faq_index import faq_index
+from .signals import invalidate_request_details
+
+logger = logging.getLogger(__name__)
+
+
+def batch_size():
+    return getattr(settings, 'DELETION_BATCH_SIZE', 500)
+
+
+def delete_in_batches(queryset, size, before_delete=None):
+    """Supprime les lignes de ``queryset`` par lots de ``size`` ; ``before_delete(pks)`` est appelé dans la transaction du lot."""
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:size])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            if before_delete is not None:
+                before_delete(pks)
+            chunk = queryset.model._base_manager.filter(pk__in=pks)
+            deleted += chunk._raw_delete(chunk.db)
+
+
+def forget_in_indexes(*pks):
+    # Les mises à jour en masse n'envoient pas post_save aux index en mémoire.
+    faq_index.discard(*pks)
+    duplicate_index.discard(*pks)
+
+
+def mark_request_deleted(request_id):
+    """Marque une demande comme supprimée ; renvoie False si elle n'existe pas."""
+    with transaction.atomic():
+        categories.remove_requests(Request.objects.filter(pk=request_id))
+        marked = Request.objects.filter(pk=request_id).update(deleted_at=timezone.now())
+    if marked:
+        invalidate_request_details(request_id)
+        transaction.on_commit(lambda: forget_in_indexes(request_id))
+        worker.wake()
+    return bool(marked)
+
+
+def mark_user_deleted(user_id):
+    """Désactive le compte et masque ses demandes ; renvoie False si l'utilisateur n'existe pas."""
+    now = timezone.now()
+    with transaction.atomic():
+        if not User.objects.filter(pk=user_id, deleted_at__isnull=True).update(is_active=False, deleted_at=now):
+            return False
+        pks = list(Request.objects.filter(user_id=user_id).values_list('pk', flat=True))
+        invalidate_request_details(*pks)
+        transaction.on_commit(lambda: forget_in_indexes(*pks))
+        categories.remove_requests(Request.objects.filter(user_id=user_id))
+        Request.objects.filter(user_id=user_id).update(deleted_at=now)
+    worker.wake()
+    return True
+
+
+def purge_requests(size):
+    """Supprime les demandes marquées, lot par lot ; renvoie le nombre de demandes supprimées."""
+    purged = 0
+    while True:
+        rows = list(
+            Request.all_objects.filter(deleted_at__isnull=False).order_by('pk').values_list('pk', 'user_id')[:size]
+        )
+        if not rows:
+            return purged
+        ids = [pk for pk, _ in rows]
+        delete_in_batches(Notification.objects.filter(request_id__in=ids), size)
+        delete_in_batches(RequestStatusEvent.objects.filter(request_id__in=ids), size)
+        delete_in_batches(Feedback.objects.filter(request_id__in=ids), size, feedback_stats.remove_feedbacks)
+        with transaction.atomic():
+            # Une seule trace par demande : ses dépendants partent avec elle.
+            Tombstone.objects.bulk_create(Tombstone(model='request', object_id=pk, owner_id=owner) for pk, owner in rows)
+            chunk = Request.all_objects.filter(pk__in=ids)
+            purged += chunk._raw_delete(chunk.db)
+        invalidate_request_details(*ids)
+
+
+def purge_user(user_id, size):
+    """Supprime les données restantes d'un utilisateur marqué, puis le compte."""
+    def feedback_removed(pks):
+        feedback_stats.remove_feedbacks(pks)
+        rows = list(Feedback.objects.filter(pk__in=pks).values_list('pk', 'request_id'))
+        Tombstone.objects.bulk_create(Tombstone(model='feedback', object_id=pk, owner_id=user_id) for pk, _ in rows)
+        transaction.on_commit(lambda: invalidate_request_details(*[request_id for _, request_id in rows]))
+
+    delete_in_batches(AIConversation.objects.filter(user_id=user_id), size)
+    delete_in_batches(Notification.objects.filter(user_id=user_id), size)
+    delete_in_batches(Feedback.objects.filter(user_id=user_id), size, feedback_removed)
+    delete_in_batches(ArchivedNotification.objects.filter(request__user_id=user_id), size)
+    delete_in_batches(ArchivedNotification.objects.filter(user_id=user_id), size)
+    delete_in_batches(ArchivedRequest.objects.filter(user_id=user_id), size)
+    # L'historique des statuts des autres demandes est gardé (SET_NULL).
+    events = RequestStatusEvent.objects.filter(actor_id=user_id)
+    while True:
+        pks = list(events.values_list('pk', flat=True)[:size])
+        if not pks:
+            break
+        RequestStatusEvent.objects.filter(pk__in=pks).update(actor=None)
+    # Il ne reste que des relations de Django (jetons, groupes, journal admin).
+    User.objects.filter(pk=user_id).delete()
+
+
+def purge_pending(size=None):
+    """Termine toutes les suppressions en attente ; renvoie {'requests': n, 'users': n}."""
+    size = size or batch_size()
+    requests = purge_requests(size)
+    users = 0
+    for user_id in User.objects.filter(deleted_at__isnull=False).values_list('pk', flat=True):
+        purge_user(user_id, size)
+        users += 1
+    return {'requests': requests, 'users': users}
+
+
+class DeletionWorker:
+    """Thread unique par processus qui exécute purge_pending tant qu'il y a du travail."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = False
+        self._thread = None
+
+    def wake(self):
+        if getattr(settings, 'DELETION_IN_PROCESS', True):
+            transaction.on_commit(self._start)
+
+    def _start(self):
+        with self._lock:
+            self._pending = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='deletion-worker', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        self._thread = None
+                        return
+                    self._pending = False
+                try:
+                    purge_pending()
+                except Exception:
+                    # Le travail reste marqué : il sera repris au prochain réveil
+                    # ou par la commande purge_deleted.
+                    logger.exception("Échec de la suppression en arrière-plan")
+        finally:
+            # Connexions ouvertes par ce thread.
+            connections.close_all()
+
+
+worker = DeletionWorker()
@@ -0,0 +1,127 @@
+"""
+Cache du détail d'une demande (réponse de ``get_request_by_id``).
+
+Deux niveaux : un LRU en mémoire du processus, puis, si
+``REQUEST_DETAIL_CACHE_ALIAS`` désigne un cache Django partagé, ce cache.
+Chaque demande a un numéro de version, incrémenté à chaque invalidation ;
+chaque entrée porte la version sous laquelle elle a été calculée. Une
+réponse calculée pendant une invalidation porte donc l'ancienne version et
+n'est jamais relue.
+
+Avec un cache partagé, la version y est aussi stockée : l'invalidation
+faite par un processus est vue par tous les autres. Sans lui, les autres
+processus (workers, planificateur) ne la voient pas : une entrée locale
+n'est donc servie que ``REQUEST_DETAIL_CACHE_LOCAL_TTL`` secondes.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+# À incrémenter quand la forme de RequestSerializer change.
+PAYLOAD_VERSION = 1
+KEY_PREFIX = f'request-detail:v{PAYLOAD_VERSION}'
+
+
+class DetailCache:
+    def __init__(self, maxsize=None, alias=None, timeout=None, local_ttl=None, clock=time.monotonic):
+        self._maxsize = maxsize
+        self._alias = alias
+        self._timeout = timeout
+        self._local_ttl = local_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Versions locales, utilisées sans cache partagé.
+        self._versions = OrderedDict()
+        self.hits = self.misses = 0
+
+    @property
+    def maxsize(self):
+        return self._maxsize or getattr(settings, 'REQUEST_DETAIL_CACHE_SIZE', 2048)
+
+    @property
+    def shared(self):
+        alias = self._alias or getattr(settings, 'REQUEST_DETAIL_CACHE_ALIAS', None)
+        return caches[alias] if alias else None
+
+    @property
+    def timeout(self):
+        return self._timeout or getattr(settings, 'REQUEST_DETAIL_CACHE_TIMEOUT', 3600)
+
+    @property
+    def local_ttl(self):
+        return self._local_ttl or getattr(settings, 'REQUEST_DETAIL_CACHE_LOCAL_TTL', 5)
+
+    def version(self, pk):
+        shared = self.shared
+        if shared is not None:
+            return shared.get(f'{KEY_PREFIX}:{pk}:version', 0)
+        with self._lock:
+            return self._versions.get(pk, 0)
+
+    def get(self, pk, version):
+        with self._lock:
+            entry = self._entries.get(pk)
+            if entry is not None and self._clock() - entry[2] > self.local_ttl:
+                # Peut-être invalidée par un autre processus : on relit.
+                del self._entries[pk]
+            elif entry is not None and entry[0] == version:
+                self._entries.move_to_end(pk)
+                self.hits += 1
+                return entry[1]
+        shared = self.shared
+        payload = shared.get(f'{KEY_PREFIX}:{pk}:{version}') if shared is not None else None
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._store(pk, version, payload)
+        return payload
+
+    def set(self, pk, version, payload):
+        shared = self.shared
+        if shared is not None:
+            shared.set(f'{KEY_PREFIX}:{pk}:{version}', payload, self.timeout)
+        with self._lock:
+            if shared is None and self._versions.get(pk, 0) != version:
+                return
+            self._store(pk, version, payload)
+
+    def _store(self, pk, version, payload):
+        self._entries[pk] = (version, payload, self._clock())
+        self._entries.move_to_end(pk)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *pks):
+        shared = self.shared
+        with self._lock:
+            for pk in pks:
+                self._entries.pop(pk, None)
+                if shared is None:
+                    self._versions[pk] = self._versions.pop(pk, 0) + 1
+            # Une version oubliée repart de 0 : seule une réponse calculée
+            # pendant l'éviction pourrait en pâtir, la borne est large.
+            while len(self._versions) > self.maxsize * 4:
+                self._versions.popitem(last=False)
+        if shared is not None:
+            for pk in pks:
+                key = f'{KEY_PREFIX}:{pk}:version'
+                shared.add(key, 0, None)
+                try:
+                    shared.incr(key)
+                except ValueError:
+                    shared.set(key, 1, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.hits = self.misses = 0
+
+
+request_details = DetailCache()
@@ -0,0 +1,220 @@
+"""
+Détection des demandes en double (index MinHash/LSH des demandes ouvertes).
+
+Chaque demande ouverte est réduite à l'ensemble de ses mots et paires de
+mots (titre et description), puis à une signature MinHash de
+``DUPLICATE_SIGNATURE_SIZE`` valeurs : la part de valeurs égales entre deux
+signatures estime la similarité de Jaccard des deux ensembles. La
+signature est découpée en bandes ; deux demandes qui partagent une bande
+entière tombent dans le même seau et deviennent candidates. Seuls les
+candidats sont comparés, sans comparaison deux à deux de tout l'arriéré.
+
+Comme l'index FAQ, l'index est construit au premier appel, tenu à jour par
+les signaux de Request et reconstruit après ``DUPLICATE_INDEX_MAX_AGE``
+secondes.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import Request
+from .text import features, token_hash
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy est optionnel
+    np = None
+
+OPEN_STATUSES = ('en_attente', 'en_cours')
+# Plus grand nombre premier inférieur à 2**32 : (a * x + b) tient sur 64 bits.
+PRIME = 4294967291
+
+
+def shingles(title, description):
+    return set(features(f'{title or ""} {description or ""}'))
+
+
+class DuplicateIndex:
+    def __init__(self, size=None, bands=None):
+        self._size = size
+        self._bands = bands
+        self._lock = threading.Lock()
+        self.built_at = None
+        self._reset()
+
+    @property
+    def size(self):
+        return self._size or getattr(settings, 'DUPLICATE_SIGNATURE_SIZE', 64)
+
+    @property
+    def bands(self):
+        return self._bands or getattr(settings, 'DUPLICATE_LSH_BANDS', 16)
+
+    @property
+    def enabled(self):
+        return np is not None and getattr(settings, 'DUPLICATE_INDEX_ENABLED', True)
+
+    @property
+    def built(self):
+        return self.built_at is not None
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _reset(self):
+        self._signatures = {}
+        self._owners = {}
+        self._buckets = [defaultdict(set) for _ in range(self.bands)]
+        if np is not None:
+            rng = np.random.default_rng(0x5EED)
+            self._a = rng.integers(1, PRIME, self.size, dtype=np.uint64)
+            self._b = rng.integers(0, PRIME, self.size, dtype=np.uint64)
+
+    def signature(self, title, description):
+        values = np.fromiter((token_hash(shingle) for shingle in shingles(title, description)), dtype=np.uint64)
+        if not values.size:
+            return None
+        return ((np.outer(self._a, values) + self._b[:, None]) % PRIME).min(axis=1)
+
+    def _band_keys(self, signature):
+        rows = self.size // self.bands
+        return [signature[band * rows:(band + 1) * rows].tobytes() for band in range(self.bands)]
+
+    # -- construction et mises à jour ----------------------------------------
+
+    def build(self):
+        rows = list(
+            Request.objects.filter(status__in=OPEN_STATUSES)
+            .values_list('pk', 'user_id', 'title', 'description')
+        )
+        signatures = [(pk, (user_id, title), self.signature(title, description)) for pk, user_id, title, description in rows]
+        with self._lock:
+            self._reset()
+            for pk, owner, signature in signatures:
+                self._insert(pk, owner, signature)
+            self.built_at = time.monotonic()
+
+    def ensure_built(self):
+        if not self.enabled:
+            return False
+        if not self.built or time.monotonic() - self.built_at > getattr(settings, 'DUPLICATE_INDEX_MAX_AGE', 3600):
+            self.build()
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self.built_at = None
+
+    def _insert(self, pk, owner, signature):
+        if signature is None:
+            return
+        self._signatures[pk] = signature
+        self._owners[pk] = owner
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            buckets[key].add(pk)
+
+    def _remove(self, pk):
+        signature = self._signatures.pop(pk, None)
+        if signature is None:
+            return
+        del self._owners[pk]
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets[key]
+            bucket.discard(pk)
+            if not bucket:
+                del buckets[key]
+
+    def update(self, pk, user_id, title, description):
+        if not self.built:
+            return
+        signature = self.signature(title, description)
+        with self._lock:
+            self._remove(pk)
+            self._insert(pk, (user_id, title), signature)
+
+    def discard(self, *pks):
+        if not self.built:
+            return
+        with self._lock:
+            for pk in pks:
+                self._remove(pk)
+
+    # -- recherche ----------------------------------------------------------
+
+    def _similarity(self, first, second):
+        return float(np.mean(first == second))
+
+    def similar(self, title, description, user_id=None, exclude=None, limit=5):
+        """
+        Demandes ouvertes proches : liste de {'id', 'title', 'similarity'},
+        limitée à celles de ``user_id`` s'il est donné.
+        """
+        if not self.ensure_built():
+            return []
+        signature = self.signature(title, description)
+        if signature is None:
+            return []
+        threshold = getattr(settings, 'DUPLICATE_MIN_SIMILARITY', 0.5)
+        with self._lock:
+            candidates = set()
+            for buckets, key in zip(self._buckets, self._band_keys(signature)):
+                candidates |= buckets.get(key, set())
+            candidates.discard(exclude)
+            matches = []
+            for pk in candidates:
+                owner, candidate_title = self._owners[pk]
+                if user_id is not None and owner != user_id:
+                    continue
+                similarity = self._similarity(signature, self._signatures[pk])
+                if similarity >= threshold:
+                    matches.append({'id': pk, 'title': candidate_title, 'similarity': round(similarity, 2)})
+        matches.sort(key=lambda match: (-match['similarity'], match['id']))
+        return matches[:limit]
+
+    def clusters(self):
+        """Groupes de demandes ouvertes quasi identiques, en un seul passage sur les seaux."""
+        if not self.ensure_built():
+            return []
+        threshold = getattr(settings, 'DUPLICATE_MIN_SIMILARITY', 0.5)
+        parents = {}
+
+        def find(pk):
+            while parents[pk] != pk:
+                parents[pk] = pk = parents[parents[pk]]
+            return pk
+
+        with self._lock:
+            checked = set()
+            for buckets in self._buckets:
+                for bucket in buckets.values():
+                    if len(bucket) < 2:
+                        continue
+                    members = sorted(bucket)
+                    first = members[0]
+                    # Chaque membre est rattaché au premier du seau s'il lui ressemble assez.
+                    for pk in members[1:]:
+                        if (first, pk) in checked:
+                            continue
+                        checked.add((first, pk))
+                        if self._similarity(self._signatures[first], self._signatures[pk]) >= threshold:
+                            parents.setdefault(first, first)
+                            parents.setdefault(pk, pk)
+                            parents[find(pk)] = find(first)
+            groups = defaultdict(list)
+            for pk in parents:
+                groups[find(pk)].append(pk)
+            owners = dict(self._owners)
+
+        return sorted(
+            (
+                [{'id': pk, 'user_id': owners[pk][0], 'title': owners[pk][1]} for pk in sorted(members)]
+                for members in groups.values()
+            ),
+            key=lambda cluster: (-len(cluster), cluster[0]['id']),
+        )
+
+
+duplicate_index = DuplicateIndex()
@@ -0,0 +1,216 @@
+"""
+Index FAQ local de l'assistant IA.
+
+Les demandes résolues avec un commentaire d'administrateur (actives et
+archivées) forment des paires question/réponse. Chacune est représentée
+par son vecteur TF-IDF, projeté sur ``FAQ_INDEX_DIMENSIONS`` dimensions :
+chaque mot reçoit un vecteur aléatoire fixe, tiré de son hachage, et le
+document est la somme pondérée de ces vecteurs. Le produit scalaire de
+deux projections normalisées approche le cosinus des vecteurs TF-IDF, et
+une recherche n'est qu'un produit matrice-vecteur NumPy.
+
+L'index est construit au premier appel puis tenu à jour par les signaux de
+Request (résolution, modification, suppression). Les poids IDF sont figés
+entre deux reconstructions ; une reconstruction a lieu quand l'index a
+doublé ou après ``FAQ_INDEX_MAX_AGE`` secondes, ce qui reprend aussi les
+résolutions faites par les autres processus.
+"""
+import math
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+
+from .models import Request, ArchivedRequest
+from .text import token_hash, tokenize
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy est optionnel
+    np = None
+
+
+def dimensions():
+    return getattr(settings, 'FAQ_INDEX_DIMENSIONS', 256)
+
+
+@lru_cache(maxsize=65536)
+def _token_vector(token, dim):
+    return np.random.default_rng(token_hash(token)).standard_normal(dim).astype(np.float32)
+
+
+def _document_terms(title, description, comment):
+    # Le titre résume la question et compte double ; la réponse ne fait que
+    # compléter le vocabulaire de la question.
+    terms = Counter()
+    for text, weight in ((title, 2), (description, 1), (comment, 0.5)):
+        for token in tokenize(text):
+            terms[token] += weight
+    return terms
+
+
+class FaqIndex:
+    def __init__(self, dim=None):
+        self._dim = dim
+        self._lock = threading.Lock()
+        self.built_at = None
+        self._reset()
+
+    @property
+    def dim(self):
+        return self._dim or dimensions()
+
+    @property
+    def enabled(self):
+        return np is not None and getattr(settings, 'FAQ_INDEX_ENABLED', True)
+
+    @property
+    def built(self):
+        return self.built_at is not None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _reset(self):
+        self._matrix = np.zeros((0, self.dim), dtype=np.float32) if np is not None else None
+        self._ids = []
+        self._rows = {}
+        self._answers = {}
+        self._terms = {}
+        self._df = Counter()
+        self._idf_docs = 0
+
+    # -- construction -----------------------------------------------------
+
+    def _sources(self):
+        limit = getattr(settings, 'FAQ_INDEX_MAX_DOCUMENTS', 20000)
+        fields = ('pk', 'title', 'description', 'admin_comment')
+        live = (
+            Request.objects.filter(status='resolue', admin_comment__gt='')
+            .order_by('-resolved_at').values_list(*fields)[:limit]
+        )
+        rows = list(live)
+        if len(rows) < limit:
+            archived = (
+                ArchivedRequest.objects.filter(status='resolue', admin_comment__gt='')
+                .order_by('-resolved_at').values_list(*fields)[:limit - len(rows)]
+            )
+            rows.extend(archived)
+        return rows
+
+    def build(self):
+        rows = self._sources()
+        documents = [(pk, title, _document_terms(title, description, comment), comment) for pk, title, description, comment in rows]
+        with self._lock:
+            self._reset()
+            for _, _, terms, _ in documents:
+                self._df.update(set(terms))
+            self._idf_docs = len(documents)
+            vectors = [self._embed(terms) for _, _, terms, _ in documents]
+            self._matrix = np.vstack(vectors) if vectors else np.zeros((0, self.dim), dtype=np.float32)
+            for row, (pk, title, terms, comment) in enumerate(documents):
+                self._ids.append(pk)
+                self._rows[pk] = row
+                self._answers[pk] = (title, comment)
+                self._terms[pk] = set(terms)
+            self.built_at = time.monotonic()
+
+    def ensure_built(self):
+        if not self.enabled:
+            return False
+        max_age = getattr(settings, 'FAQ_INDEX_MAX_AGE', 3600)
+        stale = self.built and (
+            time.monotonic() - self.built_at > max_age or len(self._ids) > 2 * max(self._idf_docs, 16)
+        )
+        if not self.built or stale:
+            self.build()
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self.built_at = None
+
+    # -- vecteurs ---------------------------------------------------------
+
+    def _idf(self, token):
+        return math.log((1 + self._idf_docs) / (1 + self._df.get(token, 0))) + 1
+
+    def _embed(self, terms):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token, count in terms.items():
+            vector += math.log1p(count) * self._idf(token) * _token_vector(token, self.dim)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    # -- mises à jour incrémentales ----------------------------------------
+
+    def update(self, pk, title, description, comment):
+        """Ajoute ou remplace la demande ``pk`` ; sans commentaire, elle est retirée."""
+        if not self.built:
+            return
+        if not comment:
+            self.discard(pk)
+            return
+        terms = _document_terms(title, description, comment)
+        with self._lock:
+            self._df.subtract(self._terms.get(pk, ()))
+            self._df.update(set(terms))
+            vector = self._embed(terms)
+            row = self._rows.get(pk)
+            if row is None:
+                row = len(self._ids)
+                self._ids.append(pk)
+                self._rows[pk] = row
+                self._matrix = np.vstack([self._matrix, vector])
+            else:
+                self._matrix[row] = vector
+            self._answers[pk] = (title, comment)
+            self._terms[pk] = set(terms)
+
+    def discard(self, *pks):
+        if not self.built:
+            return
+        with self._lock:
+            for pk in pks:
+                row = self._rows.pop(pk, None)
+                if row is None:
+                    continue
+                self._df.subtract(self._terms.pop(pk))
+                del self._answers[pk]
+                # La dernière ligne prend la place de la ligne retirée.
+                last = len(self._ids) - 1
+                if row != last:
+                    moved = self._ids[last]
+                    self._ids[row] = moved
+                    self._rows[moved] = row
+                    self._matrix[row] = self._matrix[last]
+                self._ids.pop()
+                self._matrix = self._matrix[:last]
+
+    # -- recherche ----------------------------------------------------------
+
+    def search(self, text, limit=3):
+        """Demandes les plus proches de ``text`` : liste de (score, pk, titre, réponse)."""
+        if not self.ensure_built():
+            return []
+        tokens = tokenize(text)
+        with self._lock:
+            if not tokens or not self._ids:
+                return []
+            scores = self._matrix @ self._embed(Counter(tokens))
+            best = np.argsort(scores)[::-1][:limit]
+            return [(float(scores[row]), self._ids[row], *self._answers[self._ids[row]]) for row in best]
+
+    def answer(self, text):
+        """Meilleure réponse si sa similarité atteint ``FAQ_MIN_SIMILARITY``, sinon None."""
+        results = self.search(text, limit=1)
+        if not results or results[0][0] < getattr(settings, 'FAQ_MIN_SIMILARITY', 0.5):
+            return None
+        score, pk, title, comment = results[0]
+        return {'request_id': pk, 'title': title, 'answer': comment, 'score': round(score, 3)}
+
+
+faq_index = FaqIndex()
@@ -0,0 +1,169 @@
+"""
+Sérialisation en lecture seule pour les listes volumineuses.
+
+Chaque classe déclare la forme de sortie de son équivalent DRF sous forme de
+couples (clé de sortie, lookup ORM). Les lookups sont compilés une fois en
+une liste de colonnes ``values_list()`` et en index ; chaque ligne devient un
+dict sans instancier de modèle ni de champ DRF. Les dates restent des
+``datetime`` : ``renderers.ORJSONRenderer`` les encode directement.
+"""
+
+
+class ReadSerializer:
+    # (clé de sortie, lookup ORM)
+    fields = ()
+    # clé de sortie -> (lookup qui vaut NULL si l'objet imbriqué est absent, champs)
+    nested = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        lookups = []
+
+        def index_of(lookup):
+            if lookup not in lookups:
+                lookups.append(lookup)
+            return lookups.index(lookup)
+
+        cls._keys = tuple(key for key, _ in cls.fields)
+        cls._indexes = tuple(index_of(lookup) for _, lookup in cls.fields)
+        cls._nested = tuple(
+            (name, index_of(presence), tuple(key for key, _ in fields), tuple(index_of(lookup) for _, lookup in fields))
+            for name, (presence, fields) in cls.nested.items()
+        )
+        cls._lookups = tuple(lookups)
+
+    @classmethod
+    def row_converter(cls):
+        """Fonction ligne de values_list() -> dict, aux attributs de classe copiés en locales."""
+        keys, indexes, nested = cls._keys, cls._indexes, cls._nested
+
+        def convert(row):
+            item = {key: row[i] for key, i in zip(keys, indexes)}
+            for name, presence, nested_keys, nested_indexes in nested:
+                if row[presence] is None:
+                    item[name] = None
+                else:
+                    item[name] = {key: row[i] for key, i in zip(nested_keys, nested_indexes)}
+            return item
+
+        return convert
+
+    @classmethod
+    def iter_rows(cls, queryset):
+        convert = cls.row_converter()
+        for row in queryset.values_list(*cls._lookups):
+            yield convert(row)
+
+    @classmethod
+    def serialize(cls, queryset):
+        return list(cls.iter_rows(queryset))
+
+    @classmethod
+    async def aserialize(cls, queryset):
+        """``serialize`` pour les vues async (itération async de l'ORM)."""
+        convert = cls.row_converter()
+        return [convert(row) async for row in queryset.values_list(*cls._lookups)]
+
+
+class UserReadSerializer(ReadSerializer):
+    fields = (
+        ('id', 'id'),
+        ('email', 'email'),
+        ('username', 'username'),
+        ('first_name', 'first_name'),
+        ('role', 'role'),
+        ('created_at', 'created_at'),
+    )
+
+
+class UserDirectorySerializer(ReadSerializer):
+    # request_count est annoté par UserListCreateView.
+    fields = UserReadSerializer.fields + (
+        ('request_count', 'request_count'),
+    )
+
+
+class CategoryReadSerializer(ReadSerializer):
+    fields = (
+        ('id', 'id'),
+        ('name', 'name'),
+        ('open_requests', 'open_requests'),
+        ('resolved_requests', 'resolved_requests'),
+    )
+
+
+class FeedbackReadSerializer(ReadSerializer):
+    fields = (
+        ('id', 'id'),
+        ('rating', 'rating'),
+        ('comment', 'comment'),
+        ('created_at', 'created_at'),
+        ('request_id', 'request_id'),
+        ('request_title', 'request__title'),
+        ('client_name', 'user__username'),
+    )
+
+
+class RequestReadSerializer(ReadSerializer):
+    fields = (
+        ('id', 'id'),
+        ('user', 'user_id'),
+        ('user_name', 'user__username'),
+        ('title', 'title'),
+        ('description', 'description'),
+        ('first_name', 'user__first_name'),
+        ('category', 'category__name'),
+        ('status', 'status'),
+        ('admin_comment', 'admin_comment'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    )
+    nested = {
+        'feedback': ('feedback__id', (
+            ('id', 'feedback__id'),
+            ('rating', 'feedback__rating'),
+            ('comment', 'feedback__comment'),
+            ('created_at', 'feedback__created_at'),
+            ('request_id', 'id'),
+            ('request_title', 'title'),
+            ('client_name', 'feedback__user__username'),
+        )),
+    }
+
+
+class QueueItemReadSerializer(RequestReadSerializer):
+    fields = RequestReadSerializer.fields + (
+        ('priority_score', 'priority_score'),
+        ('claimed_by', 'claimed_by_id'),
+        ('claimed_at', 'claimed_at'),
+    )
+
+
+class NotificationReadSerializer(ReadSerializer):
+    fields = (
+        ('id', 'id'),
+        ('request_id', 'request_id'),
+        ('request_title', 'request__title'),
+        ('message', 'message'),
+        ('is_read', 'is_read'),
+        ('created_at', 'created_at'),
+    )
+
+
+class AIConversationReadSerializer(ReadSerializer):
+    fields = (
+        ('sender', 'sender'),
+        ('message', 'message'),
+        ('created_at', 'created_at'),
+    )
+
+
+class ArchivedRequestReadSerializer(ReadSerializer):
+    # Même forme que RequestReadSerializer ; l'avis est déjà un dict figé.
+    fields = RequestReadSerializer.fields + (
+        ('feedback', 'feedback'),
+    )
+
+
+class ArchivedNotificationReadSerializer(ReadSerializer):
+    fields = NotificationReadSerializer.fields
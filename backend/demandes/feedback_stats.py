@@ -0,0 +1,107 @@
+"""
+Agrégats d'avis par catégorie et par mois (FeedbackAggregate).
+
+Les compteurs sont ajustés par les signaux de Feedback et par les
+suppressions directes (deletion.py) ; ``summary`` ne lit que cette petite
+table, jamais celle des avis. Les avis archivés restent comptés.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Category, Feedback, FeedbackAggregate
+
+RATINGS = range(1, 6)
+AGGREGATE_FIELDS = ('count', 'rating_sum', *(f'rating_{rating}' for rating in RATINGS))
+
+
+def period_of(moment):
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def apply(category_id, period, ratings, sign=1):
+    """Ajoute (sign=1) ou retire (sign=-1) des notes au compteur (category_id, period)."""
+    if not ratings:
+        return
+    changes = {'count': len(ratings), 'rating_sum': sum(ratings)}
+    for rating in ratings:
+        field = f'rating_{min(max(rating, 1), 5)}'
+        changes[field] = changes.get(field, 0) + 1
+    rows = FeedbackAggregate.objects.filter(category_id=category_id, period=period)
+    increments = {field: F(field) + sign * value for field, value in changes.items()}
+    # Une seule requête dans le cas courant : la ligne du mois existe déjà.
+    if rows.update(**increments) or sign < 0:
+        return
+    try:
+        with transaction.atomic():
+            FeedbackAggregate.objects.create(category_id=category_id, period=period, **changes)
+    except IntegrityError:
+        rows.update(**increments)  # Créée entre-temps par une autre requête.
+
+
+def remove_feedbacks(pks):
+    """Retire des agrégats des avis sur le point d'être supprimés sans signaux."""
+    groups = defaultdict(list)
+    for category_id, created_at, rating in Feedback.objects.filter(pk__in=pks).values_list(
+        'request__category_id', 'created_at', 'rating',
+    ):
+        groups[category_id, period_of(created_at)].append(rating)
+    for (category_id, period), ratings in groups.items():
+        apply(category_id, period, ratings, sign=-1)
+
+
+def _totals():
+    return {'count': 0, 'rating_sum': 0, 'histogram': {str(r): 0 for r in RATINGS}}
+
+
+def _add(totals, row):
+    totals['count'] += row['count']
+    totals['rating_sum'] += row['rating_sum']
+    for rating in RATINGS:
+        totals['histogram'][str(rating)] += row[f'rating_{rating}']
+
+
+def _finish(totals):
+    totals['average'] = round(totals['rating_sum'] / totals['count'], 2) if totals['count'] else None
+    return totals
+
+
+def summary(since=None, until=None, category=None):
+    """Totaux, par catégorie et par mois, entre les mois ``since`` et ``until`` inclus."""
+    rows = FeedbackAggregate.objects.all()
+    if since is not None:
+        rows = rows.filter(period__gte=since.replace(day=1))
+    if until is not None:
+        rows = rows.filter(period__lte=until.replace(day=1))
+    if category:
+        rows = rows.filter(category__key=Category.key_of(category))
+
+    total, by_category, by_month = _totals(), defaultdict(_totals), defaultdict(_totals)
+    for row in rows.values(*AGGREGATE_FIELDS, 'period', 'category__name'):
+        _add(total, row)
+        _add(by_category[row['category__name']], row)
+        _add(by_month[row['period']], row)
+    return {
+        **_finish(total),
+        'by_category': [{'category': name, **_finish(t)} for name, t in sorted(by_category.items())],
+        'by_month': [{'period': period.strftime('%Y-%m'), **_finish(t)} for period, t in sorted(by_month.items())],
+    }
+
+
+def averages():
+    """(nombre d'avis, somme des notes) sur tous les agrégats, pour StatsView."""
+    count = rating_sum = 0
+    for row_count, row_sum in FeedbackAggregate.objects.values_list('count', 'rating_sum'):
+        count += row_count
+        rating_sum += row_sum
+    return count, rating_sum
+
+
+async def aaverages():
+    count = rating_sum = 0
+    async for row_count, row_sum in FeedbackAggregate.objects.values_list('count', 'rating_sum'):
+        count += row_count
+        rating_sum += row_sum
+    return count, rating_sum
@@ -0,0 +1,122 @@
+"""
+En-tête Idempotency-Key sur les écritures que le frontend peut renvoyer
+(nouvelle tentative après rafraîchissement du jeton, double envoi).
+
+La première requête réserve la clé (ligne IdempotencyKey par utilisateur,
+endpoint et clé) puis y enregistre sa réponse si elle réussit (2xx). Une
+répétition coûte une lecture par l'index unique et rejoue la réponse avec
+l'en-tête ``Idempotent-Replayed: true``, sans recréer de ligne ni de
+notification. Une répétition pendant le traitement reçoit 409, une clé
+réutilisée pour un autre corps 422. Un échec libère la clé pour qu'un
+nouvel essai repasse par la vue.
+
+Une réponse est conservée ``IDEMPOTENCY_KEY_TTL`` secondes ; une
+réservation restée en cours (processus arrêté) se reprend au bout de
+``IDEMPOTENCY_LOCK_TIMEOUT`` secondes. Les clés expirées sont purgées par
+la tâche purge_idempotency_keys (jobs.py).
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def fingerprint(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, cls=JSONEncoder).encode()).hexdigest()
+
+
+def _reserve(owner_id, endpoint, key, digest, now, lock_until):
+    """Réserve la clé jusqu'à ``lock_until`` ; renvoie None si réservée, sinon la ligne existante à rejouer."""
+    existing = IdempotencyKey.objects.filter(owner_id=owner_id, endpoint=endpoint, key=key).first()
+    if existing is None:
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    owner_id=owner_id, endpoint=endpoint, key=key, fingerprint=digest, expires_at=lock_until,
+                )
+            return None
+        except IntegrityError:
+            # Requête identique arrivée entre la lecture et l'insertion.
+            return IdempotencyKey.objects.get(owner_id=owner_id, endpoint=endpoint, key=key)
+    if existing.expires_at <= now:
+        # Réponse expirée ou réservation abandonnée : la clé est reprise.
+        taken = IdempotencyKey.objects.filter(pk=existing.pk, expires_at__lte=now).update(
+            fingerprint=digest, status_code=None, response='', expires_at=lock_until,
+        )
+        return None if taken else IdempotencyKey.objects.get(pk=existing.pk)
+    return existing
+
+
+def _replay(record, digest):
+    if record.fingerprint != digest:
+        return Response(
+            {"error": "Cette clé d'idempotence a déjà servi pour une autre requête"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record.status_code is None:
+        return Response(
+            {"error": "Une requête avec cette clé d'idempotence est en cours de traitement"},
+            status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'},
+        )
+    return Response(json.loads(record.response), status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(endpoint):
+    """
+    Décorateur de méthode de vue DRF (ou de fonction @api_view) : applique
+    l'en-tête Idempotency-Key pour les utilisateurs authentifiés.
+    """
+    def decorator(func):
+        @wraps(func)
+        def inner(*args, **kwargs):
+            request = args[0] if hasattr(args[0], 'META') else args[1]
+            key = request.headers.get(HEADER)
+            if not key or not request.user.is_authenticated:
+                return func(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {"error": f"{HEADER} : {MAX_KEY_LENGTH} caractères au plus"}, status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            # Les paramètres d'URL en font partie : même clé, autre demande évaluée = autre requête.
+            digest = fingerprint({'data': request.data, 'url': kwargs})
+            now = timezone.now()
+            lock_until = now + timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60))
+            record = _reserve(request.user.pk, endpoint, key, digest, now, lock_until)
+            if record is not None:
+                return _replay(record, digest)
+
+            # Notre réservation seulement : expirée, elle a pu être reprise par une autre requête.
+            reserved = IdempotencyKey.objects.filter(
+                owner_id=request.user.pk, endpoint=endpoint, key=key,
+                fingerprint=digest, status_code__isnull=True, expires_at=lock_until,
+            )
+            try:
+                response = func(*args, **kwargs)
+            except BaseException:
+                reserved.delete()
+                raise
+            if status.is_success(response.status_code) and getattr(response, 'data', None) is not None:
+                reserved.update(
+                    status_code=response.status_code,
+                    response=json.dumps(response.data, cls=JSONEncoder),
+                    expires_at=timezone.now() + timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400)),
+                )
+            else:
+                reserved.delete()
+            return response
+
+        return inner
+    return decorator
@@ -0,0 +1,70 @@
+"""
+Tâches de maintenance exécutées par le planificateur (scheduler.py), à la
+place des commandes de gestion correspondantes lancées à la main ou par
+cron. Planifications par défaut remplaçables par SCHEDULER_JOBS.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from . import archive, priority, retention
+from .deletion import purge_pending
+from .models import IdempotencyKey
+from .scheduler import Cron, Interval, scheduler
+
+
+@scheduler.register('refresh_priorities', Interval(minutes=15))
+def refresh_priorities():
+    return f'{priority.refresh_all()} scores recalculés'
+
+
+@scheduler.register('purge_deleted', Interval(minutes=10))
+def purge_deleted():
+    # Filet de sécurité de deletion.worker (suppressions interrompues par un redémarrage).
+    purged = purge_pending()
+    return f"{purged['requests']} demandes et {purged['users']} utilisateurs supprimés"
+
+
+@scheduler.register('purge_expired_tokens', Cron('0 * * * *'))
+def purge_expired_tokens():
+    """Jetons de rafraîchissement expirés et leur entrée en liste noire (comme flushexpiredtokens), par lots."""
+    batch_size = getattr(settings, 'RETENTION_BATCH_SIZE', 1000)
+    removed = 0
+    while True:
+        pks = list(OutstandingToken.objects.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return f'{removed} jetons expirés supprimés'
+        OutstandingToken.objects.filter(pk__in=pks).delete()
+        removed += len(pks)
+
+
+@scheduler.register('apply_retention', Cron('0 3 * * *'))
+def apply_retention():
+    batch_size = getattr(settings, 'RETENTION_BATCH_SIZE', 1000)
+    removed = {}
+    for name, policy_class in retention.POLICIES.items():
+        policy, removed[name] = policy_class(), 0
+        while True:
+            count = policy.run_batch(batch_size)
+            if not count:
+                break
+            removed[name] += count
+    return ', '.join(f'{name} : {count}' for name, count in removed.items())
+
+
+@scheduler.register('archive_requests', Cron('30 3 * * *'))
+def archive_requests():
+    requests, notifications = archive.archive()
+    return f'{requests} demandes et {notifications} notifications archivées'
+
+
+@scheduler.register('purge_idempotency_keys', Cron('15 * * * *'))
+def purge_idempotency_keys():
+    batch_size = getattr(settings, 'RETENTION_BATCH_SIZE', 1000)
+    removed = 0
+    while True:
+        pks = list(IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return f"{removed} clés d'idempotence expirées supprimées"
+        IdempotencyKey.objects.filter(pk__in=pks).delete()
+        removed += len(pks)
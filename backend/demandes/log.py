@@ -0,0 +1,141 @@
+"""
+Journalisation structurée sans écriture bloquante dans le thread de la requête.
+
+``QueueingHandler`` ne fait que poser l'enregistrement dans une file bornée ;
+un ``QueueListener`` le formate en JSON (``JsonFormatter``, une ligne par
+enregistrement) et l'écrit depuis son propre thread. File pleine :
+l'enregistrement est abandonné et compté plutôt que de bloquer la vue.
+
+``SamplingFilter`` ne garde qu'une fraction des enregistrements sous
+WARNING, par logger (``LOGGING_SAMPLING``). Le tout se configure dans
+``settings.LOGGING``.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson est optionnel
+    orjson = None
+
+# Attributs propres à LogRecord : tout le reste vient de ``extra=``.
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def to_dict(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = self.formatStack(record.stack_info)
+        return data
+
+    def format(self, record):
+        data = self.to_dict(record)
+        if orjson is not None:
+            return orjson.dumps(data, default=str).decode()
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Garde une fraction ``rates[logger]`` des enregistrements sous WARNING ;
+    le taux d'un logger est celui de son plus proche parent configuré.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self._resolved = {}
+
+    def rate_for(self, name):
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate, candidate = 1.0, name
+            while candidate:
+                if candidate in self.rates:
+                    rate = self.rates[candidate]
+                    break
+                candidate = candidate.rpartition('.')[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class QueueingHandler(QueueHandler):
+    """
+    Handler à placer sur les loggers : pose l'enregistrement dans une file,
+    écrite en JSON sur ``stream`` par un thread d'écriture.
+    """
+
+    def __init__(self, stream=None, maxsize=10000, level=logging.NOTSET):
+        super().__init__(queue.Queue(maxsize))
+        self.setLevel(level)
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.target.setFormatter(JsonFormatter())
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        atexit.register(self.stop)
+
+    def start(self):
+        # Après un fork (serveurs à processus préchargés), le thread d'écriture
+        # du parent n'existe pas dans l'enfant : on en démarre un par processus.
+        if self._pid == os.getpid():
+            return
+        with self.lock:
+            if self._pid != os.getpid():
+                self._listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def stop(self):
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def prepare(self, record):
+        # Seule mise en forme faite dans le thread appelant : le message et
+        # la trace d'exception, qui référencent des objets encore vivants.
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = JsonFormatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self.stop()
+        super().close()
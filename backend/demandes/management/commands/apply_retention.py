@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from demandes.retention import POLICIES
+
+
+class Command(BaseCommand):
+    help = (
+        "Applique les politiques de rétention (notifications par utilisateur, "
+        "notifications lues anciennes, historique IA, traces de suppression) "
+        "par lots bornés. Relancer la commande reprend là où elle s'est arrêtée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--policy', action='append', choices=sorted(POLICIES), help="Politique à appliquer (répétable, défaut : toutes).")
+        parser.add_argument('--batch-size', type=int, help="Lignes par lot (défaut : RETENTION_BATCH_SIZE).")
+        parser.add_argument('--max-batches', type=int, help="Nombre maximal de lots par politique.")
+        parser.add_argument('--sleep', type=float, default=0, help="Pause entre deux lots, en secondes.")
+        parser.add_argument('--dry-run', action='store_true', help="Affiche ce qui serait supprimé sans rien modifier.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or getattr(settings, 'RETENTION_BATCH_SIZE', 1000)
+        for name in options['policy'] or POLICIES:
+            policy = POLICIES[name]()
+            if options['dry_run']:
+                self.stdout.write(f"{name} : {policy.count()} lignes concernées")
+                continue
+
+            removed = batches = 0
+            while options['max_batches'] is None or batches < options['max_batches']:
+                count = policy.run_batch(batch_size)
+                if not count:
+                    break
+                removed += count
+                batches += 1
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+            self.stdout.write(self.style.SUCCESS(f"{name} : {removed} lignes supprimées en {batches} lots"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from demandes import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Déplace par lots les demandes résolues ou rejetées depuis plus de "
+        "--older-than-days jours (défaut : ARCHIVE_AFTER_DAYS), avec leurs "
+        "notifications, vers les tables d'archives."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int)
+        parser.add_argument('--batch-size', type=int, help="Défaut : ARCHIVE_BATCH_SIZE.")
+        parser.add_argument('--limit', type=int, help="Nombre maximal de demandes à archiver.")
+        parser.add_argument('--dry-run', action='store_true', help="Compte les demandes concernées sans rien déplacer.")
+
+    def handle(self, *args, **options):
+        before = archive.cutoff(options['older_than_days'])
+        if options['dry_run']:
+            count = archive.archivable(before).count()
+            self.stdout.write(f"{count} demandes archivables (dernière modification avant {before:%Y-%m-%d}).")
+            return
+
+        requests, notifications = archive.archive(before, options['batch_size'], options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{requests} demandes et {notifications} notifications archivées."
+        ))
@@ -0,0 +1,98 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from demandes.benchmarks import summarize, write_results, compare_results, default_output
+from demandes.models import User, Request, Feedback, Notification, AIConversation
+
+# (nom, URL, rôle de l'utilisateur qui appelle)
+ENDPOINTS = [
+    ('requests', '/api/requests/', 'client'),
+    ('requests_all', '/api/requests/all/', 'admin'),
+    ('stats', '/api/stats/', 'admin'),
+    ('notifications', '/notifications/', 'client'),
+    ('feedbacks', '/api/feedbacks/', 'admin'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la latence (p50/p99), le nombre de requêtes SQL et le débit des principaux endpoints. "
+        "À lancer sur SQLite : python manage.py benchmark_api --settings=backend.settings_bench"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help="Limiter à certains endpoints.")
+        parser.add_argument('--output', help="Fichier JSON de résultats (défaut : benchmarks/api-<révision>.json).")
+        parser.add_argument('--compare', help="Fichier JSON d'une exécution précédente à comparer.")
+
+    def handle(self, *args, **options):
+        users = {
+            'admin': User.objects.filter(role='admin').order_by('id').first(),
+            'client': User.objects.filter(role='client').annotate(n=Count('requests')).order_by('-n').first(),
+        }
+        if not all(users.values()):
+            raise CommandError("Aucune donnée : lancez d'abord generate_synthetic_data.")
+
+        clients = {}
+        for role, user in users.items():
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+            clients[role] = client
+
+        results = {}
+        for name, url, role in ENDPOINTS:
+            if options['endpoints'] and name not in options['endpoints']:
+                continue
+            results[name] = self.run_endpoint(clients[role], url, options['iterations'], options['warmup'])
+            self.stdout.write(f"{name:15} {json.dumps(results[name])}")
+
+        output = write_results(options['output'] or default_output('api'), {
+            'dataset': {
+                'users': User.objects.count(),
+                'requests': Request.objects.count(),
+                'feedbacks': Feedback.objects.count(),
+                'notifications': Notification.objects.count(),
+                'ai_messages': AIConversation.objects.count(),
+            },
+            'iterations': options['iterations'],
+            'results': results,
+        })
+        self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {output}"))
+
+        if options['compare']:
+            with open(options['compare']) as fh:
+                previous = json.load(fh)
+            with open(output) as fh:
+                current = json.load(fh)
+            for line in compare_results(previous, current):
+                self.stdout.write(line)
+
+    def run_endpoint(self, client, url, iterations, warmup):
+        for _ in range(warmup):
+            self.check_response(client.get(url), url)
+
+        timings, queries, sizes = [], [], []
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = client.get(url)
+                # Le rendu fait partie du coût : on force la lecture du contenu.
+                content = response.content
+                timings.append(time.perf_counter() - start)
+            self.check_response(response, url)
+            queries.append(len(ctx.captured_queries))
+            sizes.append(len(content))
+        return summarize(timings, queries, sizes)
+
+    def check_response(self, response, url):
+        if response.status_code != 200:
+            raise CommandError(f"{url} a répondu {response.status_code}")
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test.utils import override_settings
+from django.urls import clear_url_caches
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from demandes.benchmarks import summarize, write_results, default_output
+from demandes.models import User
+
+# (nom, URL, rôle de l'utilisateur qui appelle)
+ENDPOINTS = [
+    ('requests', '/api/requests/', 'client'),
+    ('notifications', '/notifications/', 'client'),
+    ('stats', '/api/stats/', 'admin'),
+    ('ai_history', '/api/ai-assistant/history/', 'client'),
+]
+
+# Mode -> URLconf : les vues DRF de backend.urls (exécutées dans un thread
+# par requête) ou les vues async de demandes.async_views.
+MODES = [
+    ('sync', 'backend.urls'),
+    ('async', 'demandes.async_views'),
+]
+
+
+async def call(app, scope):
+    """Envoie une requête à l'application ASGI ; renvoie le statut HTTP."""
+    status = None
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Le client ne se déconnecte jamais : Django annule cette attente en fin de réponse.
+        await asyncio.Future()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await app(dict(scope), receive, send)
+    return status
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare, dans un seul processus ASGI, les vues de lecture synchrones (un thread par requête) "
+        "et les vues async (async_views.py) à plusieurs niveaux de connexions simultanées. "
+        "À lancer sur SQLite : python manage.py benchmark_async --settings=backend.settings_bench"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requêtes par niveau de concurrence.")
+        parser.add_argument('--concurrency', default='1,10,50,200', help="Niveaux de connexions simultanées.")
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help="Limiter à certains endpoints.")
+        parser.add_argument('--output', help="Fichier JSON de résultats (défaut : benchmarks/async-<révision>.json).")
+
+    def handle(self, *args, **options):
+        if getattr(settings, 'ASYNC_READ_VIEWS', False):
+            raise CommandError("ASYNC_READ_VIEWS doit être désactivé : le mode sync utilise backend.urls.")
+        users = {
+            'admin': User.objects.filter(role='admin').order_by('id').first(),
+            'client': User.objects.filter(role='client').annotate(n=Count('requests')).order_by('-n').first(),
+        }
+        if not all(users.values()):
+            raise CommandError("Aucune donnée : lancez d'abord generate_synthetic_data.")
+        tokens = {role: str(RefreshToken.for_user(user).access_token) for role, user in users.items()}
+        levels = [int(level) for level in options['concurrency'].split(',')]
+
+        app = ASGIHandler()
+        results = {}
+        for name, url, role in ENDPOINTS:
+            if options['endpoints'] and name not in options['endpoints']:
+                continue
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': url, 'raw_path': url.encode(), 'root_path': '',
+                'query_string': b'', 'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+                'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {tokens[role]}'.encode())],
+            }
+            for mode, urlconf in MODES:
+                with override_settings(ROOT_URLCONF=urlconf):
+                    clear_url_caches()
+                    for level in levels:
+                        key = f'{name}:{mode}:c{level}'
+                        results[key] = asyncio.run(self.run_level(app, scope, options['requests'], level))
+                        self.stdout.write(f"{key:30} {json.dumps(results[key])}")
+            clear_url_caches()
+
+        output = write_results(options['output'] or default_output('async'), {
+            'requests_per_level': options['requests'],
+            'concurrency': levels,
+            'results': results,
+        })
+        self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {output}"))
+
+    async def run_level(self, app, scope, total, concurrency):
+        slots = asyncio.Semaphore(concurrency)
+        timings, statuses = [], Counter()
+        peak_threads = threading.active_count()
+
+        async def one():
+            async with slots:
+                started = time.perf_counter()
+                statuses[await call(app, scope)] += 1
+                timings.append(time.perf_counter() - started)
+
+        async def sample_threads():
+            nonlocal peak_threads
+            while True:
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.005)
+
+        sampler = asyncio.create_task(sample_threads())
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+
+        summary = summarize(timings)
+        # Débit réel sur l'horloge murale : les requêtes se chevauchent.
+        summary['throughput_rps'] = round(total / elapsed, 1) if elapsed else 0.0
+        summary['peak_threads'] = peak_threads
+        summary['errors'] = total - statuses[200]
+        return summary
@@ -0,0 +1,61 @@
+import json
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.core.signals import request_started, request_finished
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from demandes.benchmarks import summarize, write_results, default_output
+from demandes.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le coût par requête avec et sans connexions persistantes (CONN_MAX_AGE) "
+        "en rejouant le cycle request_started/request_finished de Django."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--conn-max-age', type=int, default=60)
+        parser.add_argument('--output', help="Fichier JSON de résultats (défaut : benchmarks/connections-<révision>.json).")
+
+    def handle(self, *args, **options):
+        original = connection.settings_dict['CONN_MAX_AGE']
+        results = {}
+        try:
+            for label, max_age in (('per_request', 0), ('persistent', options['conn_max_age'])):
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = max_age
+                results[label] = self.run(options['iterations'])
+                self.stdout.write(f"{label:12} {json.dumps(results[label])}")
+        finally:
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = original
+
+        output = write_results(options['output'] or default_output('connections'), {
+            'iterations': options['iterations'],
+            'results': results,
+        })
+        self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {output}"))
+
+    def run(self, iterations):
+        connects = []
+        connection_created.connect(lambda **kwargs: connects.append(1), weak=False, dispatch_uid='bench-connects')
+        timings = []
+        try:
+            for _ in range(iterations):
+                start = time.perf_counter()
+                # Même séquence qu'une requête HTTP : close_old_connections()
+                # est branché sur ces deux signaux.
+                request_started.send(sender=WSGIHandler, environ={})
+                User.objects.exists()
+                request_finished.send(sender=WSGIHandler)
+                timings.append(time.perf_counter() - start)
+        finally:
+            connection_created.disconnect(dispatch_uid='bench-connects')
+        summary = summarize(timings)
+        summary['connections_per_request'] = round(len(connects) / iterations, 3)
+        return summary
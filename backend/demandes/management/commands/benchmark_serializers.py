@@ -0,0 +1,54 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from demandes.benchmarks import write_results, default_output
+from demandes.fast_serializers import RequestReadSerializer
+from demandes.models import Request
+from demandes.renderers import ORJSONRenderer
+from demandes.serializers import RequestSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit (lignes/s) de RequestSerializer + JSONRenderer et de "
+        "RequestReadSerializer + ORJSONRenderer sur la liste complète des demandes. "
+        "Générer d'abord les données : generate_synthetic_data --requests 100000."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--output', help="Fichier JSON de résultats (défaut : benchmarks/serializers-<révision>.json).")
+
+    def handle(self, *args, **options):
+        queryset = Request.objects.order_by('-created_at')[:options['rows']]
+        rows = queryset.count()
+        if not rows:
+            raise CommandError("Aucune demande : lancez d'abord generate_synthetic_data.")
+
+        paths = {
+            'drf': lambda: JSONRenderer().render(
+                RequestSerializer(queryset.select_related('user', 'feedback__user'), many=True).data
+            ),
+            'fast': lambda: ORJSONRenderer().render(RequestReadSerializer.serialize(queryset)),
+        }
+        results = {}
+        for name, render in paths.items():
+            best = min(self.measure(render) for _ in range(options['repeat']))
+            results[name] = {'rows': rows, 'seconds': round(best, 4), 'rows_per_second': int(rows / best)}
+            self.stdout.write(f"{name:5} {json.dumps(results[name])}")
+
+        speedup = results['drf']['seconds'] / results['fast']['seconds']
+        output = write_results(options['output'] or default_output('serializers'), {
+            'results': results,
+            'speedup': round(speedup, 2),
+        })
+        self.stdout.write(self.style.SUCCESS(f"x{speedup:.1f} ; résultats écrits dans {output}"))
+
+    def measure(self, render):
+        start = time.perf_counter()
+        render()
+        return time.perf_counter() - start
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from demandes import classifier
+from demandes.models import Request
+
+
+class Command(BaseCommand):
+    help = (
+        "Reclasse par lots les demandes encore dans la catégorie par défaut "
+        "(ou toutes avec --all) à l'aide du modèle de train_classifier."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Reclasse aussi les demandes déjà classées.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Affiche les changements sans rien modifier.")
+
+    def handle(self, *args, **options):
+        if classifier.model_store.get() is None:
+            raise CommandError(f"Aucun modèle dans {classifier.model_path()} : lancez d'abord train_classifier.")
+        queryset = Request.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(category__name=classifier.DEFAULT_CATEGORY)
+
+        started = time.perf_counter()
+        result = classifier.reclassify(queryset, options['batch_size'], options['dry_run'])
+        elapsed = time.perf_counter() - started
+        rate = result['scanned'] / elapsed if elapsed else 0
+        for category, count in sorted(result['by_category'].items()):
+            self.stdout.write(f"  {category} : {count}")
+        verb = "seraient reclassées" if options['dry_run'] else "reclassées"
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['changed']} demandes {verb} sur {result['scanned']} ({rate:.0f} demandes/s)."
+        ))
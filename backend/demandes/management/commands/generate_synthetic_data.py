@@ -0,0 +1,190 @@
+import random
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from demandes import categories as category_counters
+from demandes import feedback_stats, priority
+from demandes.models import User, Category, Request, RequestStatusEvent, Feedback, Notification, AIConversation
+
+EMAIL_DOMAIN = 'synthetic.local'
+
+STATUS_WEIGHTS = {'en_attente': 30, 'en_cours': 20, 'resolue': 40, 'rejetee': 10}
+CATEGORY_WEIGHTS = {
+    'Informatique': 30,
+    'Réseau': 15,
+    'Matériel': 15,
+    'Logiciel': 15,
+    'Ressources humaines': 10,
+    'Autre': 15,
+}
+RATING_WEIGHTS = {1: 5, 2: 10, 3: 20, 4: 35, 5: 30}
+
+SUBJECTS = ['imprimante', 'connexion VPN', 'messagerie', 'poste de travail', 'badge', 'logiciel de paie', 'Wi-Fi', 'écran']
+PROBLEMS = ['ne fonctionne plus', 'est très lent', 'affiche une erreur', 'doit être installé', 'demande un accès']
+
+
+def weighted_choices(rng, weights, k):
+    return rng.choices(list(weights), weights=list(weights.values()), k=k)
+
+
+class Command(BaseCommand):
+    help = "Génère un jeu de données synthétique (utilisateurs, demandes, feedbacks, notifications, IA) avec bulk_create."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--admins', type=int, default=3)
+        parser.add_argument('--days', type=int, default=365, help="Étalement des dates de création.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--clear', action='store_true', help="Supprime d'abord les données synthétiques existantes.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        if options['clear']:
+            deleted, _ = User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+            self.stdout.write(f"{deleted} objets synthétiques supprimés.")
+
+        with transaction.atomic():
+            users, admins = self.create_users(options['users'], options['admins'], batch_size)
+            requests = self.create_requests(rng, users, options['requests'], options['days'], batch_size)
+            self.create_status_events(rng, requests, batch_size)
+            feedback_count = self.create_feedback(rng, requests, batch_size)
+            notification_count = self.create_notifications(rng, requests, batch_size)
+            conversation_count = self.create_conversations(rng, users, batch_size)
+            # Scores de la file des admins, une fois dates et avis en place.
+            if requests:
+                priority.refresh(Request.objects.filter(pk__gte=requests[0].pk), batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(users)} clients, {len(admins)} admins, {len(requests)} demandes, "
+            f"{feedback_count} feedbacks, {notification_count} notifications, "
+            f"{conversation_count} messages IA générés."
+        ))
+
+    def create_users(self, count, admin_count, batch_size):
+        # Un seul hachage pour tout le jeu : le hachage est volontairement lent.
+        password = make_password('synthetic')
+        offset = User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').count()
+        new_users = []
+        for i in range(offset, offset + count + admin_count):
+            role = 'admin' if i - offset < admin_count else 'client'
+            email = f'{role}{i}@{EMAIL_DOMAIN}'
+            new_users.append(User(
+                username=email, email=email, first_name=f'{role.capitalize()} {i}', password=password, role=role,
+            ))
+        User.objects.bulk_create(new_users, batch_size=batch_size)
+
+        # MySQL ne renvoie pas les clés après bulk_create : on relit les lignes.
+        created = User.objects.filter(email__in=[u.email for u in new_users])
+        admins = [u for u in created if u.role == 'admin']
+        clients = [u for u in created if u.role == 'client']
+        return clients, admins
+
+    def create_requests(self, rng, users, count, days, batch_size):
+        if not users:
+            return []
+        now = timezone.now()
+        statuses = weighted_choices(rng, STATUS_WEIGHTS, count)
+        categories = weighted_choices(rng, CATEGORY_WEIGHTS, count)
+        category_ids = {name: Category.objects.resolve(name).pk for name in set(categories)}
+        new_requests, created_dates = [], []
+        for status, category in zip(statuses, categories):
+            created_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+            resolved_at = None
+            if status == 'resolue':
+                resolved_at = min(now, created_at + timedelta(hours=rng.expovariate(1 / 48)))
+            subject = rng.choice(SUBJECTS)
+            new_requests.append(Request(
+                user=rng.choice(users),
+                status=status,
+                category_id=category_ids[category],
+                title=f"Problème de {subject}",
+                description=f"Mon {subject} {rng.choice(PROBLEMS)} depuis ce matin.",
+                admin_comment="Traité par le support." if status in ('resolue', 'rejetee') else None,
+                resolved_at=resolved_at,
+            ))
+            created_dates.append(created_at)
+
+        start_id = Request.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        Request.objects.bulk_create(new_requests, batch_size=batch_size)
+        # bulk_create n'envoie pas post_save : compteurs de catégorie ajustés ici.
+        category_counters.adjust(Counter(
+            key for key in (category_counters.counted(r.category_id, r.status) for r in new_requests) if key is not None
+        ))
+
+        # created_at est auto_now_add : on réécrit les dates après insertion.
+        created = list(Request.objects.filter(id__gt=start_id, user__in=users).order_by('id'))
+        for req, created_at in zip(created, created_dates):
+            req.created_at = created_at
+        Request.objects.bulk_update(created, ['created_at'], batch_size=batch_size)
+        return created
+
+    def create_status_events(self, rng, requests, batch_size):
+        now = timezone.now()
+        events = []
+        for req in requests:
+            events.append(RequestStatusEvent(request=req, from_status='', to_status='en_attente', created_at=req.created_at))
+            if req.status == 'en_attente':
+                continue
+            changed_at = req.resolved_at or min(now, req.created_at + timedelta(hours=rng.expovariate(1 / 24)))
+            events.append(RequestStatusEvent(
+                request=req, from_status='en_attente', to_status=req.status, created_at=changed_at,
+                seconds_in_previous=(changed_at - req.created_at).total_seconds(),
+            ))
+        RequestStatusEvent.objects.bulk_create(events, batch_size=batch_size)
+
+    def create_feedback(self, rng, requests, batch_size):
+        feedbacks = [
+            Feedback(
+                user_id=req.user_id,
+                request=req,
+                rating=weighted_choices(rng, RATING_WEIGHTS, 1)[0],
+                comment=rng.choice(['Merci !', 'Rapide et efficace.', 'Un peu long.', None]),
+            )
+            for req in requests
+            if req.status == 'resolue' and rng.random() < 0.6
+        ]
+        Feedback.objects.bulk_create(feedbacks, batch_size=batch_size)
+        # Pas de post_save non plus : agrégats d'avis remplis ici, un appel par (catégorie, mois).
+        ratings = defaultdict(list)
+        for feedback in feedbacks:
+            ratings[feedback.request.category_id, feedback_stats.period_of(feedback.created_at)].append(feedback.rating)
+        for (category_id, period), values in ratings.items():
+            feedback_stats.apply(category_id, period, values, sign=1)
+        return len(feedbacks)
+
+    def create_notifications(self, rng, requests, batch_size):
+        notifications = []
+        for req in requests:
+            if req.status == 'en_attente':
+                continue
+            for _ in range(rng.randint(1, 3)):
+                notifications.append(Notification(
+                    user_id=req.user_id,
+                    request=req,
+                    message=f"Votre demande '{req.title}' a été mise à jour : Statut changé à '{req.get_status_display()}'.",
+                    is_read=rng.random() < 0.7,
+                ))
+        Notification.objects.bulk_create(notifications, batch_size=batch_size)
+        return len(notifications)
+
+    def create_conversations(self, rng, users, batch_size):
+        messages = []
+        for user in users:
+            for _ in range(rng.randint(0, 5)):
+                subject = rng.choice(SUBJECTS)
+                messages.append(AIConversation(user=user, sender='user', message=f"Comment réparer mon {subject} ?"))
+                messages.append(AIConversation(
+                    user=user, sender='ai',
+                    message=f"Essayez de redémarrer votre {subject}, puis créez une demande si le problème persiste.",
+                ))
+        AIConversation.objects.bulk_create(messages, batch_size=batch_size)
+        return len(messages)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from demandes.deletion import purge_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Termine les suppressions de demandes et d'utilisateurs marquées par "
+        "l'API, par lots de --batch-size lignes (défaut : DELETION_BATCH_SIZE)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        purged = purge_pending(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{purged['requests']} demandes et {purged['users']} utilisateurs supprimés."
+        ))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from demandes import priority
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule le score de priorité des demandes ouvertes (file /api/queue/). "
+        "Le score dépend de l'ancienneté : à lancer périodiquement, et une fois "
+        "après la migration qui l'introduit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = priority.refresh_all(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} scores de priorité recalculés en {time.perf_counter() - started:.1f} s."
+        ))
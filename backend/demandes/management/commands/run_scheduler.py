@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from demandes.scheduler import scheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute le planificateur de tâches de maintenance dans ce processus "
+        "(pour un processus dédié quand SCHEDULER_ENABLED est désactivé sur les workers web). "
+        "--once traite les tâches échues puis s'arrête, --job exécute une tâche tout de suite, "
+        "--list affiche l'état des tâches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true')
+        parser.add_argument('--job', action='append', dest='jobs', help="Tâche à exécuter immédiatement (répétable).")
+        parser.add_argument('--list', action='store_true')
+
+    def handle(self, *args, **options):
+        active = scheduler.schedules()
+        if options['list']:
+            for job in scheduler.status():
+                line = f"{job['name']:22} {job['schedule']:18} prochaine : {job['next_run_at'] or '-'}"
+                if job['last_started_at']:
+                    line += f" | dernière : {job['last_started_at']} {job['last_status']} {job['last_duration_ms']} ms"
+                if job['locked_by']:
+                    line += f" | en cours sur {job['locked_by']}"
+                self.stdout.write(line)
+            return
+
+        if options['jobs']:
+            for name in options['jobs']:
+                if name not in active:
+                    raise CommandError(f"Tâche inconnue ou désactivée : {name} (tâches : {', '.join(active)})")
+                self.report(scheduler.run_now(name), name)
+            return
+
+        if options['once']:
+            for run in scheduler.run_pending():
+                self.report(run, run.job)
+            return
+
+        self.stdout.write(f"Planificateur démarré ({len(active)} tâches) ; Ctrl+C pour arrêter.")
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            pass
+
+    def report(self, run, name):
+        if run is None:
+            self.stdout.write(self.style.WARNING(f"{name} : déjà en cours sur un autre worker."))
+        elif run.status == 'succes':
+            self.stdout.write(self.style.SUCCESS(f"{name} : {run.result or 'terminé'} ({run.duration_ms} ms)"))
+        else:
+            self.stdout.write(self.style.ERROR(f"{name} : échec ({run.duration_ms} ms)\n{run.result}"))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from demandes import classifier
+
+
+class Command(BaseCommand):
+    help = (
+        "Entraîne le classement automatique des demandes sur les demandes déjà "
+        "classées (hors « Autre ») et l'enregistre dans CLASSIFIER_MODEL_PATH. "
+        "Les processus web relisent le fichier au prochain appel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Fichier du modèle (défaut : CLASSIFIER_MODEL_PATH).")
+        parser.add_argument('--features', type=int, help="Nombre de colonnes hachées (défaut : CLASSIFIER_FEATURES).")
+        parser.add_argument('--alpha', type=float, help="Lissage de Laplace (défaut : CLASSIFIER_ALPHA).")
+
+    def handle(self, *args, **options):
+        if classifier.np is None:
+            raise CommandError("numpy est requis pour entraîner le classement automatique.")
+        texts, labels = classifier.training_data()
+        if len(set(labels)) < 2:
+            raise CommandError("Il faut des demandes classées dans au moins deux catégories.")
+
+        started = time.perf_counter()
+        model = classifier.NaiveBayes.train(texts, labels, options['features'], options['alpha'])
+        elapsed = time.perf_counter() - started
+        path = options['output'] or classifier.model_path()
+        model.save(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Modèle entraîné sur {len(texts)} demandes ({len(model.categories)} catégories) "
+            f"en {elapsed:.2f} s, enregistré dans {path}."
+        ))
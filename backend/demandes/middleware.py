@@ -0,0 +1,192 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import compression, profiling, routers
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def client_key(request):
+    """Identifie le client sans requête SQL : l'id utilisateur du JWT, sinon la session."""
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if header.startswith('Bearer '):
+        try:
+            return f"user:{AccessToken(header[7:])['user_id']}"
+        except (TokenError, KeyError):
+            return None
+    session_key = request.COOKIES.get('sessionid')
+    return f'session:{session_key}' if session_key else None
+
+
+class HybridMiddleware:
+    """
+    Middleware utilisable en WSGI comme en ASGI : sous ASGI, Django
+    l'appelle directement en async au lieu de l'envelopper dans un thread
+    (voir async_views.py). Les sous-classes définissent ``call`` et ``acall``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+        return self.call(request)
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    """
+    Profile la requête quand elle porte un jeton de profilage signé dans
+    l'en-tête X-Profile (voir profiling.py) ; l'id du profil est renvoyé
+    dans l'en-tête X-Profile-Id.
+    """
+
+    def profiled_by(self, request):
+        token = request.META.get(profiling.HEADER)
+        if not token or not profiling.enabled():
+            return None
+        return profiling.check_token(token)
+
+    def call(self, request):
+        user_id = self.profiled_by(request)
+        if user_id is None:
+            return self.get_response(request)
+        response, profile_id = profiling.profiler.run(request, user_id, self.get_response)
+        response.headers['X-Profile-Id'] = profile_id or 'busy'
+        return response
+
+    async def acall(self, request):
+        # Vérification du signataire (ORM) hors de la boucle, seulement si un jeton est présent.
+        user_id = await sync_to_async(self.profiled_by)(request) if request.META.get(profiling.HEADER) else None
+        if user_id is None:
+            return await self.get_response(request)
+        response, profile_id = await profiling.profiler.arun(request, user_id, self.get_response)
+        response.headers['X-Profile-Id'] = profile_id or 'busy'
+        return response
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Autorise les lectures sur réplique pour les requêtes GET/HEAD/OPTIONS,
+    sauf si le client a écrit récemment (cache + cookie ``replica_pin``).
+    """
+
+    def activate(self, request):
+        key = client_key(request)
+        safe = request.method in SAFE_METHODS
+        # Cache local (LocMemCache) : lecture en mémoire, sans attente, y compris sous ASGI.
+        pinned = routers.PIN_COOKIE in request.COOKIES or routers.is_pinned(key)
+        return key, safe, routers.activate(safe and not pinned)
+
+    def finish(self, key, safe, wrote, response):
+        if wrote or (not safe and response.status_code < 400):
+            routers.pin(key)
+            response.set_cookie(routers.PIN_COOKIE, '1', max_age=routers.pin_seconds(), httponly=True, samesite='Lax')
+        return response
+
+    def call(self, request):
+        key, safe, token = self.activate(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.deactivate(token)
+        return self.finish(key, safe, wrote, response)
+
+    async def acall(self, request):
+        # L'état de routage est une ContextVar : les requêtes ORM async
+        # (sync_to_async) en reçoivent une copie et le voient.
+        key, safe, token = self.activate(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = routers.deactivate(token)
+        return self.finish(key, safe, wrote, response)
+
+
+class CompressionMiddleware(HybridMiddleware):
+    """
+    Compresse les réponses selon Accept-Encoding (zstd, br puis gzip selon les
+    modules installés). Les réponses classiques sous COMPRESSION_MIN_SIZE ne
+    sont pas compressées. Les StreamingHttpResponse sont compressées morceau
+    par morceau, avec un flush après chacun. Les octets économisés sont
+    comptés par endpoint dans compression.stats.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.codecs = compression.available_codecs()
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+    def call(self, request):
+        return self.compress(request, self.get_response(request))
+
+    async def acall(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        # Contenu en flux asynchrone : codec.stream() ne lit que des itérables synchrones.
+        if not self.should_compress(response) or getattr(response, 'is_async', False):
+            return response
+
+        codec = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.codecs)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if codec is None:
+            return response
+
+        endpoint = endpoint_name(request)
+        if response.streaming:
+            response.streaming_content = self.stream(response.streaming_content, codec, endpoint)
+            del response.headers['Content-Length']
+        else:
+            original = response.content
+            if len(original) < self.min_size:
+                return response
+            compressed = codec.compress(original)
+            if len(compressed) >= len(original):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+            compression.stats.record(endpoint, codec.name, len(original), len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            # Le corps a changé : l'ETag fort devient faible (comme GZipMiddleware).
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = codec.name
+        return response
+
+    def should_compress(self, response):
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return False
+        content_type = response.get('Content-Type', '')
+        return content_type.startswith(compression.COMPRESSIBLE_TYPES)
+
+    def stream(self, chunks, codec, endpoint):
+        sizes = {'original': 0, 'compressed': 0}
+
+        def counted(source):
+            for chunk in source:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                sizes['original'] += len(chunk)
+                yield chunk
+
+        for data in codec.stream(counted(chunks)):
+            sizes['compressed'] += len(data)
+            yield data
+        compression.stats.record(endpoint, codec.name, sizes['original'], sizes['compressed'])
+
+
+def endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return request.path
+    return match.view_name or match.route
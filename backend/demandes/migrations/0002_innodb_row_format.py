@@ -0,0 +1,29 @@
+import logging
+
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+
+def set_row_format(apps, schema_editor):
+    # Anciennement exécuté dans init_command à chaque connexion.
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    try:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SET GLOBAL innodb_default_row_format='DYNAMIC'")
+    except Exception as e:
+        # Nécessite le privilège SUPER / SYSTEM_VARIABLES_ADMIN ; DYNAMIC est
+        # de toute façon la valeur par défaut depuis MySQL 5.7.9.
+        logger.warning("Impossible de régler innodb_default_row_format : %s", e)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demandes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_row_format, migrations.RunPython.noop),
+    ]
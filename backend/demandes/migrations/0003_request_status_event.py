@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_events(apps, schema_editor):
+    # Reconstitue un historique minimal pour les demandes existantes :
+    # la création, puis le passage au statut courant.
+    Request = apps.get_model('demandes', 'Request')
+    RequestStatusEvent = apps.get_model('demandes', 'RequestStatusEvent')
+    batch = []
+    for req in Request.objects.only('id', 'status', 'created_at', 'updated_at', 'resolved_at').iterator(chunk_size=2000):
+        batch.append(RequestStatusEvent(request_id=req.id, from_status='', to_status='en_attente', created_at=req.created_at))
+        if req.status != 'en_attente':
+            changed_at = req.resolved_at or req.updated_at
+            batch.append(RequestStatusEvent(
+                request_id=req.id, from_status='en_attente', to_status=req.status, created_at=changed_at,
+                seconds_in_previous=max((changed_at - req.created_at).total_seconds(), 0),
+            ))
+        if len(batch) >= 2000:
+            RequestStatusEvent.objects.bulk_create(batch)
+            batch = []
+    RequestStatusEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demandes', '0002_innodb_row_format'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, max_length=50)),
+                ('to_status', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('resolue', 'Résolue'), ('rejetee', 'Rejetée')], max_length=50)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('seconds_in_previous', models.FloatField(default=0)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='demandes.request')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['request', 'created_at'], name='demandes_re_request_ec1416_idx'), models.Index(fields=['from_status', 'created_at'], name='demandes_re_from_st_ab7d44_idx'), models.Index(fields=['to_status', 'created_at'], name='demandes_re_to_stat_e2531c_idx')],
+            },
+        ),
+        migrations.RunPython(seed_events, migrations.RunPython.noop),
+    ]
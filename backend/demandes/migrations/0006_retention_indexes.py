@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demandes', '0005_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aiconversation',
+            index=models.Index(fields=['user', 'created_at'], name='demandes_ai_user_id_c4313f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aiconversation',
+            index=models.Index(fields=['created_at'], name='demandes_ai_created_630a5f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['is_read', 'created_at'], name='demandes_no_is_read_ccada0_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('demandes', '0007_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['first_name'], name='demandes_us_first_n_2bad4f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'id'], name='demandes_us_role_9bc0f8_idx'),
+        ),
+    ]
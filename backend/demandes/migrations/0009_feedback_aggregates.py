@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:50
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+def backfill_aggregates(apps, schema_editor):
+    Feedback = apps.get_model('demandes', 'Feedback')
+    ArchivedRequest = apps.get_model('demandes', 'ArchivedRequest')
+    FeedbackAggregate = apps.get_model('demandes', 'FeedbackAggregate')
+    db = schema_editor.connection.alias
+
+    totals = defaultdict(lambda: defaultdict(int))
+    rows = Feedback.objects.using(db).annotate(period=TruncMonth('created_at')).values('request__category', 'period').annotate(
+        count=Count('id'), rating_sum=Sum('rating'),
+        **{f'rating_{r}': Count('id', filter=Q(rating=r)) for r in range(1, 6)},
+    ).order_by()
+    for row in rows:
+        period = row.pop('period')
+        period = period.date() if hasattr(period, 'date') else period
+        key = (row.pop('request__category'), period)
+        for field, value in row.items():
+            totals[key][field] += value or 0
+
+    # Les avis des demandes archivées restent comptés.
+    for category, feedback in ArchivedRequest.objects.using(db).exclude(feedback=None).values_list('category', 'feedback'):
+        created_at = parse_datetime(feedback['created_at'])
+        key = (category, timezone.localtime(created_at).date().replace(day=1))
+        rating = feedback['rating']
+        totals[key]['count'] += 1
+        totals[key]['rating_sum'] += rating
+        totals[key][f'rating_{min(max(rating, 1), 5)}'] += 1
+
+    FeedbackAggregate.objects.using(db).bulk_create(
+        FeedbackAggregate(category=category, period=period, **values)
+        for (category, period), values in totals.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demandes', '0008_user_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedbackAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=100)),
+                ('period', models.DateField(help_text='Premier jour du mois')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveBigIntegerField(default=0)),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['-created_at', '-id'], name='demandes_fe_created_09603a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['rating', '-created_at'], name='demandes_fe_rating_c68336_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedbackaggregate',
+            index=models.Index(fields=['period'], name='demandes_fe_period_3e0dfd_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedbackaggregate',
+            constraint=models.UniqueConstraint(fields=('category', 'period'), name='feedback_aggregate_unique'),
+        ),
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
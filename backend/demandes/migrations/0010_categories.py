@@ -0,0 +1,168 @@
+# Generated by Django 5.2.18 on 2026-10-19 21:10
+
+from collections import Counter, defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F
+
+import demandes.models
+from demandes.text import normalize
+
+AGGREGATE_FIELDS = ('count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5')
+BUCKETS = {'en_attente': 'open_requests', 'en_cours': 'open_requests', 'resolue': 'resolved_requests'}
+
+
+def key_of(name):
+    return ' '.join(normalize(name).split())
+
+
+def normalize_categories(apps, schema_editor):
+    Category = apps.get_model('demandes', 'Category')
+    Request = apps.get_model('demandes', 'Request')
+    ArchivedRequest = apps.get_model('demandes', 'ArchivedRequest')
+    FeedbackAggregate = apps.get_model('demandes', 'FeedbackAggregate')
+    db = schema_editor.connection.alias
+
+    usage = Counter({'Autre': 0})
+    for model in (Request, ArchivedRequest):
+        for row in model.objects.using(db).values('category').annotate(total=Count('id')).order_by():
+            usage[row['category']] += row['total']
+    for name in FeedbackAggregate.objects.using(db).values_list('category', flat=True).distinct():
+        usage[name] += 0
+
+    spellings = defaultdict(list)
+    for name, total in usage.items():
+        spellings[key_of(name) or key_of('Autre')].append((total, name))
+
+    for key, variants in spellings.items():
+        # L'orthographe la plus utilisée devient le nom affiché.
+        display = max(variants, key=lambda variant: (variant[0], variant[1]))[1]
+        category = Category.objects.using(db).create(key=key, name=' '.join(display.split()) or 'Autre')
+        names = [name for _, name in variants]
+        Request.objects.using(db).filter(category__in=names).update(category_ref=category)
+        ArchivedRequest.objects.using(db).filter(category__in=names).update(category_ref=category)
+
+        # Les agrégats d'avis des différentes orthographes fusionnent mois par mois.
+        kept = {}
+        for aggregate in FeedbackAggregate.objects.using(db).filter(category__in=names).order_by('period', 'id'):
+            target = kept.get(aggregate.period)
+            if target is None:
+                aggregate.category_ref = category
+                aggregate.save(update_fields=['category_ref'])
+                kept[aggregate.period] = aggregate
+                continue
+            for field in AGGREGATE_FIELDS:
+                setattr(target, field, getattr(target, field) + getattr(aggregate, field))
+            target.save(update_fields=AGGREGATE_FIELDS)
+            aggregate.delete()
+
+    rows = Request.objects.using(db).filter(deleted_at__isnull=True).values('category_ref', 'status').annotate(total=Count('id'))
+    for row in rows.order_by():
+        field = BUCKETS.get(row['status'])
+        if field is not None:
+            Category.objects.using(db).filter(pk=row['category_ref']).update(**{field: F(field) + row['total']})
+
+
+def restore_names(apps, schema_editor):
+    Category = apps.get_model('demandes', 'Category')
+    db = schema_editor.connection.alias
+    for model_name in ('Request', 'ArchivedRequest', 'FeedbackAggregate'):
+        model = apps.get_model('demandes', model_name)
+        for pk, name in Category.objects.using(db).values_list('pk', 'name'):
+            model.objects.using(db).filter(category_ref=pk).update(category=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demandes', '0009_feedback_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('open_requests', models.PositiveIntegerField(default=0)),
+                ('resolved_requests', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='request',
+            name='category_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='demandes.category'),
+        ),
+        migrations.AddField(
+            model_name='archivedrequest',
+            name='category_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='demandes.category'),
+        ),
+        migrations.AddField(
+            model_name='feedbackaggregate',
+            name='category_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='demandes.category'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='feedbackaggregate',
+            name='feedback_aggregate_unique',
+        ),
+        migrations.RunPython(normalize_categories, restore_names),
+        # Valeur par défaut pour que la colonne puisse être recréée au retour arrière.
+        migrations.AlterField(
+            model_name='feedbackaggregate',
+            name='category',
+            field=models.CharField(default='Autre', max_length=100),
+        ),
+        migrations.RemoveField(
+            model_name='request',
+            name='category',
+        ),
+        migrations.RemoveField(
+            model_name='archivedrequest',
+            name='category',
+        ),
+        migrations.RemoveField(
+            model_name='feedbackaggregate',
+            name='category',
+        ),
+        migrations.RenameField(
+            model_name='request',
+            old_name='category_ref',
+            new_name='category',
+        ),
+        migrations.RenameField(
+            model_name='archivedrequest',
+            old_name='category_ref',
+            new_name='category',
+        ),
+        migrations.RenameField(
+            model_name='feedbackaggregate',
+            old_name='category_ref',
+            new_name='category',
+        ),
+        migrations.AlterField(
+            model_name='request',
+            name='category',
+            field=models.ForeignKey(default=demandes.models.default_category, on_delete=django.db.models.deletion.PROTECT, related_name='requests', to='demandes.category'),
+        ),
+        migrations.AlterField(
+            model_name='archivedrequest',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_requests', to='demandes.category'),
+        ),
+        migrations.AlterField(
+            model_name='feedbackaggregate',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='feedback_aggregates', to='demandes.category'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedbackaggregate',
+            constraint=models.UniqueConstraint(fields=('category', 'period'), name='feedback_aggregate_unique'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demandes', '0011_priority_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('next_run_at', models.DateTimeField()),
+                ('locked_by', models.CharField(blank=True, default='', max_length=255)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(max_length=100)),
+                ('worker', models.CharField(max_length=255)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('duration_ms', models.FloatField()),
+                ('status', models.CharField(choices=[('succes', 'Succès'), ('echec', 'Échec')], max_length=10)),
+                ('result', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job', '-started_at'], name='demandes_jo_job_3fa044_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 22:50
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Case, Count, FloatField, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from demandes.priority import OPEN_STATUSES, score
+
+BATCH_SIZE = 1000
+
+
+def backfill_scores(apps, schema_editor):
+    # Sans score, les demandes ouvertes existantes n'apparaissent dans /api/queue/
+    # qu'après le premier passage de refresh_priorities.
+    Request = apps.get_model('demandes', 'Request')
+    Feedback = apps.get_model('demandes', 'Feedback')
+    db = schema_editor.connection.alias
+    unhappy_rating = getattr(settings, 'PRIORITY_UNHAPPY_RATING', 2)
+    unhappy = (
+        Feedback.objects.using(db).filter(user_id=OuterRef('user_id'), rating__lte=unhappy_rating)
+        .order_by().values('user_id').annotate(total=Count('id')).values('total')
+    )
+    pending = Request.objects.using(db).filter(
+        status__in=OPEN_STATUSES, deleted_at__isnull=True, priority_score__isnull=True,
+    ).annotate(unhappy_feedbacks=Coalesce(Subquery(unhappy, output_field=IntegerField()), 0))
+
+    now, last = timezone.now(), 0
+    while True:
+        rows = list(pending.filter(pk__gt=last).order_by('pk').values_list(
+            'pk', 'created_at', 'status', 'category__priority_weight', 'unhappy_feedbacks', 'feedback__rating',
+        )[:BATCH_SIZE])
+        if not rows:
+            return
+        last = rows[-1][0]
+        Request.objects.using(db).filter(pk__in=[row[0] for row in rows]).update(priority_score=Case(
+            *[When(pk=pk, then=Value(score(created_at, status, weight, unhappy_count, rating, now)))
+              for pk, created_at, status, weight, unhappy_count, rating in rows],
+            output_field=FloatField(),
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demandes', '0013_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,12 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
+from .text import normalize
+
 class User(AbstractUser):
     ROLE_CHOICES = [
         ('admin', 'Admin'),
@@ -12,12 +15,83 @@ class User(AbstractUser):
     email = models.EmailField(unique=True)
     role = models.CharField(max_length=50, choices=ROLE_CHOICES, default='client')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Suppression demandée : le compte est désactivé, ses données sont
+    # supprimées en arrière-plan (voir deletion.py).
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Annuaire admin : email et username sont déjà indexés (uniques).
+            models.Index(fields=['first_name']),
+            models.Index(fields=['role', 'id']),
+        ]
+
     def __str__(self):
         return self.email
 
+class CategoryManager(models.Manager):
+    def resolve(self, name):
+        """Catégorie de ``name`` (casse, accents et espaces ignorés), créée si besoin."""
+        key = Category.key_of(name)
+        category = self.filter(key=key).first()
+        if category is None:
+            try:
+                with transaction.atomic():
+                    category = self.create(key=key, name=' '.join(name.split()))
+            except IntegrityError:
+                category = self.get(key=key)  # Créée entre-temps par une autre requête.
+        return category
+
+
+class Category(models.Model):
+    """
+    Catégorie de demande. ``open_requests`` et ``resolved_requests`` comptent
+    les demandes actives en attente ou en cours, et résolues ; ils sont tenus
+    à jour dans la transaction de chaque changement (voir categories.py).
+    """
+    DEFAULT = 'Autre'
+    # Proposées par le formulaire client (NouvelleDemande.jsx) : créées au premier usage.
+    STANDARD = ('Technique', 'Commercial', 'Facturation', 'Service après-vente', DEFAULT)
+
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, unique=True)
+    open_requests = models.PositiveIntegerField(default=0)
+    resolved_requests = models.PositiveIntegerField(default=0)
+    # Multiplie la part « ancienneté » du score de priorité (voir priority.py).
+    priority_weight = models.FloatField(default=1.0)
+
+    objects = CategoryManager()
+
+    class Meta:
+        ordering = ['name']
+
+    @staticmethod
+    def key_of(name):
+        return ' '.join(normalize(name).split())
+
+    def __str__(self):
+        return self.name
+
+
+def default_category():
+    # Seule la clé est lue : les migrations appellent cette valeur par défaut
+    # avec le modèle courant, alors que la table n'a pas encore toutes ses colonnes.
+    pk = Category.objects.filter(key=Category.key_of(Category.DEFAULT)).values_list('pk', flat=True).first()
+    return pk if pk is not None else Category.objects.resolve(Category.DEFAULT).pk
+
+
+class InvalidTransition(ValueError):
+    pass
+
+class ActiveRequestManager(models.Manager):
+    """Exclut les demandes en attente de suppression (voir deletion.py)."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Request(models.Model):
     STATUS_CHOICES = [
         ('en_attente', 'En attente'),
@@ -25,9 +99,16 @@ class Request(models.Model):
         ('resolue', 'Résolue'),
         ('rejetee', 'Rejetée'),
     ]
+    # Transitions autorisées : une demande résolue ou rejetée peut être rouverte.
+    TRANSITIONS = {
+        'en_attente': {'en_cours', 'resolue', 'rejetee'},
+        'en_cours': {'en_attente', 'resolue', 'rejetee'},
+        'resolue': {'en_cours'},
+        'rejetee': {'en_attente', 'en_cours'},
+    }
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='requests')
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='en_attente')
-    category = models.CharField(max_length=100, default='Autre')
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='requests', default=default_category)
     admin_comment = models.TextField(blank=True, null=True)
     title = models.CharField(max_length=255, default='Titre par défaut')
     description = models.TextField(blank=True, null=True)
@@ -35,15 +116,66 @@ class Request(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
     rating = models.FloatField(null=True, blank=True)  # Ajouter rating
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    # File de travail des admins (priority.py) : NULL pour une demande fermée.
+    priority_score = models.FloatField(null=True, blank=True)
+    claimed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ActiveRequestManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        base_manager_name = 'all_objects'
+        indexes = [
+            # Flux de synchronisation (/api/changes/) : admin puis client.
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['deleted_at']),
+            # /api/queue/ : parcours dans l'ordre décroissant du score.
+            models.Index(fields=['-priority_score', 'id']),
+        ]
+
+    def can_transition_to(self, new_status):
+        return new_status in self.TRANSITIONS.get(self.status, ())
+
+    def transition_to(self, new_status, actor=None):
+        """Change le statut et journalise l'événement dans la même transaction."""
+        if new_status not in dict(self.STATUS_CHOICES):
+            raise InvalidTransition(f"Statut inconnu : '{new_status}'.")
+        with transaction.atomic():
+            # Statut relu sous verrou : deux changements concurrents ne partent pas du même statut.
+            self.status = Request.all_objects.select_for_update().values_list('status', flat=True).get(pk=self.pk)
+            if new_status == self.status:
+                return None
+            if not self.can_transition_to(new_status):
+                raise InvalidTransition(
+                    f"Transition de '{self.get_status_display()}' vers '{dict(self.STATUS_CHOICES)[new_status]}' non autorisée."
+                )
+            entered_at = (
+                self.status_events.order_by('-created_at').values_list('created_at', flat=True).first()
+                or self.created_at
+            )
+            previous_status = self.status
+            self.status = new_status
+            self.save()
+            return RequestStatusEvent.record(self, previous_status, new_status, entered_at, actor)
 
     def save(self, *args, **kwargs):
-        old_instance = Request.objects.filter(id=self.id).first()
         if self.status == 'resolue' and not self.resolved_at:
             self.resolved_at = timezone.now()
         elif self.status != 'resolue':
             self.resolved_at = None
-        super().save(*args, **kwargs)
-        if old_instance and self.user.role != 'admin':
+        with transaction.atomic():
+            # Ligne enregistrée, verrouillée jusqu'au commit : les signaux post_save
+            # (compteurs de catégorie, agrégats d'avis) en déduisent leurs variations.
+            old_instance = Request.all_objects.select_for_update().filter(id=self.id).first() if self.pk else None
+            self._stored = old_instance
+            super().save(*args, **kwargs)
+            if old_instance is None:
+                RequestStatusEvent.record(self, '', self.status, self.created_at)
+                return
+        if old_instance.deleted_at is None and self.user.role != 'admin':
             if old_instance.status != self.status or (
                 old_instance.admin_comment != self.admin_comment and self.admin_comment
             ):
@@ -73,12 +205,63 @@ class Request(models.Model):
     def __str__(self):
         return f'Demande {self.id} de {self.user.username}'
 
+class RequestStatusEvent(models.Model):
+    """
+    Journal append-only des changements de statut. ``seconds_in_previous``
+    est figé à l'écriture : le temps passé dans chaque état s'obtient par un
+    simple parcours d'index sur (from_status, created_at).
+    """
+    request = models.ForeignKey(Request, on_delete=models.CASCADE, related_name='status_events')
+    from_status = models.CharField(max_length=50, blank=True)
+    to_status = models.CharField(max_length=50, choices=Request.STATUS_CHOICES)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+    seconds_in_previous = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['request', 'created_at']),
+            models.Index(fields=['from_status', 'created_at']),
+            models.Index(fields=['to_status', 'created_at']),
+        ]
+
+    @classmethod
+    def record(cls, request, from_status, to_status, entered_at, actor=None):
+        now = timezone.now()
+        return cls.objects.create(
+            request=request,
+            from_status=from_status,
+            to_status=to_status,
+            actor=actor,
+            created_at=now,
+            seconds_in_previous=max((now - entered_at).total_seconds(), 0) if from_status else 0,
+        )
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Les événements de statut ne peuvent pas être modifiés.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f'Demande {self.request_id} : {self.from_status or "création"} -> {self.to_status}'
+
 class Feedback(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feedbacks', null=True, blank=True)
     request = models.OneToOneField(Request, on_delete=models.CASCADE, related_name='feedback')
     rating = models.PositiveIntegerField()
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['user', 'updated_at']),
+            # Liste paginée par curseur (created_at, id), filtrable par note.
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['rating', '-created_at']),
+        ]
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)  # Supprimer la synchronisation avec Request.rating
@@ -92,15 +275,42 @@ class Notification(models.Model):
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         indexes = [
             models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['user', 'updated_at']),
+            # Rétention des notifications lues (retention.py).
+            models.Index(fields=['is_read', 'created_at']),
         ]
 
     def __str__(self):
         return f'Notification pour {self.user.email} - Demande {self.request.id}'
 
+class Tombstone(models.Model):
+    """Trace d'une suppression, pour que /api/changes/ la propage aux clients."""
+    MODEL_CHOICES = [
+        ('request', 'Request'),
+        ('feedback', 'Feedback'),
+        ('notification', 'Notification'),
+    ]
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    # Propriétaire de l'objet supprimé, sans clé étrangère : la trace doit
+    # survivre à la suppression de l'utilisateur.
+    owner_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at']),
+            models.Index(fields=['owner_id', 'deleted_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id} supprimé le {self.deleted_at}'
+
 
 from django.db import models
 from django.conf import settings
@@ -113,6 +323,165 @@ class AIConversation(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.sender}: {self.message[:50]}"
+
+class ArchivedRequest(models.Model):
+    """
+    Demande résolue ou rejetée depuis longtemps, sortie de la table Request
+    (voir demandes/archive.py). Garde l'identifiant d'origine ; l'avis et
+    l'historique des statuts sont figés en JSON.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_requests')
+    status = models.CharField(max_length=50, choices=Request.STATUS_CHOICES)
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='archived_requests')
+    admin_comment = models.TextField(blank=True, null=True)
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    rating = models.FloatField(null=True, blank=True)
+    feedback = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    status_history = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['-created_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.title} (archivée)'
+
+
+class ArchivedNotification(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    request = models.ForeignKey(ArchivedRequest, on_delete=models.CASCADE, related_name='notifications')
+    message = models.TextField()
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+
+class StatsRollup(models.Model):
+    """
+    Totaux des demandes archivées, par statut, pour que les statistiques
+    globales restent exactes sans relire les archives.
+    """
+    status = models.CharField(max_length=50, primary_key=True, choices=Request.STATUS_CHOICES)
+    archived_requests = models.PositiveIntegerField(default=0)
+    archived_notifications = models.PositiveIntegerField(default=0)
+    # Demandes résolues avec resolved_at, et somme de leurs durées de résolution.
+    resolved_requests = models.PositiveIntegerField(default=0)
+    resolution_seconds = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.status} : {self.archived_requests} demandes archivées'
+
+
+class FeedbackAggregate(models.Model):
+    """
+    Compteurs d'avis par catégorie et par mois, tenus à jour à chaque
+    création ou suppression d'avis (voir feedback_stats.py).
+    """
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='feedback_aggregates')
+    period = models.DateField(help_text="Premier jour du mois")
+    count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveBigIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'period'], name='feedback_aggregate_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['period']),
+        ]
+
+    def __str__(self):
+        return f'{self.category} {self.period:%Y-%m} : {self.count} avis'
+
+
+class ScheduledJob(models.Model):
+    """
+    État partagé d'une tâche du planificateur (scheduler.py). La ligne sert
+    de verrou : le worker qui la prend (locked_by, locked_until) est le seul
+    à exécuter la tâche jusqu'à expiration du bail.
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    next_run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=255, blank=True, default='')
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.name} (prochaine exécution : {self.next_run_at})'
+
+
+class JobRun(models.Model):
+    """Historique des exécutions du planificateur, écrit en fin d'exécution."""
+    STATUS_CHOICES = [
+        ('succes', 'Succès'),
+        ('echec', 'Échec'),
+    ]
+    job = models.CharField(max_length=100)
+    worker = models.CharField(max_length=255)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    duration_ms = models.FloatField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    # Valeur renvoyée par la tâche, ou trace de l'exception.
+    result = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['job', '-started_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.job} {self.started_at} : {self.status}'
+
+
+class IdempotencyKey(models.Model):
+    """
+    Réponse d'une écriture, rejouée quand le client renvoie le même en-tête
+    Idempotency-Key (voir idempotency.py). status_code NULL : requête en cours.
+    """
+    # Sans clé étrangère, comme Tombstone : les clés expirent d'elles-mêmes.
+    owner_id = models.BigIntegerField()
+    endpoint = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.TextField(blank=True, default='')
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner_id', 'endpoint', 'key'], name='idempotency_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
 
     def __str__(self):
-        return f"{self.sender}: {self.message[:50]}"
\ No newline at end of file
+        return f'{self.endpoint} {self.key} ({self.status_code or "en cours"})'
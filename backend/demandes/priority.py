@@ -0,0 +1,97 @@
+"""
+Score de priorité des demandes ouvertes (file de travail des admins, /api/queue/).
+
+Le score combine :
+
+- l'ancienneté de la demande (``PRIORITY_AGE_WEIGHT`` points par jour), plus
+  ``PRIORITY_WAITING_BONUS`` tant qu'aucun admin ne l'a prise en charge,
+  le tout multiplié par le poids de sa catégorie (Category.priority_weight) ;
+- l'historique du client : ``PRIORITY_CLIENT_WEIGHT`` points par avis
+  mécontent (note <= ``PRIORITY_UNHAPPY_RATING``), au plus
+  ``PRIORITY_CLIENT_MAX_FEEDBACKS`` avis ;
+- l'avis laissé sur la demande elle-même si elle a été rouverte après
+  résolution : ``PRIORITY_FEEDBACK_WEIGHT`` points par étoile manquante.
+
+Il est stocké dans Request.priority_score, indexé : la file se lit par un
+parcours d'index dans l'ordre décroissant. Les demandes fermées ont un
+score NULL et sortent ainsi de la partie parcourue de l'index.
+
+Les signaux recalculent le score d'une demande après chaque changement de
+la demande, d'un avis du client ou du poids de sa catégorie ; la commande
+refresh_priorities le recalcule pour toutes les demandes ouvertes, afin de
+tenir compte du temps qui passe.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, Count, FloatField, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Request, Feedback
+
+OPEN_STATUSES = ('en_attente', 'en_cours')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def score(created_at, status, weight, unhappy_feedbacks, rating, now):
+    """Score d'une demande ; None si elle n'est pas ouverte."""
+    if status not in OPEN_STATUSES:
+        return None
+    age_days = max((now - created_at).total_seconds(), 0) / 86400
+    value = age_days * _setting('PRIORITY_AGE_WEIGHT', 1.0)
+    if status == 'en_attente':
+        value += _setting('PRIORITY_WAITING_BONUS', 2.0)
+    value *= weight
+    value += _setting('PRIORITY_CLIENT_WEIGHT', 3.0) * min(
+        unhappy_feedbacks, _setting('PRIORITY_CLIENT_MAX_FEEDBACKS', 3),
+    )
+    if rating is not None:
+        value += _setting('PRIORITY_FEEDBACK_WEIGHT', 2.0) * (5 - rating)
+    return round(value, 4)
+
+
+def _scoring_rows(queryset):
+    unhappy = (
+        Feedback.objects.filter(user_id=OuterRef('user_id'), rating__lte=_setting('PRIORITY_UNHAPPY_RATING', 2))
+        .order_by().values('user_id').annotate(total=Count('id')).values('total')
+    )
+    return queryset.annotate(
+        unhappy_feedbacks=Coalesce(Subquery(unhappy, output_field=IntegerField()), 0),
+    ).values_list('pk', 'created_at', 'status', 'category__priority_weight', 'unhappy_feedbacks', 'feedback__rating')
+
+
+def refresh(queryset, batch_size=1000):
+    """
+    Recalcule le score des demandes de ``queryset`` par lots de
+    ``batch_size`` (une lecture et une écriture par lot) ; renvoie le
+    nombre de demandes traitées.
+    """
+    now = timezone.now()
+    total, last = 0, 0
+    while True:
+        rows = list(_scoring_rows(queryset.filter(pk__gt=last).order_by('pk'))[:batch_size])
+        if not rows:
+            return total
+        last = rows[-1][0]
+        total += len(rows)
+        scores = {pk: score(created_at, status, weight, unhappy, rating, now)
+                  for pk, created_at, status, weight, unhappy, rating in rows}
+        # update() : ni signaux ni updated_at, le score n'est pas une modification de la demande.
+        Request.all_objects.filter(pk__in=list(scores)).update(priority_score=Case(
+            *[When(pk=pk, then=Value(value)) for pk, value in scores.items()],
+            output_field=FloatField(),
+        ))
+
+
+def refresh_all(batch_size=1000):
+    """Recalcule toutes les demandes ouvertes ; les demandes fermées encore notées repassent à NULL."""
+    return refresh(Request.objects.filter(Q(status__in=OPEN_STATUSES) | Q(priority_score__isnull=False)), batch_size)
+
+
+def claim_expiry(now=None):
+    """Date avant laquelle une prise en charge est considérée comme abandonnée."""
+    return (now or timezone.now()) - timedelta(seconds=_setting('PRIORITY_CLAIM_TTL', 900))
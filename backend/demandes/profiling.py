@@ -0,0 +1,242 @@
+"""
+Profilage à la demande d'une requête en production.
+
+Activé par ``PROFILING_ENABLED``. Un admin obtient un jeton signé (POST
+/api/profiles/token/, valable ``PROFILING_TOKEN_MAX_AGE`` secondes) et
+l'envoie dans l'en-tête ``X-Profile`` de la requête à examiner (jamais dans
+l'URL, qui finit dans les journaux d'accès et les en-têtes Referer).
+ProfilingMiddleware vérifie la signature, et que le signataire est toujours
+un admin actif (réponse gardée en cache ``PROFILING_ADMIN_CHECK_SECONDS``
+secondes), exécute la requête sous cProfile en chronométrant chaque requête
+SQL, puis enregistre :
+
+- ``<id>.prof`` : statistiques cProfile (pstats, snakeviz...) ;
+- ``<id>.json`` : méthode, chemin, statut, durée, fonctions les plus
+  coûteuses et temps SQL par forme de requête.
+
+L'identifiant est renvoyé dans l'en-tête ``X-Profile-Id`` ; les profils se
+listent et se téléchargent sous /api/profiles/. Pour rester activable en
+production : au plus ``PROFILING_MAX_CONCURRENT`` requêtes profilées à la
+fois (les autres passent sans profilage), et seuls les
+``PROFILING_MAX_FILES`` profils les plus récents sont conservés.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import secrets
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+from .query_budget import sql_shape
+
+SALT = 'demandes.profiling'
+HEADER = 'HTTP_X_PROFILE'
+# Horodatage à la microseconde en tête : l'ordre des noms est l'ordre chronologique.
+PROFILE_ID_RE = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9]{6}-[0-9a-f]{4}$')
+
+
+def enabled():
+    return getattr(settings, 'PROFILING_ENABLED', False)
+
+
+def profile_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+def make_token(user):
+    return signing.TimestampSigner(salt=SALT).sign(str(user.pk))
+
+
+def is_active_admin(user_id):
+    key = f'profiling-admin:{user_id}'
+    allowed = cache.get(key)
+    if allowed is None:
+        allowed = get_user_model().objects.filter(pk=user_id, role='admin', is_active=True).exists()
+        cache.set(key, allowed, getattr(settings, 'PROFILING_ADMIN_CHECK_SECONDS', 60))
+    return allowed
+
+
+def check_token(token):
+    """
+    Id de l'admin qui a signé ``token``, ou None (signature invalide ou
+    expirée, signataire qui n'est plus un admin actif).
+    """
+    try:
+        value = signing.TimestampSigner(salt=SALT).unsign(
+            token, max_age=getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 600),
+        )
+    except signing.BadSignature:
+        return None
+    if not value.isdigit() or not is_active_admin(int(value)):
+        return None
+    return int(value)
+
+
+class SqlTimer:
+    """Chronomètre les requêtes SQL de toutes les connexions, regroupées par forme."""
+
+    def __init__(self):
+        self.shapes = defaultdict(lambda: [0, 0.0])
+        self._stack = None
+
+    def _record(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            entry = self.shapes[sql_shape(sql)]
+            entry[0] += 1
+            entry[1] += time.perf_counter() - started
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self._record))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        return False
+
+    def summary(self):
+        return sorted(
+            ({'sql': shape[:500], 'count': count, 'ms': round(seconds * 1000, 3)}
+             for shape, (count, seconds) in self.shapes.items()),
+            key=lambda entry: -entry['ms'],
+        )
+
+
+class Profiler:
+    def __init__(self):
+        self._slots = threading.BoundedSemaphore(getattr(settings, 'PROFILING_MAX_CONCURRENT', 1))
+
+    def run(self, request, user_id, get_response):
+        """Exécute la requête sous profilage ; renvoie (réponse, id du profil ou None)."""
+        if not self._slots.acquire(blocking=False):
+            return get_response(request), None
+        try:
+            profile = cProfile.Profile()
+            started = time.perf_counter()
+            with SqlTimer() as sql:
+                profile.enable()
+                try:
+                    response = get_response(request)
+                finally:
+                    profile.disable()
+            duration = time.perf_counter() - started
+            profile_id = self.save(profile, sql, {
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'user_id': user_id,
+                'duration_ms': round(duration * 1000, 3),
+            })
+            return response, profile_id
+        finally:
+            self._slots.release()
+
+    async def arun(self, request, user_id, get_response):
+        """
+        Variante ASGI de ``run``. Le profil et les temps SQL couvrent aussi les
+        coroutines servies en même temps par la boucle et le thread de l'ORM.
+        """
+        if not self._slots.acquire(blocking=False):
+            return await get_response(request), None
+        try:
+            profile = cProfile.Profile()
+            started = time.perf_counter()
+            # L'ORM async exécute ses requêtes dans le thread partagé de
+            # sync_to_async : le chronométrage SQL doit y être installé.
+            sql = SqlTimer()
+            await sync_to_async(sql.__enter__)()
+            profile.enable()
+            try:
+                response = await get_response(request)
+            finally:
+                profile.disable()
+                await sync_to_async(sql.__exit__)(None, None, None)
+            duration = time.perf_counter() - started
+            profile_id = await sync_to_async(self.save, thread_sensitive=False)(profile, sql, {
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'user_id': user_id,
+                'duration_ms': round(duration * 1000, 3),
+            })
+            return response, profile_id
+        finally:
+            self._slots.release()
+
+    def save(self, profile, sql, meta):
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        profile_id = f"{timezone.now():%Y%m%d-%H%M%S-%f}-{secrets.token_hex(2)}"
+        profile.dump_stats(directory / f'{profile_id}.prof')
+
+        stats = pstats.Stats(profile, stream=io.StringIO())
+        top = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:getattr(settings, 'PROFILING_TOP_FUNCTIONS', 30)]
+        queries = sql.summary()
+        meta.update({
+            'id': profile_id,
+            'created_at': timezone.now().isoformat(),
+            'sql_count': sum(entry['count'] for entry in queries),
+            'sql_ms': round(sum(entry['ms'] for entry in queries), 3),
+            'sql': queries,
+            'functions': [
+                {'function': f'{path}:{line}({name})', 'calls': calls, 'tottime_ms': round(tottime * 1000, 3),
+                 'cumtime_ms': round(cumtime * 1000, 3)}
+                for (path, line, name), (_, calls, tottime, cumtime, _) in top
+            ],
+        })
+        (directory / f'{profile_id}.json').write_text(json.dumps(meta, ensure_ascii=False))
+        self.prune(directory)
+        return profile_id
+
+    def prune(self, directory):
+        keep = getattr(settings, 'PROFILING_MAX_FILES', 50)
+        profiles = sorted(directory.glob('*.json'), key=lambda path: path.name, reverse=True)
+        for stale in profiles[keep:]:
+            for path in (stale, stale.with_suffix('.prof')):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+
+profiler = Profiler()
+
+
+def list_profiles():
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in sorted(directory.glob('*.json'), key=lambda path: path.name, reverse=True):
+        try:
+            meta = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        profiles.append({key: value for key, value in meta.items() if key not in ('sql', 'functions')})
+    return profiles
+
+
+def profile_path(profile_id, suffix):
+    """Chemin du fichier d'un profil, ou None si l'id est invalide ou le fichier absent."""
+    if not PROFILE_ID_RE.match(profile_id or ''):
+        return None
+    path = profile_dir() / f'{profile_id}{suffix}'
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,147 @@
+import logging
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Requêtes de gestion de transaction : elles dépendent du contexte (tests,
+# atomic imbriqués) et ne reflètent pas le travail de la vue.
+IGNORED_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_IN_LIST_RE = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def sql_shape(sql):
+    """Normalise une requête pour regrouper celles qui ne diffèrent que par leurs paramètres."""
+    shape = _STRING_RE.sub('?', sql)
+    shape = _NUMBER_RE.sub('?', shape)
+    shape = _IN_LIST_RE.sub('(...)', shape)
+    return ' '.join(shape.split())
+
+
+class QueryBudget:
+    """
+    Compte les requêtes SQL exécutées dans un bloc et signale les dépassements.
+
+    S'utilise comme context manager ou comme décorateur de vue :
+
+        @query_budget(max_queries=2)
+        def get(self, request): ...
+
+    Le mode vient de ``settings.QUERY_BUDGET_MODE`` : ``'raise'`` lève
+    ``QueryBudgetExceeded`` (tests), ``'warn'`` journalise, ``'off'`` ne fait rien.
+    """
+
+    def __init__(self, max_queries=None, max_repeats=None, name=None, mode=None):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.name = name
+        self.mode = mode
+        self.queries = []
+        self._stack = None
+
+    def _copy(self, name=None):
+        return QueryBudget(self.max_queries, self.max_repeats, name or self.name, self.mode)
+
+    def get_mode(self):
+        if self.mode is not None:
+            return self.mode
+        return getattr(settings, 'QUERY_BUDGET_MODE', 'off')
+
+    def get_max_repeats(self):
+        if self.max_repeats is not None:
+            return self.max_repeats
+        return getattr(settings, 'QUERY_BUDGET_MAX_REPEATS', None)
+
+    def _record(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(IGNORED_PREFIXES):
+            self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.queries = []
+        if self.get_mode() == 'off':
+            return self
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self._record))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._stack is None:
+            return False
+        self._stack.close()
+        self._stack = None
+        if exc_type is not None:
+            return False
+
+        violations = self.violations()
+        if violations:
+            message = f"Budget de requêtes dépassé pour {self.name or 'bloc'} : " + '; '.join(violations)
+            if self.get_mode() == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return False
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def repeated_shapes(self):
+        max_repeats = self.get_max_repeats()
+        if not max_repeats:
+            return {}
+        shapes = Counter(sql_shape(sql) for sql in self.queries)
+        return {shape: n for shape, n in shapes.items() if n > max_repeats}
+
+    def violations(self):
+        violations = []
+        if self.max_queries is not None and self.count > self.max_queries:
+            violations.append(f"{self.count} requêtes (max {self.max_queries})")
+        for shape, n in self.repeated_shapes().items():
+            violations.append(f"{n}x la même requête : {shape[:200]}")
+        return violations
+
+    def __call__(self, func):
+        name = self.name or func.__qualname__
+
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def inner(*args, **kwargs):
+                budget = self._copy(name)
+                if budget.get_mode() == 'off':
+                    return await func(*args, **kwargs)
+                # L'ORM async exécute ses requêtes dans le thread de
+                # sync_to_async : le comptage est installé et vérifié là.
+                await sync_to_async(budget.__enter__)()
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException:
+                    await sync_to_async(budget.__exit__)(*sys.exc_info())
+                    raise
+                await sync_to_async(budget.__exit__)(None, None, None)
+                return result
+        else:
+            @wraps(func)
+            def inner(*args, **kwargs):
+                with self._copy(name):
+                    return func(*args, **kwargs)
+
+        inner.query_budget = self
+        return inner
+
+
+query_budget = QueryBudget
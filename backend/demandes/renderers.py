@@ -0,0 +1,35 @@
+from rest_framework.renderers import JSONRenderer, BrowsableAPIRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson est optionnel
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Rendu JSON via orjson : datetimes, UUID et dataclasses sont encodés en C.
+    Les dates UTC sont écrites avec le suffixe « Z », comme DRF. Sans orjson,
+    le rendu retombe sur JSONRenderer.
+    """
+
+    if orjson is not None:
+        options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=self.default, option=self.options)
+
+    @staticmethod
+    def default(obj):
+        # Types que orjson ne connaît pas (Decimal, timedelta, lazy strings,
+        # QuerySet...) : même conversion que l'encodeur de DRF.
+        return JSONEncoder().default(obj)
+
+
+# À utiliser par vue : renderer_classes = FAST_RENDERER_CLASSES
+FAST_RENDERER_CLASSES = [ORJSONRenderer, BrowsableAPIRenderer]
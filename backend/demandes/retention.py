@@ -0,0 +1,156 @@
+"""
+Politiques de rétention des notifications, de l'historique IA et des
+traces de suppression (commande apply_retention).
+
+Chaque politique traite un lot borné par appel à ``run_batch`` et valide
+sa transaction : les verrous MySQL restent courts, et une exécution
+interrompue reprend naturellement au lot suivant, puisque seules les lignes
+encore concernées sont sélectionnées.
+"""
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Notification, AIConversation, Tombstone
+
+COMPACTED_PREFIX = '[Historique compacté]\n'
+
+
+def _raw_delete(queryset):
+    return queryset._raw_delete(queryset.db)
+
+
+def delete_notifications(pks):
+    """Supprime des notifications en laissant une trace pour /api/changes/."""
+    with transaction.atomic():
+        rows = list(Notification.objects.filter(pk__in=pks).values_list('pk', 'user_id'))
+        Tombstone.objects.bulk_create(
+            Tombstone(model='notification', object_id=pk, owner_id=user_id) for pk, user_id in rows
+        )
+        return _raw_delete(Notification.objects.filter(pk__in=pks))
+
+
+class KeepRecentNotifications:
+    """
+    Ne garde que les ``keep`` notifications les plus récentes de chaque
+    utilisateur. Les utilisateurs concernés sont cherchés une fois par
+    exécution (le GROUP BY parcourt toute la table), puis traités un par un.
+    """
+    name = 'notifications_per_user'
+
+    def __init__(self, keep=None):
+        self.keep = keep if keep is not None else getattr(settings, 'NOTIFICATION_RETENTION_PER_USER', 200)
+        self._users = None
+
+    def over_limit(self):
+        return Notification.objects.values('user_id').annotate(total=Count('id')).filter(total__gt=self.keep).order_by('user_id')
+
+    def count(self):
+        return sum(row['total'] - self.keep for row in self.over_limit())
+
+    def run_batch(self, batch_size):
+        if self._users is None:
+            self._users = deque(row['user_id'] for row in self.over_limit())
+        while self._users:
+            pks = list(
+                Notification.objects.filter(user_id=self._users[0]).order_by('-created_at', '-id')
+                .values_list('pk', flat=True)[self.keep:self.keep + batch_size]
+            )
+            if len(pks) < batch_size:
+                # Dernier lot de cet utilisateur.
+                self._users.popleft()
+            if pks:
+                return delete_notifications(pks)
+        return 0
+
+
+class DropReadNotifications:
+    """Supprime les notifications lues depuis plus de ``days`` jours."""
+    name = 'read_notifications'
+
+    def __init__(self, days=None):
+        self.days = days if days is not None else getattr(settings, 'NOTIFICATION_READ_RETENTION_DAYS', 90)
+
+    def queryset(self):
+        return Notification.objects.filter(is_read=True, created_at__lt=timezone.now() - timedelta(days=self.days))
+
+    def count(self):
+        return self.queryset().count()
+
+    def run_batch(self, batch_size):
+        pks = list(self.queryset().order_by('pk').values_list('pk', flat=True)[:batch_size])
+        return delete_notifications(pks) if pks else 0
+
+
+class CompactAIHistory:
+    """
+    Fusionne les échanges IA de plus de ``days`` jours de chaque utilisateur
+    en un seul message (transcription tronquée à ``max_chars`` caractères).
+    """
+    name = 'ai_history'
+
+    def __init__(self, days=None, max_chars=None):
+        self.days = days if days is not None else getattr(settings, 'AI_HISTORY_COMPACT_AFTER_DAYS', 30)
+        self.max_chars = max_chars or getattr(settings, 'AI_HISTORY_COMPACT_MAX_CHARS', 4000)
+
+    def old_turns(self):
+        return AIConversation.objects.filter(created_at__lt=timezone.now() - timedelta(days=self.days))
+
+    def pending(self):
+        # Un utilisateur déjà compacté n'a plus qu'un seul ancien message.
+        return self.old_turns().values('user_id').annotate(total=Count('id')).filter(total__gt=1).order_by('user_id')
+
+    def count(self):
+        return sum(row['total'] - 1 for row in self.pending())
+
+    def run_batch(self, batch_size):
+        row = self.pending().first()
+        if row is None:
+            return 0
+        turns = list(
+            self.old_turns().filter(user_id=row['user_id']).order_by('created_at', 'id')
+            .values_list('pk', 'sender', 'message', 'created_at')[:max(batch_size, 2)]
+        )
+        lines = []
+        for _, sender, message, _ in turns:
+            if message.startswith(COMPACTED_PREFIX):
+                lines.append(message[len(COMPACTED_PREFIX):])
+            else:
+                lines.append(f"{'Vous' if sender == 'user' else 'Assistant'} : {message}")
+        transcript = '\n'.join(lines)[-self.max_chars:]
+
+        first, others = turns[0][0], [turn[0] for turn in turns[1:]]
+        with transaction.atomic():
+            # Le message compacté prend la date du dernier échange fusionné.
+            AIConversation.objects.filter(pk=first).update(
+                sender='ai', message=COMPACTED_PREFIX + transcript, created_at=turns[-1][3],
+            )
+            return _raw_delete(AIConversation.objects.filter(pk__in=others))
+
+
+class PurgeTombstones:
+    """Supprime les traces plus anciennes que ``TOMBSTONE_RETENTION_DAYS`` (voir changes.py)."""
+    name = 'tombstones'
+
+    def __init__(self, days=None):
+        self.days = days if days is not None else getattr(settings, 'TOMBSTONE_RETENTION_DAYS', 30)
+
+    def queryset(self):
+        return Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=self.days))
+
+    def count(self):
+        return self.queryset().count()
+
+    def run_batch(self, batch_size):
+        pks = list(self.queryset().order_by('deleted_at').values_list('pk', flat=True)[:batch_size])
+        return _raw_delete(Tombstone.objects.filter(pk__in=pks)) if pks else 0
+
+
+POLICIES = {
+    policy.name: policy
+    for policy in (KeepRecentNotifications, DropReadNotifications, CompactAIHistory, PurgeTombstones)
+}
@@ -0,0 +1,83 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+PIN_COOKIE = 'replica_pin'
+
+# État de routage de la requête HTTP en cours, posé par ReplicaRoutingMiddleware.
+# Hors cycle requête (commandes, tâches), toutes les lectures vont sur 'default'.
+_state = ContextVar('replica_routing_state', default=None)
+
+
+class RoutingState:
+    def __init__(self, allow_replica):
+        self.allow_replica = allow_replica
+        self.wrote = False
+
+
+def activate(allow_replica):
+    return _state.set(RoutingState(allow_replica))
+
+
+def deactivate(token):
+    """Restaure l'état précédent et indique si la requête a écrit en base."""
+    state = _state.get()
+    _state.reset(token)
+    return bool(state and state.wrote)
+
+
+@contextmanager
+def use_primary():
+    """Force les lectures du bloc sur la base principale."""
+    token = activate(False)
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+def pin_cache_key(key):
+    return f'replica-pin:{key}'
+
+
+def pin(key):
+    if key:
+        cache.set(pin_cache_key(key), True, pin_seconds())
+
+
+def is_pinned(key):
+    return bool(key) and cache.get(pin_cache_key(key)) is not None
+
+
+class ReplicaRouter:
+    """
+    Envoie les lectures des requêtes HTTP en lecture seule vers une réplique
+    de ``settings.DATABASE_REPLICAS``. Les écritures vont toujours sur
+    'default' et épinglent le client sur la base principale pendant
+    ``REPLICA_PIN_SECONDS`` pour qu'il relise ses propres écritures.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas or state is None or not state.allow_replica:
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+            state.allow_replica = False
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Les répliques contiennent les mêmes données que la base principale.
+        return True
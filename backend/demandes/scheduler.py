@@ -0,0 +1,325 @@
+"""
+Planificateur de tâches périodiques intégré aux processus web, sans Celery
+ni broker.
+
+Chaque tâche (jobs.py) a une planification, ``Interval`` ou ``Cron``
+(expression à 5 champs), remplaçable par ``SCHEDULER_JOBS``. Son état
+partagé est une ligne ScheduledJob : date de prochaine exécution et bail.
+Tous les workers interrogent la table toutes les ``SCHEDULER_TICK``
+secondes ; pour une tâche échue, chacun tente le même UPDATE conditionnel
+(tâche échue, bail libre ou expiré) et seul celui dont l'UPDATE modifie la
+ligne l'exécute. Un worker mort en cours de tâche libère la tâche à
+l'expiration du bail (``timeout`` de la tâche, sinon
+``SCHEDULER_LOCK_TIMEOUT``).
+
+Chaque exécution est enregistrée dans JobRun (durée, statut, résultat ou
+trace), au plus ``SCHEDULER_HISTORY_SIZE`` par tâche. Le thread est démarré
+par wsgi.py / asgi.py si ``SCHEDULER_ENABLED`` ; la commande run_scheduler
+le remplace dans un processus dédié.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import JobRun, ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+
+class Interval:
+    def __init__(self, seconds=0, minutes=0, hours=0, days=0):
+        self.delta = timedelta(seconds=seconds, minutes=minutes, hours=hours, days=days)
+        if self.delta <= timedelta(0):
+            raise ValueError("L'intervalle doit être positif")
+
+    def next_after(self, after):
+        return after + self.delta
+
+    def __str__(self):
+        return f'toutes les {int(self.delta.total_seconds())} s'
+
+
+class Cron:
+    """
+    Expression cron à 5 champs (minute, heure, jour, mois, jour de la
+    semaine avec 0 = dimanche), évaluée dans le fuseau TIME_ZONE. Accepte
+    ``*``, les listes, les intervalles ``a-b`` et les pas ``*/n`` ou ``a-b/n``.
+    """
+    FIELDS = (('minute', 0, 59), ('heure', 0, 23), ('jour', 1, 31), ('mois', 1, 12), ('jour de la semaine', 0, 7))
+    ALIASES = {
+        '@hourly': '0 * * * *',
+        '@daily': '0 0 * * *',
+        '@weekly': '0 0 * * 0',
+        '@monthly': '0 0 1 * *',
+    }
+
+    def __init__(self, expression):
+        self.expression = expression
+        parts = self.ALIASES.get(expression.strip(), expression).split()
+        if len(parts) != 5:
+            raise ValueError(f"Expression cron invalide (5 champs attendus) : {expression!r}")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(part, *field) for part, field in zip(parts, self.FIELDS)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        # Jour du mois et jour de la semaine tous deux restreints : l'un ou l'autre suffit (comme cron).
+        self.days_or_weekdays = parts[2] != '*' and parts[4] != '*'
+
+    @staticmethod
+    def _parse(part, name, low, high):
+        values = set()
+        for item in part.split(','):
+            item, _, step = item.partition('/')
+            if item == '*':
+                start, end = low, high
+            elif '-' in item:
+                start, end = (int(value) for value in item.split('-', 1))
+            else:
+                # « a/n » : de a jusqu'à la fin du champ, par pas de n.
+                start = int(item)
+                end = high if step else start
+            step = int(step) if step else 1
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Champ {name} invalide : {part!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment):
+        in_days = moment.day in self.days
+        in_weekdays = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.days_or_weekdays:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, after):
+        moment = timezone.localtime(after).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Aucune date ne correspond à {self.expression!r}")
+
+    def __str__(self):
+        return self.expression
+
+
+def parse_schedule(value):
+    """Planification depuis SCHEDULER_JOBS : secondes, timedelta, expression cron ou instance."""
+    if isinstance(value, (Interval, Cron)):
+        return value
+    if isinstance(value, timedelta):
+        return Interval(seconds=value.total_seconds())
+    if isinstance(value, (int, float)):
+        return Interval(seconds=value)
+    return Cron(value)
+
+
+class Job:
+    def __init__(self, name, schedule, func, timeout=None):
+        self.name = name
+        self.schedule = schedule
+        self.func = func
+        self.timeout = timeout
+
+
+def enabled():
+    return getattr(settings, 'SCHEDULER_ENABLED', False)
+
+
+class Scheduler:
+    def __init__(self):
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # {nom: planification} des lignes ScheduledJob déjà synchronisées par ce processus.
+        self._synced = {}
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def register(self, name, schedule, timeout=None):
+        """Décorateur : ``@scheduler.register('nom', Interval(minutes=15))``."""
+        def decorator(func):
+            self.jobs[name] = Job(name, schedule, func, timeout)
+            return func
+        return decorator
+
+    @property
+    def worker_id(self):
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def schedules(self):
+        """{nom: (tâche, planification)} des tâches actives ; SCHEDULER_JOBS[nom] = None désactive."""
+        overrides = getattr(settings, 'SCHEDULER_JOBS', {})
+        active = {}
+        for name, job in self.jobs.items():
+            if name not in overrides:
+                active[name] = (job, job.schedule)
+            elif overrides[name] is not None:
+                active[name] = (job, parse_schedule(overrides[name]))
+        return active
+
+    def status(self):
+        """État des tâches actives et de leur dernière exécution, en une requête."""
+        active = self.schedules()
+        last = JobRun.objects.filter(job=OuterRef('name')).order_by('-started_at')
+        rows = {
+            row['name']: row for row in ScheduledJob.objects.filter(name__in=list(active)).annotate(
+                last_started_at=Subquery(last.values('started_at')[:1]),
+                last_status=Subquery(last.values('status')[:1]),
+                last_duration_ms=Subquery(last.values('duration_ms')[:1]),
+            ).values('name', 'next_run_at', 'locked_by', 'locked_until', 'last_started_at', 'last_status', 'last_duration_ms')
+        }
+        empty = dict.fromkeys(('next_run_at', 'locked_by', 'locked_until', 'last_started_at', 'last_status', 'last_duration_ms'))
+        return [
+            {**empty, **rows.get(name, {}), 'name': name, 'schedule': str(schedule)}
+            for name, (_, schedule) in active.items()
+        ]
+
+    def run_pending(self, now=None):
+        """Exécute les tâches échues dont ce worker obtient le bail ; renvoie leurs JobRun."""
+        now = now or timezone.now()
+        active = self.schedules()
+        if not active:
+            return []
+        self.sync_rows(active, now)
+        due = list(
+            ScheduledJob.objects.filter(name__in=list(active), next_run_at__lte=now)
+            .filter(Q(locked_until__isnull=True) | Q(locked_until__lte=now))
+            .order_by('next_run_at').values_list('name', flat=True)
+        )
+        runs = []
+        for name in due:
+            job, schedule = active[name]
+            if self.acquire(job, now):
+                runs.append(self.execute(job, schedule, now))
+        return runs
+
+    def sync_rows(self, active, now):
+        """
+        Crée les lignes des nouvelles tâches, une fois par processus et par
+        planification ; une planification raccourcie avance la prochaine exécution.
+        """
+        pending = {name: schedule for name, (_, schedule) in active.items() if self._synced.get(name) != str(schedule)}
+        if not pending:
+            return
+        next_runs = {name: schedule.next_after(now) for name, schedule in pending.items()}
+        ScheduledJob.objects.bulk_create(
+            [ScheduledJob(name=name, next_run_at=next_run) for name, next_run in next_runs.items()],
+            ignore_conflicts=True,
+        )
+        for name, next_run in next_runs.items():
+            ScheduledJob.objects.filter(name=name, next_run_at__gt=next_run).update(next_run_at=next_run)
+            self._synced[name] = str(pending[name])
+
+    def run_now(self, name):
+        """Exécute la tâche tout de suite si aucun worker ne la détient ; renvoie le JobRun ou None."""
+        job, schedule = self.schedules()[name]
+        now = timezone.now()
+        ScheduledJob.objects.get_or_create(name=name, defaults={'next_run_at': schedule.next_after(now)})
+        if not self.acquire(job, now, due_only=False):
+            return None
+        return self.execute(job, schedule, now)
+
+    def acquire(self, job, now, due_only=True):
+        lease = now + timedelta(seconds=job.timeout or getattr(settings, 'SCHEDULER_LOCK_TIMEOUT', 3600))
+        queryset = ScheduledJob.objects.filter(name=job.name).filter(Q(locked_until__isnull=True) | Q(locked_until__lte=now))
+        if due_only:
+            queryset = queryset.filter(next_run_at__lte=now)
+        return queryset.update(locked_by=self.worker_id, locked_until=lease) == 1
+
+    def execute(self, job, schedule, now):
+        started_at, started = timezone.now(), time.perf_counter()
+        try:
+            result = job.func()
+            status, text = 'succes', '' if result is None else str(result)
+        except Exception:
+            logger.exception("Planificateur : échec de la tâche %s", job.name, extra={'job': job.name})
+            status, text = 'echec', traceback.format_exc()
+        duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        finished_at = timezone.now()
+
+        # La prochaine exécution part de la fin de celle-ci : une tâche plus
+        # longue que son intervalle ne s'enchaîne pas avec elle-même.
+        ScheduledJob.objects.filter(name=job.name, locked_by=self.worker_id).update(
+            next_run_at=schedule.next_after(max(finished_at, now)), locked_by='', locked_until=None,
+        )
+        run = JobRun.objects.create(
+            job=job.name, worker=self.worker_id, started_at=started_at, finished_at=finished_at,
+            duration_ms=duration_ms, status=status, result=text,
+        )
+        self.trim_history(job.name)
+        logger.info(
+            "Planificateur : tâche %s terminée", job.name,
+            extra={'job': job.name, 'status': status, 'duration_ms': duration_ms},
+        )
+        return run
+
+    def trim_history(self, name):
+        keep = getattr(settings, 'SCHEDULER_HISTORY_SIZE', 100)
+        oldest_kept = list(
+            JobRun.objects.filter(job=name).order_by('-started_at').values_list('started_at', flat=True)[keep - 1:keep]
+        )
+        if oldest_kept:
+            JobRun.objects.filter(job=name, started_at__lt=oldest_kept[0]).delete()
+
+    def start(self):
+        """Démarre le thread du planificateur (une fois par processus) si SCHEDULER_ENABLED."""
+        if not enabled():
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name='scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _after_fork(self):
+        # Serveurs à processus préchargés : le thread du parent n'existe pas
+        # dans l'enfant, qui démarre le sien.
+        if self._thread is not None:
+            self._lock = threading.Lock()
+            self._thread = None
+            self.start()
+
+    def run_forever(self):
+        tick = getattr(settings, 'SCHEDULER_TICK', 30)
+        # Décalage aléatoire : les workers démarrés ensemble n'interrogent pas la base au même instant.
+        if self._stop.wait(random.uniform(0, tick)):
+            return
+        while True:
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception("Planificateur : échec du cycle")
+            finally:
+                # Connexions ouvertes par ce thread : ne pas les garder entre deux cycles.
+                connections.close_all()
+            if self._stop.wait(tick):
+                return
+
+
+scheduler = Scheduler()
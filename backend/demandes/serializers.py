@@ -30,7 +30,8 @@ class LoginSerializer(serializers.Serializer):
         }
 
 from rest_framework import serializers
-from .models import Request
+from .models import Category, Request
+from . import classifier
 
 class FeedbackSerializer(serializers.ModelSerializer):
     client_name = serializers.SerializerMethodField()
@@ -57,8 +58,35 @@ class FeedbackSerializer(serializers.ModelSerializer):
     def get_request_title(self, obj):
         return obj.request.title if hasattr(obj.request, 'title') else f"Demande {obj.request.id}"
 
+class CategoryField(serializers.Field):
+    """
+    Catégorie lue et écrite par son nom. Un nom inconnu ne crée la catégorie
+    que pour un admin ou s'il fait partie de Category.STANDARD ; sinon (faute
+    de frappe d'un client), il vaut la catégorie par défaut, que le
+    classement automatique peut remplacer.
+    """
+    default_error_messages = {'invalid': "Nom de catégorie invalide."}
+
+    def to_representation(self, value):
+        return value.name
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str) or not data.strip() or len(data) > 100:
+            self.fail('invalid')
+        request = self.context.get('request')
+        if request is not None and getattr(request.user, 'role', None) == 'admin':
+            return Category.objects.resolve(data)
+        key = Category.key_of(data)
+        standard = {Category.key_of(name): name for name in Category.STANDARD}
+        if key in standard:
+            return Category.objects.resolve(standard[key])
+        category = Category.objects.filter(key=key).first()
+        return category if category is not None else Category.objects.resolve(Category.DEFAULT)
+
+
 class RequestSerializer(serializers.ModelSerializer):
     user_name = serializers.SerializerMethodField()
+    category = CategoryField(required=False)
     first_name = serializers.CharField(source='user.first_name')
     feedback = FeedbackSerializer(read_only=True, allow_null=True)  # Ajouter explicitement
 
@@ -70,6 +98,19 @@ class RequestSerializer(serializers.ModelSerializer):
     def get_user_name(self, obj):
         return obj.user.username if obj.user else None
 
+    def create(self, validated_data):
+        # Catégorie laissée par défaut : proposée par le classement automatique.
+        category = validated_data.get('category')
+        if category is None or category.name == Category.DEFAULT:
+            suggested = classifier.suggest(validated_data.get('title'), validated_data.get('description'))
+            if suggested:
+                validated_data['category'] = Category.objects.resolve(suggested)
+        if 'category' not in validated_data:
+            # Instance chargée ici plutôt que par la valeur par défaut du champ :
+            # la réponse lit son nom sans nouvelle requête.
+            validated_data['category'] = Category.objects.resolve(Category.DEFAULT)
+        return super().create(validated_data)
+
 from rest_framework import serializers
 
 class FeedbackSerializer(serializers.ModelSerializer):
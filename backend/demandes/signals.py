@@ -0,0 +1,184 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import categories, feedback_stats, priority
+from .detail_cache import request_details
+from .duplicates import OPEN_STATUSES, duplicate_index
+from .faq_index import faq_index
+from .models import User, Category, Request, Feedback, Notification, Tombstone
+
+
+def _cascaded_from(origin, *models):
+    # origin est l'instance ou le QuerySet à l'origine de la suppression.
+    model = getattr(origin, 'model', None) or type(origin)
+    return model in models
+
+
+@receiver(post_delete, sender=Request, dispatch_uid='tombstone-request')
+def request_deleted(sender, instance, origin=None, **kwargs):
+    Tombstone.objects.create(model='request', object_id=instance.pk, owner_id=instance.user_id)
+
+
+@receiver(post_delete, sender=Feedback, dispatch_uid='tombstone-feedback')
+def feedback_deleted(sender, instance, origin=None, **kwargs):
+    # Supprimé avec sa demande : la trace de la demande suffit aux clients.
+    if _cascaded_from(origin, Request, User):
+        return
+    Tombstone.objects.create(model='feedback', object_id=instance.pk, owner_id=instance.user_id)
+
+
+@receiver(post_delete, sender=Notification, dispatch_uid='tombstone-notification')
+def notification_deleted(sender, instance, origin=None, **kwargs):
+    if _cascaded_from(origin, Request, User):
+        return
+    Tombstone.objects.create(model='notification', object_id=instance.pk, owner_id=instance.user_id)
+
+
+def invalidate_request_details(*pks):
+    # Invalidation immédiate, puis à nouveau après le commit : une lecture
+    # concurrente faite avant le commit aurait pu remettre l'ancienne réponse.
+    pks = [pk for pk in pks if pk is not None]
+    if pks:
+        request_details.invalidate(*pks)
+        transaction.on_commit(lambda: request_details.invalidate(*pks))
+
+
+@receiver(post_save, sender=Request, dispatch_uid='detail-cache-request-saved')
+@receiver(post_delete, sender=Request, dispatch_uid='detail-cache-request-deleted')
+def request_changed(sender, instance, **kwargs):
+    invalidate_request_details(instance.pk)
+
+
+@receiver(post_save, sender=Feedback, dispatch_uid='detail-cache-feedback-saved')
+@receiver(post_delete, sender=Feedback, dispatch_uid='detail-cache-feedback-deleted')
+def feedback_changed(sender, instance, **kwargs):
+    invalidate_request_details(instance.request_id)
+
+
+DISPLAYED_USER_FIELDS = ('username', 'first_name')
+
+
+@receiver(post_init, sender=User, dispatch_uid='detail-cache-user-loaded')
+def user_loaded(sender, instance, **kwargs):
+    # Valeurs chargées, lues dans __dict__ pour ne pas charger un champ différé.
+    instance._displayed_names = tuple(instance.__dict__.get(field) for field in DISPLAYED_USER_FIELDS)
+
+
+@receiver(post_save, sender=User, dispatch_uid='detail-cache-user-saved')
+def user_saved(sender, instance, created, **kwargs):
+    names = tuple(instance.__dict__.get(field) for field in DISPLAYED_USER_FIELDS)
+    if created or names == instance._displayed_names:
+        return
+    instance._displayed_names = names
+    # Le nom apparaît dans les demandes du client et dans ses avis.
+    pks = Request.objects.filter(Q(user=instance) | Q(feedback__user=instance)).values_list('pk', flat=True)
+    invalidate_request_details(*pks)
+
+
+@receiver(post_init, sender=Feedback, dispatch_uid='feedback-stats-loaded')
+def feedback_loaded(sender, instance, **kwargs):
+    instance._aggregated_rating = instance.__dict__.get('rating')
+
+
+@receiver(post_save, sender=Feedback, dispatch_uid='feedback-stats-saved')
+def feedback_saved(sender, instance, created, **kwargs):
+    old_rating, instance._aggregated_rating = instance._aggregated_rating, instance.rating
+    if not created and old_rating == instance.rating:
+        return
+    category_id, period = instance.request.category_id, feedback_stats.period_of(instance.created_at)
+    if not created:
+        feedback_stats.apply(category_id, period, [old_rating], sign=-1)
+    feedback_stats.apply(category_id, period, [instance.rating])
+
+
+@receiver(post_delete, sender=Feedback, dispatch_uid='feedback-stats-deleted')
+def feedback_removed(sender, instance, **kwargs):
+    category_id = Request.all_objects.filter(pk=instance.request_id).values_list('category_id', flat=True).first()
+    if category_id is not None:
+        feedback_stats.apply(category_id, feedback_stats.period_of(instance.created_at), [instance.rating], sign=-1)
+
+
+# Request.save lit la ligne enregistrée sous verrou (instance._stored, absent
+# pour un chargement de fixtures) : les variations ne dépendent pas de l'état
+# chargé en mémoire, peut-être périmé.
+
+@receiver(post_save, sender=Request, dispatch_uid='feedback-stats-request-saved')
+def request_category_changed(sender, instance, created, **kwargs):
+    stored = getattr(instance, '_stored', None)
+    if created or stored is None or stored.category_id == instance.category_id:
+        return
+    old_category = stored.category_id
+    # L'avis éventuel change de catégorie dans les agrégats.
+    feedback = Feedback.objects.filter(request_id=instance.pk).values_list('created_at', 'rating').first()
+    if feedback is not None:
+        period = feedback_stats.period_of(feedback[0])
+        feedback_stats.apply(old_category, period, [feedback[1]], sign=-1)
+        feedback_stats.apply(instance.category_id, period, [feedback[1]])
+
+
+@receiver(post_save, sender=Request, dispatch_uid='category-counters-request-saved')
+def request_recounted(sender, instance, created, **kwargs):
+    stored = getattr(instance, '_stored', None)
+    old = categories.counted(stored.category_id, stored.status, stored.deleted_at) if stored else None
+    categories.move(old, categories.counted(instance.category_id, instance.status, instance.deleted_at))
+
+
+@receiver(post_delete, sender=Request, dispatch_uid='category-counters-request-deleted')
+def request_uncounted(sender, instance, **kwargs):
+    categories.move(categories.counted(instance.category_id, instance.status, instance.deleted_at), None)
+
+
+@receiver(post_save, sender=Request, dispatch_uid='faq-index-request-saved')
+def faq_request_saved(sender, instance, **kwargs):
+    if instance.status != 'resolue' or instance.deleted_at is not None:
+        transaction.on_commit(lambda: faq_index.discard(instance.pk))
+        return
+    fields = (instance.pk, instance.title, instance.description, instance.admin_comment)
+    transaction.on_commit(lambda: faq_index.update(*fields))
+
+
+@receiver(post_delete, sender=Request, dispatch_uid='faq-index-request-deleted')
+def faq_request_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: faq_index.discard(pk))
+
+
+@receiver(post_save, sender=Request, dispatch_uid='duplicate-index-request-saved')
+def duplicate_request_saved(sender, instance, **kwargs):
+    if instance.status not in OPEN_STATUSES or instance.deleted_at is not None:
+        transaction.on_commit(lambda: duplicate_index.discard(instance.pk))
+        return
+    fields = (instance.pk, instance.user_id, instance.title, instance.description)
+    transaction.on_commit(lambda: duplicate_index.update(*fields))
+
+
+@receiver(post_delete, sender=Request, dispatch_uid='duplicate-index-request-deleted')
+def duplicate_request_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: duplicate_index.discard(pk))
+
+
+def refresh_priorities_on_commit(**filters):
+    transaction.on_commit(lambda: priority.refresh(Request.objects.filter(**filters)))
+
+
+@receiver(post_save, sender=Request, dispatch_uid='priority-request-saved')
+def priority_request_saved(sender, instance, **kwargs):
+    refresh_priorities_on_commit(pk=instance.pk)
+
+
+@receiver(post_save, sender=Feedback, dispatch_uid='priority-feedback-saved')
+@receiver(post_delete, sender=Feedback, dispatch_uid='priority-feedback-deleted')
+def priority_feedback_changed(sender, instance, **kwargs):
+    # L'avis compte pour sa demande et pour l'historique de son auteur.
+    refresh_priorities_on_commit(pk=instance.request_id)
+    if instance.user_id is not None:
+        refresh_priorities_on_commit(user_id=instance.user_id, status__in=priority.OPEN_STATUSES)
+
+
+@receiver(post_save, sender=Category, dispatch_uid='priority-category-saved')
+def priority_category_saved(sender, instance, created, **kwargs):
+    if not created:
+        refresh_priorities_on_commit(category_id=instance.pk, status__in=priority.OPEN_STATUSES)
@@ -0,0 +1,42 @@
+from django.db.models import Avg, Count, Sum
+
+from .models import RequestStatusEvent
+
+
+def _in_range(queryset, since=None, until=None):
+    if since:
+        queryset = queryset.filter(created_at__gte=since)
+    if until:
+        queryset = queryset.filter(created_at__lt=until)
+    return queryset
+
+
+def time_in_state(since=None, until=None):
+    """
+    Temps passé dans chaque statut pour les sorties d'état dans [since, until).
+    Les fenêtres sont disjointes : les totaux de plusieurs fenêtres s'additionnent.
+    """
+    rows = (
+        _in_range(RequestStatusEvent.objects.exclude(from_status=''), since, until)
+        .values('from_status')
+        .annotate(count=Count('id'), total_seconds=Sum('seconds_in_previous'), avg_seconds=Avg('seconds_in_previous'))
+        .order_by()
+    )
+    return {
+        row['from_status']: {
+            'count': row['count'],
+            'total_seconds': row['total_seconds'] or 0,
+            'avg_seconds': row['avg_seconds'] or 0,
+        }
+        for row in rows
+    }
+
+
+def transition_counts(since=None, until=None):
+    rows = (
+        _in_range(RequestStatusEvent.objects.all(), since, until)
+        .values('from_status', 'to_status')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    return [{'from': row['from_status'] or None, 'to': row['to_status'], 'count': row['count']} for row in rows]
@@ -1,3 +1,1582 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import pstats
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from importlib import import_module
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from types import SimpleNamespace
 
-# Create your tests here.
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+from django.utils import timezone
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import batch, classifier, jobs, deletion, feedback_stats, priority, profiling, routers
+
+from .models import (
+    User, Category, Request, Feedback, Notification, AIConversation, Tombstone, ArchivedRequest, ArchivedNotification,
+    JobRun, ScheduledJob, IdempotencyKey, InvalidTransition,
+)
+from .detail_cache import DetailCache, request_details
+from .duplicates import duplicate_index
+from .faq_index import faq_index
+from .idempotency import fingerprint, idempotent
+from .log import QueueingHandler, SamplingFilter
+from .middleware import CompressionMiddleware, ProfilingMiddleware, ReplicaRoutingMiddleware
+from .retention import KeepRecentNotifications
+from .query_budget import QueryBudget, QueryBudgetExceeded, sql_shape
+from .routers import ReplicaRouter
+from .scheduler import Cron, Interval, Scheduler, scheduler
+from .serializers import RequestSerializer
+
+
+def has_budget(handler):
+    if hasattr(handler, 'query_budget'):
+        return True
+    # Vues @api_view : la fonction décorée est capturée par le handler généré par DRF.
+    cells = getattr(handler, '__closure__', None) or ()
+    return any(hasattr(cell.cell_contents, 'query_budget') for cell in cells)
+
+
+def make_user(email='client@example.com', role='client', **extra):
+    return User.objects.create_user(username=email, email=email, password='secret123', role=role, **extra)
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = make_user('admin@example.com', role='admin')
+        self.users = [make_user(f'client{i}@example.com') for i in range(3)]
+        for i, user in enumerate(self.users):
+            for j in range(3):
+                req = Request.objects.create(user=user, title=f'Demande {i}-{j}', status='resolue')
+                Feedback.objects.create(user=user, request=req, rating=4)
+                Notification.objects.create(user=user, request=req, message='Mise à jour')
+
+    def test_sql_shape_ignores_parameters(self):
+        self.assertEqual(
+            sql_shape("SELECT * FROM t WHERE id = 12 AND name = 'x'"),
+            sql_shape("SELECT * FROM t WHERE id = 13 AND name = 'y'"),
+        )
+        self.assertEqual(sql_shape('WHERE id IN (%s, %s, %s)'), 'WHERE id IN (...)')
+
+    def test_raises_when_query_count_exceeded(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with QueryBudget(max_queries=1, mode='raise'):
+                list(User.objects.all())
+                list(Request.objects.all())
+
+    def test_raises_on_repeated_shape(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with QueryBudget(max_repeats=2, mode='raise'):
+                for req in Request.objects.all():
+                    req.user.email
+
+    def test_warn_mode_logs(self):
+        with self.assertLogs('demandes.query_budget', level='WARNING'):
+            with QueryBudget(max_queries=0, mode='warn'):
+                list(User.objects.all())
+
+    @override_settings(QUERY_BUDGET_MODE='off')
+    def test_off_mode_does_not_record(self):
+        with QueryBudget(max_queries=0) as budget:
+            list(User.objects.all())
+        self.assertEqual(budget.count, 0)
+
+    def test_list_endpoints_stay_within_budget(self):
+        self.client.force_authenticate(self.admin)
+        for url in ['/api/requests/all/', '/api/feedbacks/', '/api/stats/']:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+
+        self.client.force_authenticate(self.users[0])
+        for url in ['/api/requests/', '/notifications/']:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+        self.assertEqual(len(response.data), 3)
+
+    def test_write_endpoints_stay_within_budget(self):
+        user = self.users[0]
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/requests/create/', {'title': 'Imprimante', 'description': 'HS', 'first_name': 'Ana'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        request_id = response.data['id']
+        response = self.client.post('/api/requests/', {'title': 'Réseau', 'first_name': 'Ana'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.put(f'/api/requests/{request_id}/status/', {'status': 'resolue'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.client.force_authenticate(user)
+        response = self.client.post(f'/api/requests/{request_id}/feedback/', {'rating': 5}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get(f'/api/requests/{request_id}/')
+        self.assertEqual(response.data['feedback']['rating'], 5)
+
+    def test_stats_average_resolution_time(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/stats/')
+        self.assertEqual(response.data['total'], 9)
+        self.assertEqual(response.data['statusCounts']['resolue'], 9)
+        self.assertEqual(response.data['avgRating'], 4)
+
+    def test_every_demandes_view_declares_a_budget(self):
+        missing = []
+        for pattern in get_resolver().url_patterns:
+            callback = getattr(pattern, 'callback', None)
+            if callback is None or not callback.__module__.startswith('demandes'):
+                continue
+            view_class = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None)
+            if view_class is None:
+                if not hasattr(callback, 'query_budget'):
+                    missing.append(pattern.pattern)
+                continue
+            actions = getattr(callback, 'actions', None)
+            handlers = actions.values() if actions else view_class.http_method_names
+            for name in handlers:
+                handler = getattr(view_class, name, None)
+                if handler is None or name in ('options', 'head'):
+                    continue
+                if not has_budget(handler):
+                    missing.append(f'{pattern.pattern} {name}')
+        self.assertEqual(missing, [])
+
+
+@pytest.mark.django_db
+def test_query_budget_fixture(query_budget):
+    user = make_user()
+    Request.objects.create(user=user, title='A')
+    client = APIClient()
+    client.force_authenticate(user)
+    with query_budget(max_queries=2, max_repeats=1) as budget:
+        client.get('/api/requests/')
+    assert budget.count <= 2
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(max_queries=0):
+            list(Request.objects.all())
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_generate_and_benchmark(self):
+        import json
+        import tempfile
+
+        call_command('generate_synthetic_data', users=5, admins=1, requests=40, stdout=StringIO())
+        self.assertEqual(Request.objects.count(), 40)
+        self.assertEqual(User.objects.filter(role='admin').count(), 1)
+        self.assertTrue(all(r.resolved_at for r in Request.objects.filter(status='resolue')))
+        feedbacks = Feedback.objects.all()
+        self.assertTrue(feedbacks.exists())
+        admin = User.objects.get(role='admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+        summary = client.get('/api/feedbacks/summary/').data
+        self.assertEqual(summary['count'], feedbacks.count())
+        self.assertEqual(summary['rating_sum'], sum(f.rating for f in feedbacks))
+        stats = client.get('/api/stats/').data
+        self.assertEqual(stats['avgRating'], round(summary['rating_sum'] / summary['count'], 1))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output = f'{tmp}/bench.json'
+            call_command('benchmark_api', iterations=2, warmup=0, output=output, stdout=StringIO())
+            with open(output) as fh:
+                results = json.load(fh)
+        self.assertEqual(results['dataset']['requests'], 40)
+        self.assertEqual(
+            set(results['results']), {'requests', 'requests_all', 'stats', 'notifications', 'feedbacks'}
+        )
+        self.assertIn('p99_ms', results['results']['stats'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.admin = make_user('admin@example.com', role='admin')
+        # Même utilisateur sur la réplique, mais des demandes différentes
+        # pour savoir quelle base a servi la lecture.
+        User.objects.using('replica').create(
+            id=self.admin.id, username=self.admin.username, email=self.admin.email,
+            password=self.admin.password, role='admin',
+        )
+        Request.objects.create(user=self.admin, title='Principale')
+        Request.objects.using('replica').create(user_id=self.admin.id, title='Réplique')
+        self.client = APIClient()
+        token = RefreshToken.for_user(self.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def titles(self):
+        return [item['title'] for item in self.client.get('/api/requests/all/').data]
+
+    def test_router_outside_request_uses_default(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Request), 'default')
+        token = routers.activate(True)
+        try:
+            self.assertEqual(router.db_for_read(Request), 'replica')
+            self.assertEqual(router.db_for_write(Request), 'default')
+            # Après une écriture, la suite de la requête relit la base principale.
+            self.assertEqual(router.db_for_read(Request), 'default')
+        finally:
+            self.assertTrue(routers.deactivate(token))
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.titles(), ['Réplique'])
+
+    def test_writer_is_pinned_to_primary(self):
+        response = self.client.post('/api/requests/create/', {'title': 'Nouvelle', 'first_name': 'A'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        self.assertEqual(sorted(self.titles()), ['Nouvelle', 'Principale'])
+
+        # Sans cookie, l'épinglage suit l'utilisateur du JWT via le cache.
+        self.client.cookies.clear()
+        self.assertEqual(sorted(self.titles()), ['Nouvelle', 'Principale'])
+
+        cache.clear()
+        self.assertEqual(self.titles(), ['Réplique'])
+
+
+class StatusTransitionTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin@example.com', role='admin')
+        self.user = make_user()
+        self.request = Request.objects.create(user=self.user, title='Écran')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def put_status(self, value):
+        return self.client.put(f'/api/requests/{self.request.id}/status/', {'status': value}, format='json')
+
+    def test_creation_is_logged(self):
+        event = self.request.status_events.get()
+        self.assertEqual((event.from_status, event.to_status), ('', 'en_attente'))
+
+    def test_transitions_are_validated_and_logged(self):
+        self.assertEqual(self.put_status('inconnu').status_code, 400)
+        self.assertEqual(self.put_status('en_cours').status_code, 200)
+        self.assertEqual(self.put_status('resolue').status_code, 200)
+        self.assertEqual(self.put_status('rejetee').status_code, 400)
+        self.assertEqual(self.put_status('en_cours').status_code, 200)
+
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.status, 'en_cours')
+        self.assertEqual(
+            list(self.request.status_events.values_list('from_status', 'to_status')),
+            [('', 'en_attente'), ('en_attente', 'en_cours'), ('en_cours', 'resolue'), ('resolue', 'en_cours')],
+        )
+        self.assertEqual(self.request.status_events.last().actor, self.admin)
+
+    def test_stale_instance_is_validated_against_stored_status(self):
+        stale = Request.objects.get(pk=self.request.pk)
+        self.request.transition_to('resolue')
+        with self.assertRaises(InvalidTransition):
+            stale.transition_to('rejetee')
+        self.assertEqual(stale.status, 'resolue')
+        self.assertEqual(
+            list(self.request.status_events.values_list('from_status', 'to_status')),
+            [('', 'en_attente'), ('en_attente', 'resolue')],
+        )
+
+    def test_events_are_append_only(self):
+        event = self.request.status_events.get()
+        event.to_status = 'resolue'
+        with self.assertRaises(ValueError):
+            event.save()
+
+    def test_sla_endpoint(self):
+        self.request.transition_to('en_cours')
+        self.request.transition_to('resolue')
+        response = self.client.get('/api/stats/sla/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['timeInState']), {'en_attente', 'en_cours'})
+        self.assertEqual(response.data['timeInState']['en_cours']['count'], 1)
+
+
+class FastSerializerTests(TestCase):
+    def setUp(self):
+        self.user = make_user(first_name='Ana')
+        with_feedback = Request.objects.create(user=self.user, title='Clavier', status='resolue', admin_comment='OK')
+        Feedback.objects.create(user=self.user, request=with_feedback, rating=3, comment='Bien')
+        Request.objects.create(user=self.user, title='Souris', description='Cassée')
+        Notification.objects.create(user=self.user, request=with_feedback, message='Résolue')
+        AIConversation.objects.create(user=self.user, sender='user', message='Bonjour')
+
+    def assertSameJSON(self, drf_data, fast_data):
+        import json
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import ORJSONRenderer
+        self.assertEqual(
+            json.loads(JSONRenderer().render(drf_data)),
+            json.loads(ORJSONRenderer().render(fast_data)),
+        )
+
+    def test_matches_drf_serializers(self):
+        from .fast_serializers import (
+            RequestReadSerializer, FeedbackReadSerializer, NotificationReadSerializer,
+            UserReadSerializer, AIConversationReadSerializer,
+        )
+        from .serializers import (
+            RequestSerializer, FeedbackSerializer, NotificationSerializer, UserSerializer, AIConversationSerializer,
+        )
+        cases = [
+            (RequestSerializer, RequestReadSerializer, Request.objects.order_by('id')),
+            (FeedbackSerializer, FeedbackReadSerializer, Feedback.objects.order_by('id')),
+            (NotificationSerializer, NotificationReadSerializer, Notification.objects.order_by('id')),
+            (UserSerializer, UserReadSerializer, User.objects.order_by('id')),
+            (AIConversationSerializer, AIConversationReadSerializer, AIConversation.objects.order_by('id')),
+        ]
+        for drf_serializer, fast_serializer, queryset in cases:
+            with self.subTest(fast_serializer.__name__):
+                self.assertSameJSON(drf_serializer(queryset, many=True).data, fast_serializer.serialize(queryset))
+
+    def test_list_view_renders_with_orjson(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/requests/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        titles = {item['title']: item for item in response.json()}
+        self.assertIsNone(titles['Souris']['feedback'])
+        self.assertEqual(titles['Clavier']['feedback']['rating'], 3)
+        self.assertTrue(titles['Clavier']['created_at'].endswith('Z'))
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        from . import compression
+        compression.stats.reset()
+        self.admin = make_user('admin@example.com', role='admin')
+        for i in range(40):
+            Request.objects.create(user=self.admin, title=f'Demande répétitive {i}', description='Même texte ' * 5)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_negotiation(self):
+        from .compression import negotiate, GzipCodec, BrotliCodec
+        codecs = [BrotliCodec(5), GzipCodec(6)]
+        self.assertEqual(negotiate('gzip, deflate, br', codecs).name, 'br')
+        self.assertEqual(negotiate('br;q=0.5, gzip', codecs).name, 'gzip')
+        self.assertIsNone(negotiate('identity', codecs))
+        self.assertIsNone(negotiate('br;q=0, gzip;q=0', codecs))
+
+    @override_settings(COMPRESSION_ENCODINGS=['gzip'])
+    def test_gzip_large_json(self):
+        import gzip
+        import json
+        response = self.client.get('/api/requests/all/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 40)
+
+        stats = self.client.get('/api/metrics/compression/').json()
+        self.assertGreater(stats['get_all_requests']['saved_bytes'], 0)
+
+    def test_small_and_unaccepted_responses_untouched(self):
+        response = self.client.get('/api/stats/sla/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get('/api/requests/all/')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_response(self):
+        import gzip
+        from django.http import StreamingHttpResponse
+        from django.test import RequestFactory
+        from .middleware import CompressionMiddleware
+
+        chunks = [b'{"ligne": "%d"}\n' % i for i in range(100)]
+        with override_settings(COMPRESSION_ENCODINGS=['gzip']):
+            middleware = CompressionMiddleware(
+                lambda request: StreamingHttpResponse(iter(chunks), content_type='application/json')
+            )
+        response = middleware(RequestFactory().get('/flux/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(chunks))
+
+    def test_optional_codecs_roundtrip(self):
+        from .compression import available_codecs, brotli, zstandard
+        data = b'{"status": "en_attente"}' * 200
+        for codec in available_codecs():
+            if codec.name == 'br':
+                self.assertEqual(brotli.decompress(codec.compress(data)), data)
+                self.assertEqual(brotli.decompress(b''.join(codec.stream([data, data]))), data * 2)
+            elif codec.name == 'zstd':
+                decompressor = zstandard.ZstdDecompressor()
+                self.assertEqual(decompressor.decompressobj().decompress(codec.compress(data)), data)
+                self.assertEqual(decompressor.decompressobj().decompress(b''.join(codec.stream([data, data]))), data * 2)
+
+
+# Sans fenêtre relue : un curseur vaut la position exacte du dernier changement.
+@override_settings(CHANGES_OVERLAP_SECONDS=0)
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin@example.com', role='admin')
+        self.user = make_user()
+        self.other = make_user('autre@example.com')
+        self.request = Request.objects.create(user=self.user, title='Écran')
+        Request.objects.create(user=self.other, title='Autre client')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, cursor=None):
+        return self.client.get('/api/changes/', {'since': cursor} if cursor else {})
+
+    def test_initial_sync_is_scoped_to_user(self):
+        response = self.sync()
+        self.assertEqual([r['title'] for r in response.data['requests']], ['Écran'])
+        self.assertFalse(response.data['has_more'])
+
+    def test_incremental_sync(self):
+        cursor = self.sync().data['cursor']
+        self.assertEqual(self.sync(cursor).status_code, 204)
+
+        self.request.transition_to('en_cours')
+        response = self.sync(cursor)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['requests'][0]['status'], 'en_cours')
+        self.assertEqual(len(response.data['notifications']), 1)
+        cursor = response.data['cursor']
+
+        notification = Notification.objects.get()
+        request_id, notification_id = self.request.id, notification.id
+        notification.delete()
+        self.request.delete()
+        response = self.sync(cursor)
+        self.assertEqual(response.data['deleted'], {
+            'requests': [request_id], 'feedbacks': [], 'notifications': [notification_id],
+        })
+        self.assertEqual(self.sync(response.data['cursor']).status_code, 204)
+
+    def test_steady_state_is_one_query(self):
+        cursor = self.sync().data['cursor']
+        with self.assertNumQueries(1):
+            response = self.sync(cursor)
+        self.assertEqual(response.status_code, 204)
+
+    def test_cascaded_children_do_not_leave_tombstones(self):
+        Feedback.objects.create(user=self.user, request=self.request, rating=5)
+        Notification.objects.create(user=self.user, request=self.request, message='x')
+        self.request.delete()
+        self.assertEqual(list(Tombstone.objects.values_list('model', flat=True)), ['request'])
+
+    def test_expired_and_invalid_cursors(self):
+        self.assertEqual(self.sync('abc').status_code, 400)
+        self.assertEqual(self.sync('1').status_code, 410)
+        self.assertEqual(self.sync('1_inconnu_3').status_code, 400)
+
+    def test_rows_sharing_a_timestamp_are_not_lost_between_pages(self):
+        Request.objects.bulk_create([Request(user=self.user, title=f'd{i}') for i in range(4)])
+        Request.objects.filter(user=self.user).update(updated_at=timezone.now())
+        seen, cursor = [], None
+        while True:
+            data = self.client.get('/api/changes/', {'limit': 2, **({'since': cursor} if cursor else {})}).data
+            seen += [r['id'] for r in data['requests']]
+            cursor = data['cursor']
+            if not data['has_more']:
+                break
+        self.assertEqual(sorted(seen), list(Request.objects.filter(user=self.user).values_list('id', flat=True)))
+        self.assertEqual(self.sync(cursor).status_code, 204)
+
+    @override_settings(CHANGES_OVERLAP_SECONDS=5)
+    def test_last_page_rereads_overlap_window(self):
+        Request.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+        recent = Request.objects.create(user=self.user, title='Récente')
+        cursor = self.sync().data['cursor']
+        # Ligne validée après la distribution du curseur, avec un horodatage antérieur.
+        straggler = Request.objects.create(user=self.user, title='Transaction lente')
+        Request.objects.filter(pk=straggler.pk).update(updated_at=recent.updated_at - timedelta(milliseconds=1))
+        ids = [r['id'] for r in self.sync(cursor).data['requests']]
+        self.assertIn(straggler.id, ids)
+
+
+class RequestDetailCacheTests(TestCase):
+    def setUp(self):
+        request_details.clear()
+        cache.clear()
+        self.user = make_user(first_name='Alice')
+        self.request = Request.objects.create(user=self.user, title='Écran')
+        self.client = APIClient()
+        self.url = f'/api/requests/{self.request.id}/'
+
+    def get(self):
+        return self.client.get(self.url).data
+
+    def test_hot_detail_is_served_without_queries(self):
+        first = self.get()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(), first)
+
+    def test_writes_invalidate(self):
+        self.get()
+        self.request.transition_to('en_cours')
+        self.assertEqual(self.get()['status'], 'en_cours')
+
+        Feedback.objects.create(user=self.user, request=self.request, rating=4)
+        self.assertEqual(self.get()['feedback']['rating'], 4)
+
+        self.user.first_name = 'Alicia'
+        self.user.save()
+        self.assertEqual(self.get()['first_name'], 'Alicia')
+
+        self.user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.get()
+
+    def test_response_computed_during_invalidation_is_discarded(self):
+        version = request_details.version(self.request.id)
+        request_details.invalidate(self.request.id)
+        request_details.set(self.request.id, version, {'title': 'périmé'})
+        self.assertIsNone(request_details.get(self.request.id, request_details.version(self.request.id)))
+
+    def test_local_entries_expire_without_shared_tier(self):
+        now = [0]
+        worker = DetailCache(local_ttl=5, clock=lambda: now[0])
+        version = worker.version(self.request.id)
+        worker.set(self.request.id, version, {'title': 'Écran'})
+
+        # Invalidation faite par un autre processus : ce worker ne la voit pas...
+        DetailCache().invalidate(self.request.id)
+        now[0] = 5
+        self.assertEqual(worker.get(self.request.id, version)['title'], 'Écran')
+        # ... mais ne sert plus son entrée au-delà de la durée de vie locale.
+        now[0] = 6
+        self.assertIsNone(worker.get(self.request.id, worker.version(self.request.id)))
+
+    @override_settings(REQUEST_DETAIL_CACHE_ALIAS='default')
+    def test_shared_tier_propagates_invalidation(self):
+        other_process = DetailCache()
+        self.get()
+        version = other_process.version(self.request.id)
+        self.assertEqual(other_process.get(self.request.id, version)['title'], 'Écran')
+
+        Request.objects.filter(pk=self.request.pk).update(title='Moniteur')
+        self.request.refresh_from_db()
+        self.request.save()
+        self.assertIsNone(other_process.get(self.request.id, other_process.version(self.request.id)))
+        self.assertEqual(self.get()['title'], 'Moniteur')
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        request_details.clear()
+        self.admin = make_user('admin@example.com', role='admin')
+        self.user = make_user()
+        self.old = Request.objects.create(user=self.user, title='Ancienne')
+        self.old.transition_to('resolue')
+        Feedback.objects.create(user=self.user, request=self.old, rating=4)
+        self.recent = Request.objects.create(user=self.user, title='Récente')
+        self.recent.transition_to('rejetee')
+        self.open = Request.objects.create(user=self.user, title='Ouverte')
+        # Résolue il y a un an, en deux jours.
+        year_ago = timezone.now() - timedelta(days=365)
+        Request.objects.filter(pk=self.old.pk).update(
+            created_at=year_ago - timedelta(days=2), resolved_at=year_ago, updated_at=year_ago,
+        )
+        Request.objects.filter(pk=self.open.pk).update(updated_at=year_ago)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def archive(self, *args):
+        call_command('archive_requests', *args, stdout=StringIO())
+
+    def test_moves_only_old_closed_requests(self):
+        stats_before = self.client.get('/api/stats/').data
+        self.archive('--batch-size', '1')
+
+        self.assertEqual(list(Request.objects.order_by('pk').values_list('title', flat=True)), ['Récente', 'Ouverte'])
+        archived = ArchivedRequest.objects.get()
+        self.assertEqual((archived.pk, archived.feedback['rating']), (self.old.pk, 4))
+        self.assertEqual([event[1] for event in archived.status_history], ['en_attente', 'resolue'])
+        self.assertEqual(ArchivedNotification.objects.get().request_id, self.old.pk)
+        self.assertFalse(Notification.objects.filter(request_id=self.old.pk).exists())
+        self.assertTrue(Tombstone.objects.filter(model='request', object_id=self.old.pk).exists())
+
+        stats_after = self.client.get('/api/stats/').data
+        for key in ('total', 'statusCounts', 'avgRating', 'avgResolutionTime'):
+            self.assertEqual(stats_after[key], stats_before[key])
+        self.assertEqual(stats_after['avgResolutionTime'], 2.0)
+
+    def test_dry_run_moves_nothing(self):
+        self.archive('--dry-run')
+        self.assertEqual(Request.objects.count(), 3)
+
+    def test_unified_reads(self):
+        self.client.get(f'/api/requests/{self.old.pk}/')
+        self.archive()
+
+        detail = self.client.get(f'/api/requests/{self.old.pk}/').data
+        self.assertEqual((detail['title'], detail['archived'], detail['feedback']['rating']), ('Ancienne', True, 4))
+
+        self.client.force_authenticate(self.user)
+        history = self.client.get('/api/requests/history/', {'limit': 2}).data
+        self.assertEqual([r['title'] for r in history['results']], ['Ouverte', 'Récente'])
+        history = self.client.get('/api/requests/history/', {'before': history['next']}).data
+        self.assertEqual([(r['title'], r['archived']) for r in history['results']], [('Ancienne', True)])
+        self.assertEqual(self.client.get('/api/requests/history/', {'before': 'hier'}).status_code, 400)
+
+        notifications = self.client.get('/notifications/history/').data['results']
+        self.assertEqual([n['archived'] for n in notifications], [False, True])
+
+    def test_history_pages_do_not_skip_shared_timestamps(self):
+        self.archive()
+        moment = timezone.now() - timedelta(days=400)
+        Request.objects.bulk_create([Request(user=self.user, title=f'Lot {i}') for i in range(3)])
+        Request.objects.filter(title__startswith='Lot').update(created_at=moment)
+        ArchivedRequest.objects.update(created_at=moment)
+
+        self.client.force_authenticate(self.user)
+        seen, before = [], None
+        while True:
+            page = self.client.get('/api/requests/history/', {'limit': 2, **({'before': before} if before else {})}).data
+            seen += [r['id'] for r in page['results']]
+            before = page['next']
+            if before is None:
+                break
+        expected = list(Request.objects.filter(user=self.user).values_list('id', flat=True))
+        expected += list(ArchivedRequest.objects.filter(user=self.user).values_list('id', flat=True))
+        self.assertEqual(sorted(seen), sorted(expected))
+
+
+@override_settings(
+    NOTIFICATION_RETENTION_PER_USER=3, NOTIFICATION_READ_RETENTION_DAYS=10,
+    AI_HISTORY_COMPACT_AFTER_DAYS=10, TOMBSTONE_RETENTION_DAYS=10,
+)
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.request = Request.objects.create(user=self.user, title='Écran')
+        old = timezone.now() - timedelta(days=20)
+        notifications = Notification.objects.bulk_create(
+            Notification(user=self.user, request=self.request, message=f'n{i}', is_read=i < 2) for i in range(5)
+        )
+        Notification.objects.filter(pk__in=[n.pk for n in notifications[:2]]).update(created_at=old)
+        for i, sender in enumerate(['user', 'ai', 'user', 'ai']):
+            turn = AIConversation.objects.create(user=self.user, sender=sender, message=f'm{i}')
+            if i < 3:
+                AIConversation.objects.filter(pk=turn.pk).update(created_at=old + timedelta(minutes=i))
+        Tombstone.objects.create(model='request', object_id=999, deleted_at=old)
+
+    def retention(self, *args):
+        out = StringIO()
+        call_command('apply_retention', *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_reports_without_deleting(self):
+        report = self.retention('--dry-run')
+        self.assertIn('notifications_per_user : 2 lignes', report)
+        self.assertIn('read_notifications : 2 lignes', report)
+        self.assertIn('ai_history : 2 lignes', report)
+        self.assertEqual(Notification.objects.count(), 5)
+
+    def test_policies(self):
+        self.retention('--batch-size', '1')
+        self.assertEqual(sorted(Notification.objects.values_list('message', flat=True)), ['n2', 'n3', 'n4'])
+        self.assertEqual(Tombstone.objects.filter(model='notification').count(), 2)
+        self.assertFalse(Tombstone.objects.filter(object_id=999).exists())
+
+        history = list(AIConversation.objects.order_by('created_at').values_list('message', flat=True))
+        self.assertEqual(history, ['[Historique compacté]\nVous : m0\nAssistant : m1\nVous : m2', 'm3'])
+        self.assertIn('0 lignes', self.retention('--policy', 'ai_history'))
+
+    def test_over_limit_users_are_found_once_per_run(self):
+        other = make_user('autre@example.com')
+        Notification.objects.bulk_create(
+            Notification(user=other, request=self.request, message=f'o{i}') for i in range(6)
+        )
+        policy = KeepRecentNotifications()
+        with CaptureQueriesContext(connection) as queries:
+            while policy.run_batch(1):
+                pass
+        self.assertEqual(sum('GROUP BY' in query['sql'] for query in queries.captured_queries), 1)
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(Notification.objects.filter(user=other).count(), 3)
+
+    def test_max_batches_bounds_a_run(self):
+        self.retention('--policy', 'read_notifications', '--batch-size', '1', '--max-batches', '1')
+        self.assertEqual(Notification.objects.count(), 4)
+
+
+class DeferredDeletionTests(TestCase):
+    def setUp(self):
+        request_details.clear()
+        self.admin = make_user('admin@example.com', role='admin')
+        self.user = make_user()
+        self.other = make_user('autre@example.com')
+        self.request = Request.objects.create(user=self.user, title='Écran')
+        self.request.transition_to('resolue', actor=self.user)
+        Feedback.objects.create(user=self.user, request=self.request, rating=5)
+        AIConversation.objects.create(user=self.user, sender='user', message='Bonjour')
+        self.foreign = Request.objects.create(user=self.other, title='Clavier')
+        self.foreign.transition_to('en_cours', actor=self.user)
+        Feedback.objects.create(user=self.user, request=self.foreign, rating=2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_request_delete_is_marked_then_purged(self):
+        # Savepoints compris : décompte par catégorie, compteur puis marquage.
+        with self.assertNumQueries(5):
+            response = self.client.delete(f'/api/requests/delete/{self.request.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Category.objects.get(pk=self.request.category_id).resolved_requests, 0)
+        self.assertEqual(self.client.get(f'/api/requests/{self.request.id}/').status_code, 404)
+        self.assertTrue(Notification.objects.filter(request_id=self.request.id).exists())
+
+        self.assertEqual(deletion.purge_pending(size=1), {'requests': 1, 'users': 0})
+        self.assertFalse(Request.all_objects.filter(pk=self.request.id).exists())
+        self.assertFalse(Notification.objects.filter(request_id=self.request.id).exists())
+        self.assertFalse(Feedback.objects.filter(request_id=self.request.id).exists())
+        self.assertEqual(list(Tombstone.objects.values_list('model', 'object_id')), [('request', self.request.id)])
+        self.assertEqual(self.client.delete(f'/api/requests/delete/{self.request.id}/').status_code, 404)
+
+    def test_user_delete_deactivates_then_purges(self):
+        self.assertEqual(self.client.delete(f'/api/users/{self.user.id}/').status_code, 204)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertNotIn(self.user.id, [u['id'] for u in self.client.get('/api/users/').data['results']])
+        self.assertFalse(Request.objects.filter(user=self.user).exists())
+        self.assertEqual(self.client.delete(f'/api/users/{self.user.id}/').status_code, 404)
+
+        self.assertEqual(deletion.purge_pending(size=1), {'requests': 1, 'users': 1})
+        self.assertFalse(User.objects.filter(pk=self.user.id).exists())
+        self.assertFalse(AIConversation.objects.exists())
+        self.assertFalse(Feedback.objects.exists())
+        # La demande d'un autre client reste, son historique perd seulement l'acteur.
+        self.assertEqual(list(self.foreign.status_events.values_list('actor_id', flat=True)), [None, None])
+        self.assertEqual(
+            sorted(Tombstone.objects.values_list('model', flat=True)), ['feedback', 'request'],
+        )
+
+
+class UserDirectoryTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin@example.com', role='admin', first_name='Zoé')
+        self.alice = make_user('alice@example.com', first_name='Alice')
+        self.bob = make_user('bob@example.com', first_name='Albert')
+        for title in ('a', 'b'):
+            Request.objects.create(user=self.alice, title=title)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def directory(self, **params):
+        with self.assertNumQueries(2):
+            return self.client.get('/api/users/', params).data
+
+    def test_pagination_and_request_counts(self):
+        data = self.directory(page_size=2, page=2)
+        self.assertEqual((data['count'], data['page']), (3, 2))
+        self.assertEqual([(u['email'], u['request_count']) for u in data['results']], [('bob@example.com', 0)])
+        first = self.directory(page_size=2)['results']
+        self.assertEqual([u['request_count'] for u in first], [0, 2])
+
+    def test_prefix_search_and_role_filter(self):
+        self.assertEqual([u['email'] for u in self.directory(search='AL')['results']], ['alice@example.com', 'bob@example.com'])
+        self.assertEqual(self.directory(search='ice')['count'], 0)
+        self.assertEqual([u['email'] for u in self.directory(role='admin')['results']], ['admin@example.com'])
+
+
+class FeedbackListingTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin@example.com', role='admin')
+        self.user = make_user()
+        self.feedbacks = []
+        for i, (category, rating) in enumerate([('Réseau', 5), ('Réseau', 3), ('Matériel', 4), ('Réseau', 1)]):
+            request = Request.objects.create(user=self.user, title=f'd{i}', category=Category.objects.resolve(category))
+            self.feedbacks.append(Feedback.objects.create(user=self.user, request=request, rating=rating))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_cursor_pagination_and_filters(self):
+        seen, cursor = [], None
+        while True:
+            data = self.client.get('/api/feedbacks/', {'limit': 3, **({'cursor': cursor} if cursor else {})}).data
+            seen += [f['id'] for f in data['results']]
+            cursor = data['next']
+            if cursor is None:
+                break
+        self.assertEqual(seen, [f.id for f in reversed(self.feedbacks)])
+
+        ratings = self.client.get('/api/feedbacks/', {'min_rating': 3, 'category': 'Réseau'}).data['results']
+        self.assertEqual([f['rating'] for f in ratings], [3, 5])
+        self.assertEqual(self.client.get('/api/feedbacks/', {'since': 'hier'}).status_code, 400)
+
+    def test_summary_is_maintained_without_scanning_feedbacks(self):
+        self.feedbacks[3].delete()
+        request = self.feedbacks[2].request
+        request.category = Category.objects.resolve('Réseau')
+        request.save()
+
+        with self.assertNumQueries(1):
+            summary = self.client.get('/api/feedbacks/summary/').data
+        self.assertEqual((summary['count'], summary['average']), (3, 4.0))
+        self.assertEqual(summary['histogram'], {'1': 0, '2': 0, '3': 1, '4': 1, '5': 1})
+        self.assertEqual([(c['category'], c['count']) for c in summary['by_category']], [('Matériel', 0), ('Réseau', 3)])
+        self.assertEqual(len(summary['by_month']), 1)
+        self.assertEqual(self.client.get('/api/stats/').data['avgRating'], 4.0)
+
+    def test_purged_feedback_leaves_aggregates(self):
+        deletion.mark_request_deleted(self.feedbacks[0].request_id)
+        deletion.purge_pending()
+        self.assertEqual(self.client.get('/api/feedbacks/summary/').data['count'], 3)
+
+
+class CategoryTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def counters(self, name):
+        category = Category.objects.get(key=Category.key_of(name))
+        return category.open_requests, category.resolved_requests
+
+    def test_spellings_resolve_to_one_category(self):
+        network = Category.objects.resolve('Réseau')
+        self.assertEqual(Category.objects.resolve('  reseau ').pk, network.pk)
+        self.assertEqual(Category.objects.resolve('RÉSEAU').name, 'Réseau')
+
+    def test_counters_follow_requests(self):
+        network = Category.objects.resolve('Réseau')
+        first = Request.objects.create(user=self.user, title='Wifi', category=network)
+        second = Request.objects.create(user=self.user, title='VPN', category=network)
+        self.assertEqual(self.counters('Réseau'), (2, 0))
+
+        first.transition_to('resolue', actor=self.user)
+        self.assertEqual(self.counters('Réseau'), (1, 1))
+        second.category = Category.objects.resolve('Matériel')
+        second.save()
+        self.assertEqual((self.counters('Réseau'), self.counters('Matériel')), ((0, 1), (1, 0)))
+        deletion.mark_request_deleted(second.pk)
+        self.assertEqual(self.counters('Matériel'), (0, 0))
+
+    def test_stale_instance_counts_from_stored_row(self):
+        network = Category.objects.resolve('Réseau')
+        request = Request.objects.create(user=self.user, title='Wifi', category=network)
+        stale = Request.objects.get(pk=request.pk)
+        request.transition_to('resolue')
+        stale.status = 'rejetee'
+        stale.save()
+        self.assertEqual(self.counters('Réseau'), (0, 0))
+
+    def test_api_keeps_category_names(self):
+        Category.objects.resolve('réseau')
+        response = self.client.post(
+            '/api/requests/', {'title': 'Wifi', 'description': 'Coupé.', 'category': ' réseau', 'first_name': 'Ana'},
+            format='json',
+        )
+        self.assertEqual(response.data['category'], 'réseau')
+        Request.objects.create(user=self.user, title='VPN', category=Category.objects.resolve('Réseau'))
+        self.assertEqual(self.client.get(f"/api/requests/{response.data['id']}/").data['category'], 'réseau')
+
+        with self.assertNumQueries(1):
+            listing = self.client.get('/api/categories/').json()
+        self.assertEqual(
+            [(c['name'], c['open_requests'], c['resolved_requests']) for c in listing],
+            [('Autre', 0, 0), ('réseau', 2, 0)],
+        )
+
+    def test_only_admins_create_categories(self):
+        body = {'title': 'Wifi', 'description': 'Coupé.', 'category': 'Resaeu', 'first_name': 'Ana'}
+        self.assertEqual(self.client.post('/api/requests/', body, format='json').data['category'], 'Autre')
+        self.assertFalse(Category.objects.filter(key='resaeu').exists())
+
+        admin = make_user('admin@example.com', role='admin')
+        serializer = RequestSerializer(
+            data={**body, 'category': 'Téléphonie'}, context={'request': SimpleNamespace(user=admin)},
+        )
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data['category'].name, 'Téléphonie')
+
+
+class PriorityQueueTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin@example.com', role='admin')
+        self.other_admin = make_user('admin2@example.com', role='admin')
+        self.user = make_user()
+        self.unhappy = make_user('mecontent@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.old = Request.objects.create(user=self.user, title='Ancienne')
+            self.recent = Request.objects.create(user=self.user, title='Récente')
+            self.closed = Request.objects.create(user=self.user, title='Close')
+            self.closed.transition_to('resolue', actor=self.admin)
+        Request.objects.filter(pk=self.old.pk).update(created_at=timezone.now() - timedelta(days=10))
+        priority.refresh(Request.objects.all())
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def score(self, request):
+        return Request.all_objects.values_list('priority_score', flat=True).get(pk=request.pk)
+
+    def test_score_follows_age_category_and_client_history(self):
+        self.assertIsNone(self.score(self.closed))
+        self.assertGreater(self.score(self.old), self.score(self.recent))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            urgent = Category.objects.resolve('Sécurité')
+            urgent.priority_weight = 10
+            urgent.save()
+            self.recent.category = urgent
+            self.recent.save()
+        self.assertGreater(self.score(self.recent), 2 * 10 - 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            complaint = Request.objects.create(user=self.unhappy, title='Toujours en panne')
+        before = self.score(complaint)
+        with self.captureOnCommitCallbacks(execute=True):
+            Feedback.objects.create(user=self.unhappy, request=self.closed, rating=1)
+        self.assertAlmostEqual(self.score(complaint) - before, 3.0, places=2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.old.transition_to('resolue', actor=self.admin)
+        self.assertIsNone(self.score(self.old))
+
+    def test_migration_backfills_existing_open_requests(self):
+        backfill = import_module('demandes.migrations.0014_priority_backfill').backfill_scores
+        Request.objects.update(priority_score=None)
+        backfill(django_apps, SimpleNamespace(connection=connection))
+        self.assertGreater(self.score(self.old), self.score(self.recent))
+        self.assertIsNone(self.score(self.closed))
+
+    def test_list_body_falls_back_to_default_limit(self):
+        self.assertEqual(self.client.post('/api/queue/', [1, 2], format='json').status_code, 200)
+
+    def test_claims_split_the_queue_between_admins(self):
+        queue = self.client.get('/api/queue/').json()
+        self.assertEqual([item['id'] for item in queue], [self.old.pk, self.recent.pk])
+
+        with self.assertNumQueries(5):  # Savepoints compris.
+            first = self.client.post('/api/queue/', {'limit': 1}, format='json').json()
+        self.assertEqual([(item['id'], item['claimed_by']) for item in first], [(self.old.pk, self.admin.pk)])
+
+        other = APIClient()
+        other.force_authenticate(self.other_admin)
+        self.assertEqual([item['id'] for item in other.get('/api/queue/').json()], [self.recent.pk])
+        self.assertEqual([item['id'] for item in other.post('/api/queue/', {'limit': 5}, format='json').json()], [self.recent.pk])
+        self.assertEqual(other.post('/api/queue/', format='json').json(), [])
+
+        self.assertEqual(other.delete(f'/api/queue/{self.old.pk}/').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/queue/{self.old.pk}/').status_code, 204)
+        self.assertEqual([item['id'] for item in other.post('/api/queue/', format='json').json()], [self.old.pk])
+
+        # Une prise en charge abandonnée redevient disponible.
+        Request.objects.filter(pk=self.recent.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual([item['id'] for item in self.client.post('/api/queue/', format='json').json()], [self.recent.pk])
+        self.assertEqual(APIClient().get('/api/queue/').status_code, 401)
+
+    def test_refresh_command_ages_scores(self):
+        Request.objects.filter(pk=self.recent.pk).update(created_at=timezone.now() - timedelta(days=30))
+        out = StringIO()
+        call_command('refresh_priorities', stdout=out)
+        self.assertIn('2 scores', out.getvalue())
+        self.assertGreater(self.score(self.recent), self.score(self.old))
+
+
+class StructuredLoggingTests(TestCase):
+    def record(self, name='demandes.views', level=logging.INFO, msg='Liste %s', args=('ok',), **extra):
+        record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_lines_are_written_by_the_listener_thread(self):
+        stream = StringIO()
+        handler = QueueingHandler(stream=stream)
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            failure = self.record(level=logging.ERROR, user_id=7)
+            failure.exc_info = sys.exc_info()
+        handler.handle(self.record(user_id=3))
+        handler.handle(failure)
+        handler.stop()
+        first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(
+            (first['level'], first['logger'], first['message'], first['user_id']),
+            ('INFO', 'demandes.views', 'Liste ok', 3),
+        )
+        self.assertIn('ValueError: boom', second['exception'])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = QueueingHandler(stream=StringIO(), maxsize=1)
+        handler.start = lambda: None  # Aucun thread ne vide la file.
+        handler.handle(self.record())
+        handler.handle(self.record())
+        self.assertEqual(handler.dropped, 1)
+
+    def test_sampling_by_logger_keeps_warnings(self):
+        sampling = SamplingFilter({'demandes': 0.0, 'demandes.priority': 1.0})
+        self.assertFalse(sampling.filter(self.record('demandes.views')))
+        self.assertTrue(sampling.filter(self.record('demandes.views', level=logging.WARNING)))
+        self.assertTrue(sampling.filter(self.record('demandes.priority.refresh')))
+        self.assertTrue(sampling.filter(self.record('django.request')))
+
+    def test_views_no_longer_print(self):
+        client = APIClient()
+        client.force_authenticate(make_user())
+        output = StringIO()
+        with redirect_stdout(output):
+            client.get('/api/requests/')
+            client.post('/api/ai-assistant/', {}, format='json')
+            client.get('/api/ai-assistant/history/')
+        self.assertEqual(output.getvalue(), '')
+
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.other = make_user('autre@example.com')
+        for i in range(3):
+            req = Request.objects.create(user=self.user, title=f'Demande {i}', status='resolue')
+            Feedback.objects.create(user=self.user, request=req, rating=4)
+            Notification.objects.create(user=self.user, request=req, message='Mise à jour')
+        AIConversation.objects.create(user=self.user, message='Wifi ?', sender='user')
+        Request.objects.create(user=self.other, title='Autre')
+        self.request = Request.objects.filter(user=self.user).first()
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        request_details.clear()
+        self.addCleanup(request_details.clear)
+
+    def aget(self, url, token=None):
+        headers = {'authorization': f'Bearer {token}'} if token else {}
+        with override_settings(ROOT_URLCONF='demandes.async_views'):
+            return async_to_sync(AsyncClient().get)(url, headers=headers)
+
+    def test_responses_match_sync_views(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for url in ['/api/requests/', f'/api/requests/{self.request.id}/', '/notifications/', '/api/stats/',
+                    '/api/ai-assistant/history/']:
+            expected = client.get(url)
+            response = self.aget(url, self.token)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response.json(), json.loads(expected.content), url)
+
+    def test_authentication_mirrors_drf(self):
+        self.assertEqual(self.aget('/api/requests/').json(), [])
+        self.assertEqual(self.aget(f'/api/requests/{self.request.id}/').status_code, 200)
+        self.assertEqual(self.aget('/api/requests/999999/').status_code, 404)
+        self.assertEqual(self.aget('/api/stats/').status_code, 401)
+        self.assertEqual(self.aget('/api/requests/', self.token + 'x').status_code, 401)
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.assertEqual(self.aget('/notifications/', self.token).status_code, 401)
+
+    def test_reads_cost_authentication_plus_budget(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.aget('/api/requests/', self.token).json()), 3)
+        self.aget(f'/api/requests/{self.request.id}/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.aget(f'/api/requests/{self.request.id}/').json()['id'], self.request.id)
+
+    def test_other_methods_use_sync_views(self):
+        client, headers = AsyncClient(), {'authorization': f'Bearer {self.token}'}
+        with override_settings(ROOT_URLCONF='demandes.async_views'):
+            response = async_to_sync(client.post)(
+                '/api/requests/', {'title': 'Réseau', 'first_name': 'Ana'},
+                content_type='application/json', headers=headers,
+            )
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(async_to_sync(client.delete)('/api/stats/', headers=headers).status_code, 405)
+        self.assertTrue(Request.objects.filter(user=self.user, title='Réseau').exists())
+
+    def test_batch_runs_async_views_with_parent_user(self):
+        parent = SimpleNamespace(META={}, user=self.user, auth=None)
+        with override_settings(ROOT_URLCONF='demandes.async_views'), self.assertNumQueries(1):
+            result = batch.execute(parent, {'id': 0, 'method': 'GET', 'path': '/api/requests/', 'body': None})
+        self.assertEqual((result['status'], len(result['body'])), (200, 3))
+
+    def test_project_middlewares_run_natively_async(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        for middleware in (ProfilingMiddleware, CompressionMiddleware, ReplicaRoutingMiddleware):
+            self.assertTrue(iscoroutinefunction(middleware(get_response)), middleware)
+            self.assertFalse(iscoroutinefunction(middleware(lambda request: HttpResponse())), middleware)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin@example.com', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(PROFILING_ENABLED=True, PROFILING_DIR=directory.name, PROFILING_MAX_FILES=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        self.token = self.client.post('/api/profiles/token/').data['token']
+
+    def test_signed_request_is_profiled_with_sql_timings(self):
+        Request.objects.create(user=self.admin, title='Lente')
+        response = self.client.get('/api/requests/all/', HTTP_X_PROFILE=self.token)
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+        self.assertEqual([p['id'] for p in self.client.get('/api/profiles/').json()], [profile_id])
+
+        detail = json.loads(b''.join(self.client.get(f'/api/profiles/{profile_id}/', {'format': 'json'}).streaming_content))
+        self.assertEqual((detail['path'], detail['status'], detail['user_id']), ('/api/requests/all/', 200, self.admin.id))
+        self.assertTrue(any('demandes_request' in query['sql'] for query in detail['sql']))
+        self.assertTrue(detail['functions'])
+
+        download = self.client.get(f'/api/profiles/{profile_id}/')
+        with tempfile.NamedTemporaryFile(suffix='.prof') as output:
+            output.write(b''.join(download.streaming_content))
+            output.flush()
+            self.assertTrue(pstats.Stats(output.name).total_calls)
+
+    def test_unsigned_or_forged_requests_are_not_profiled(self):
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/requests/all/'))
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/requests/all/', HTTP_X_PROFILE=self.token + 'x'))
+        # Jamais dans l'URL (journaux d'accès, Referer).
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/requests/all/', {'_profile': self.token}))
+        self.assertEqual(self.client.get('/api/profiles/../settings/').status_code, 404)
+
+        client = APIClient()
+        client.force_authenticate(make_user())
+        self.assertEqual(client.post('/api/profiles/token/').status_code, 403)
+        self.assertEqual(client.get('/api/profiles/').status_code, 403)
+
+    def test_token_of_demoted_admin_is_refused(self):
+        User.objects.filter(pk=self.admin.pk).update(role='client')
+        # Réponse en cache pendant PROFILING_ADMIN_CHECK_SECONDS.
+        cache.clear()
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/stats/', HTTP_X_PROFILE=self.token))
+
+    def test_disabled_setting_turns_profiling_off(self):
+        with override_settings(PROFILING_ENABLED=False):
+            self.assertNotIn('X-Profile-Id', self.client.get('/api/stats/', HTTP_X_PROFILE=self.token))
+            self.assertEqual(self.client.post('/api/profiles/token/').status_code, 404)
+
+    def test_storage_and_concurrency_are_bounded(self):
+        ids = [self.client.get('/api/stats/', HTTP_X_PROFILE=self.token)['X-Profile-Id'] for _ in range(3)]
+        self.assertEqual(len(os.listdir(profiling.profile_dir())), 4)
+        self.assertEqual(self.client.get(f'/api/profiles/{ids[0]}/').status_code, 404)
+
+        slots = profiling.profiler._slots
+        slots.acquire()
+        self.addCleanup(slots.release)
+        self.assertEqual(self.client.get('/api/stats/', HTTP_X_PROFILE=self.token)['X-Profile-Id'], 'busy')
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin@example.com', role='admin', first_name='Ada')
+        self.client = APIClient()
+        token = RefreshToken.for_user(self.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def batch(self, *operations, **options):
+        return self.client.post('/api/batch/', {'requests': list(operations), **options}, format='json')
+
+    def test_authentication_is_shared(self):
+        # Une seule lecture de l'utilisateur pour le lot, aucune par sous-requête.
+        with self.assertNumQueries(1):
+            response = self.batch({'id': 'a', 'path': '/api/users/me/'}, {'id': 'b', 'path': '/api/users/me/'})
+        self.assertEqual(
+            [(r['id'], r['status'], r['body']['first_name']) for r in response.data['responses']],
+            [('a', 200, 'Ada'), ('b', 200, 'Ada')],
+        )
+
+    def test_writes_then_reads_in_order(self):
+        responses = self.batch(
+            {'method': 'POST', 'path': '/api/requests/create/', 'body': {'title': 'Écran', 'first_name': 'Ada'}},
+            {'path': '/api/requests/?ignored=1'},
+            {'path': '/api/nulle-part/'},
+            {'path': '/api/batch/'},
+        ).data['responses']
+        self.assertEqual([r['status'] for r in responses], [201, 200, 404, 400])
+        self.assertEqual([r['title'] for r in responses[1]['body']], ['Écran'])
+
+    def test_parallel_reads(self):
+        responses = self.batch(
+            {'path': '/api/metrics/compression/'}, {'path': '/api/metrics/compression/'}, parallel=True,
+        ).data['responses']
+        self.assertEqual([(r['id'], r['status']) for r in responses], [(0, 200), (1, 200)])
+
+    def test_validation(self):
+        self.assertEqual(self.batch().status_code, 400)
+        self.assertEqual(self.batch({'method': 'TRACE', 'path': '/api/users/me/'}).status_code, 400)
+        with override_settings(BATCH_MAX_REQUESTS=1):
+            self.assertEqual(self.batch({'path': '/'}, {'path': '/'}).status_code, 400)
+
+
+@override_settings(MISTRAL_API_KEY=None)
+class FaqIndexTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+        Request.objects.create(
+            user=self.user, status='resolue', title='Impossible de se connecter au portail',
+            description="La page de connexion affiche une erreur après la saisie du mot de passe.",
+            admin_comment='Videz le cache du navigateur puis reconnectez-vous.',
+        )
+        faq_index.clear()
+        self.addCleanup(faq_index.clear)
+
+    def ask(self, message):
+        return self.client.post('/api/ai-assistant/', {'message': message}, format='json')
+
+    def test_answers_locally_above_threshold(self):
+        response = self.ask("Je n'arrive pas à me connecter au portail : erreur après le mot de passe")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['response'], 'Videz le cache du navigateur puis reconnectez-vous.')
+        self.assertEqual(
+            list(AIConversation.objects.order_by('id').values_list('sender', flat=True)), ['user', 'ai'],
+        )
+
+    def test_source_request_is_only_shown_to_admins(self):
+        question = "Je n'arrive pas à me connecter au portail : erreur après le mot de passe"
+        self.client.force_authenticate(make_user('autre@example.com'))
+        response = self.ask(question)
+        self.assertEqual(response.data['response'], 'Videz le cache du navigateur puis reconnectez-vous.')
+        self.assertEqual(set(response.data['source']), {'answer', 'score'})
+
+        self.client.force_authenticate(make_user('admin@example.com', role='admin'))
+        self.assertEqual(self.ask(question).data['source']['title'], 'Impossible de se connecter au portail')
+
+    def test_unrelated_question_goes_to_mistral(self):
+        # Sans clé Mistral, la question non reconnue aboutit à l'erreur de configuration.
+        self.assertEqual(self.ask('Quand la cantine ouvre-t-elle ?').status_code, 500)
+
+    def test_updated_on_resolution(self):
+        faq_index.build()
+        request = Request.objects.create(
+            user=self.user, title='Imprimante du deuxième étage bloquée', description='Bourrage papier permanent',
+            admin_comment="Ouvrez le bac arrière et retirez la feuille coincée.",
+        )
+        self.assertEqual(len(faq_index), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            request.transition_to('resolue')
+        self.assertEqual(len(faq_index), 2)
+        self.assertEqual(faq_index.answer("l'imprimante est bloquée, bourrage papier")['request_id'], request.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            request.transition_to('en_cours')
+        self.assertEqual(len(faq_index), 1)
+        self.assertIsNone(faq_index.answer("l'imprimante est bloquée, bourrage papier"))
+
+
+class DuplicateDetectionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = make_user()
+        self.other = make_user('autre@example.com')
+        self.admin = make_user('admin@example.com', role='admin')
+        self.printer = Request.objects.create(
+            user=self.user, title="Imprimante du deuxième étage en panne",
+            description="L'imprimante affiche un bourrage papier et refuse d'imprimer.",
+        )
+        Request.objects.create(user=self.user, title='Facture de mars erronée', description='Montant incorrect.')
+        duplicate_index.clear()
+        self.addCleanup(duplicate_index.clear)
+
+    def create(self, user, title, description):
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                    '/api/requests/create/', {'title': title, 'description': description, 'first_name': 'Ada'}, format='json',
+            )
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def test_creation_returns_own_duplicates(self):
+        data = self.create(
+            self.user, "Imprimante du deuxième étage en panne",
+            "L'imprimante affiche un bourrage papier et n'imprime plus.",
+        )
+        self.assertEqual([d['id'] for d in data['possible_duplicates']], [self.printer.pk])
+        self.assertGreaterEqual(data['possible_duplicates'][0]['similarity'], 0.5)
+        # Les demandes des autres clients ne sont pas révélées.
+        data = self.create(self.other, "Imprimante du deuxième étage en panne", "Bourrage papier.")
+        self.assertEqual(data['possible_duplicates'], [])
+
+    def test_index_follows_status(self):
+        duplicate_index.build()
+        self.assertEqual(len(duplicate_index), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.printer.transition_to('resolue')
+        self.assertEqual(len(duplicate_index), 1)
+        self.assertEqual(duplicate_index.similar(self.printer.title, self.printer.description), [])
+
+    def test_admin_clusters(self):
+        for user in (self.user, self.other):
+            self.create(user, "Imprimante du deuxième étage en panne", "L'imprimante affiche un bourrage papier et refuse d'imprimer.")
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/requests/duplicates/').status_code, 403)
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/requests/duplicates/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(len(response.data['clusters'][0]), 3)
+
+
+class ClassifierTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+        examples = {
+            'Technique': [
+                ('Serveur inaccessible', 'Le serveur ne répond plus depuis ce matin.'),
+                ('Erreur de connexion', 'Impossible de se connecter au serveur VPN.'),
+                ('Logiciel bloqué', "Le logiciel plante au démarrage avec une erreur."),
+            ],
+            'Facturation': [
+                ('Facture erronée', 'Le montant de la facture de mars est faux.'),
+                ('Double prélèvement', 'Le paiement de la facture a été prélevé deux fois.'),
+                ('Avoir manquant', "L'avoir promis n'apparaît pas sur la facture."),
+            ],
+        }
+        for category, rows in examples.items():
+            for title, description in rows:
+                Request.objects.create(
+                    user=self.user, title=title, description=description, category=Category.objects.resolve(category),
+                )
+        model_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(model_dir.cleanup)
+        settings_override = override_settings(CLASSIFIER_MODEL_PATH=os.path.join(model_dir.name, 'model.npz'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(classifier.model_store.clear)
+        call_command('train_classifier', stdout=StringIO())
+
+    def test_category_assigned_at_creation(self):
+        response = self.client.post('/api/requests/create/', {
+            'title': 'Facture incorrecte', 'description': 'Le montant prélevé est faux.', 'first_name': 'Ada',
+        }, format='json')
+        self.assertEqual(response.data['category'], 'Facturation')
+        # Une catégorie choisie par le client est conservée.
+        response = self.client.post('/api/requests/create/', {
+            'title': 'Facture incorrecte', 'description': 'Montant faux.', 'category': 'Commercial', 'first_name': 'Ada',
+        }, format='json')
+        self.assertEqual(response.data['category'], 'Commercial')
+        # Sans mot reconnu, la demande reste dans la catégorie par défaut.
+        response = self.client.post('/api/requests/create/', {
+            'title': 'Bonjour', 'description': 'Merci', 'first_name': 'Ada',
+        }, format='json')
+        self.assertEqual(response.data['category'], 'Autre')
+
+    def test_batch_reclassification(self):
+        pending = Request.objects.create(user=self.user, title='Serveur en panne', description='Erreur de connexion au serveur.')
+        Feedback.objects.create(user=self.user, request=pending, rating=2)
+        untouched = Request.objects.create(user=self.user, title='Question', description='Horaires ?')
+
+        call_command('classify_requests', '--dry-run', stdout=StringIO())
+        self.assertEqual(Request.objects.get(pk=pending.pk).category.name, 'Autre')
+        out = StringIO()
+        call_command('classify_requests', '--batch-size', '1', stdout=out)
+        self.assertIn('1 demandes reclassées sur 2', out.getvalue())
+        self.assertEqual(Request.objects.get(pk=pending.pk).category.name, 'Technique')
+        self.assertEqual(Request.objects.get(pk=untouched.pk).category.name, 'Autre')
+        # L'avis suit sa demande dans les agrégats.
+        by_category = {row['category']: row['count'] for row in feedback_stats.summary()['by_category']}
+        self.assertEqual((by_category.get('Autre'), by_category['Technique']), (0, 1))
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.body = {'title': 'Imprimante', 'description': 'HS', 'first_name': 'Ana'}
+
+    def post(self, url, body, key='cle-1'):
+        return self.client.post(url, body, format='json', headers={'Idempotency-Key': key})
+
+    def test_replay_returns_stored_response_without_writing(self):
+        first = self.post('/api/requests/create/', self.body)
+        self.assertEqual(first.status_code, 201)
+        notifications = Notification.objects.count()
+        with self.assertNumQueries(1):
+            replay = self.post('/api/requests/create/', self.body)
+        self.assertEqual((replay.status_code, replay.data), (201, first.data))
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        # Même portée sur les deux endpoints de création.
+        self.assertEqual(self.post('/api/requests/', self.body).data['id'], first.data['id'])
+        self.assertEqual(Request.objects.count(), 1)
+        self.assertEqual(Notification.objects.count(), notifications)
+
+        self.assertEqual(self.post('/api/requests/create/', {**self.body, 'title': 'Écran'}).status_code, 422)
+        # Sans en-tête ou avec une autre clé : nouvelle demande.
+        self.client.post('/api/requests/create/', self.body, format='json')
+        self.post('/api/requests/create/', self.body, key='cle-2')
+        self.assertEqual(Request.objects.count(), 3)
+
+    def test_keys_are_scoped_per_user(self):
+        self.post('/api/requests/create/', self.body)
+        self.client.force_authenticate(make_user('autre@example.com'))
+        self.assertEqual(self.post('/api/requests/create/', self.body).status_code, 201)
+        self.assertEqual(Request.objects.count(), 2)
+
+    def test_in_flight_conflict_failure_release_and_expiry(self):
+        now = timezone.now()
+        IdempotencyKey.objects.create(
+            owner_id=self.user.pk, endpoint='request-create', key='cle-1',
+            fingerprint=fingerprint({'data': self.body, 'url': {}}),
+            expires_at=now + timedelta(seconds=60),
+        )
+        response = self.post('/api/requests/create/', self.body)
+        self.assertEqual((response.status_code, response['Retry-After']), (409, '1'))
+
+        # Réservation abandonnée : reprise après IDEMPOTENCY_LOCK_TIMEOUT.
+        IdempotencyKey.objects.update(expires_at=now - timedelta(seconds=1))
+        self.assertEqual(self.post('/api/requests/create/', self.body).status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+        self.assertEqual(self.post('/api/requests/create/', {'description': 'sans titre'}, key='cle-2').status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.filter(key='cle-2').exists())
+        self.assertEqual(self.post('/api/requests/create/', self.body, key='x' * 256).status_code, 400)
+
+    def test_feedback_replay(self):
+        request = Request.objects.create(user=self.user, title='d', status='resolue')
+        url = f'/api/requests/{request.id}/feedback/'
+        self.assertEqual(self.post(url, {'rating': 5}).status_code, 201)
+        replay = self.post(url, {'rating': 5})
+        self.assertEqual((replay.status_code, replay['Idempotent-Replayed']), (201, 'true'))
+        # Sans la clé, la vue répond comme avant.
+        self.assertEqual(self.client.post(url, {'rating': 5}, format='json').status_code, 400)
+        # Même clé sur une autre demande : autre requête.
+        other = Request.objects.create(user=self.user, title='e', status='resolue')
+        self.assertEqual(self.post(f'/api/requests/{other.id}/feedback/', {'rating': 5}).status_code, 422)
+
+    def test_batch_operations_use_their_own_keys(self):
+        operation = {'method': 'POST', 'path': '/api/requests/create/', 'body': self.body}
+        response = self.client.post(
+            '/api/batch/', {'requests': [operation, operation]}, format='json', headers={'Idempotency-Key': 'lot'},
+        )
+        self.assertEqual([r['status'] for r in response.data['responses']], [201, 201])
+
+        keyed = {**operation, 'idempotency_key': 'op-1'}
+        response = self.client.post('/api/batch/', {'requests': [keyed, keyed]}, format='json')
+        first, second = response.data['responses']
+        self.assertEqual((first['status'], second['status']), (201, 201))
+        self.assertEqual(first['body']['id'], second['body']['id'])
+        self.assertEqual(Request.objects.count(), 3)
+
+    def test_taken_over_reservation_is_left_alone(self):
+        @api_view(['POST'])
+        @idempotent('test')
+        def slow_view(request):
+            # Réservation expirée puis reprise par une nouvelle tentative pendant le traitement.
+            IdempotencyKey.objects.update(expires_at=timezone.now() + timedelta(seconds=120))
+            return Response({'ok': True}, status=201)
+
+        request = APIRequestFactory().post('/test/', {}, format='json', HTTP_IDEMPOTENCY_KEY='cle-1')
+        force_authenticate(request, self.user)
+        self.assertEqual(slow_view(request).status_code, 201)
+        self.assertIsNone(IdempotencyKey.objects.get().status_code)
+
+    def test_purge_job_removes_expired_keys(self):
+        self.post('/api/requests/create/', self.body)
+        self.post('/api/requests/create/', self.body, key='cle-2')
+        IdempotencyKey.objects.filter(key='cle-1').update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(jobs.purge_idempotency_keys(), "1 clés d'idempotence expirées supprimées")
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['cle-2'])
+
+
+class SchedulerTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.scheduler = Scheduler()
+        self.scheduler.register('compter', Interval(minutes=5))(lambda: self.calls.append(1) or 'ok')
+        self.now = timezone.now()
+
+    def test_cron_and_interval_schedules(self):
+        at = datetime(2026, 10, 19, 10, 7, 30, tzinfo=dt_timezone.utc)
+        self.assertEqual(Cron('*/15 * * * *').next_after(at), at.replace(minute=15, second=0))
+        # 19/10/2026 est un lundi : le prochain lundi 3 h est le 26.
+        self.assertEqual(Cron('0 3 * * 1').next_after(at), datetime(2026, 10, 26, 3, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(Cron('30 2 1 * *').next_after(at), datetime(2026, 11, 1, 2, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(Cron('@daily').next_after(at), datetime(2026, 10, 20, 0, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(Interval(hours=1).next_after(at), at + timedelta(hours=1))
+        for invalid in ('* * *', '61 * * * *', '*/0 * * * *'):
+            with self.assertRaises(ValueError):
+                Cron(invalid)
+
+    def test_due_job_runs_once_and_is_rescheduled(self):
+        self.assertEqual(self.scheduler.run_pending(self.now), [])
+        due = self.now + timedelta(minutes=6)
+        runs = self.scheduler.run_pending(due)
+        self.assertEqual([(run.job, run.status, run.result) for run in runs], [('compter', 'succes', 'ok')])
+        self.assertGreaterEqual(runs[0].duration_ms, 0)
+        self.assertEqual(self.scheduler.run_pending(due), [])
+        job = ScheduledJob.objects.get(name='compter')
+        self.assertEqual((job.locked_by, job.locked_until), ('', None))
+        self.assertGreater(job.next_run_at, self.now + timedelta(minutes=4))
+        self.assertEqual(len(self.calls), 1)
+
+    def test_only_the_lease_holder_runs_a_job(self):
+        self.scheduler.run_pending(self.now)
+        due = self.now + timedelta(minutes=6)
+        ScheduledJob.objects.filter(name='compter').update(locked_by='autre:1', locked_until=due + timedelta(minutes=1))
+        self.assertEqual(self.scheduler.run_pending(due), [])
+        self.assertIsNone(self.scheduler.run_now('compter'))
+        # Bail expiré (worker mort en cours de tâche) : la tâche est reprise.
+        self.assertEqual(len(self.scheduler.run_pending(due + timedelta(minutes=2))), 1)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_failures_are_recorded_and_history_is_bounded(self):
+        def fail():
+            raise RuntimeError('base indisponible')
+
+        self.scheduler.register('echouer', Interval(seconds=1))(fail)
+        with self.assertLogs('demandes.scheduler', level='ERROR'):
+            run = self.scheduler.run_now('echouer')
+        self.assertEqual(run.status, 'echec')
+        self.assertIn('base indisponible', run.result)
+
+        with override_settings(SCHEDULER_HISTORY_SIZE=2):
+            for _ in range(3):
+                self.scheduler.run_now('compter')
+        self.assertEqual(JobRun.objects.filter(job='compter').count(), 2)
+
+    def test_settings_override_or_disable_jobs(self):
+        with override_settings(SCHEDULER_JOBS={'compter': '0 4 * * *'}):
+            self.assertEqual(str(self.scheduler.schedules()['compter'][1]), '0 4 * * *')
+        with override_settings(SCHEDULER_JOBS={'compter': None}):
+            self.assertEqual(self.scheduler.run_pending(self.now + timedelta(days=1)), [])
+        # Une planification raccourcie avance la prochaine exécution déjà enregistrée.
+        self.scheduler.run_pending(self.now)
+        with override_settings(SCHEDULER_JOBS={'compter': 60}):
+            self.assertEqual(self.scheduler.run_pending(self.now + timedelta(minutes=2)), [])
+            self.assertEqual(len(self.scheduler.run_pending(self.now + timedelta(minutes=4))), 1)
+
+    def test_maintenance_jobs(self):
+        user = make_user()
+        expired = RefreshToken.for_user(user)
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=self.now - timedelta(minutes=1))
+        expired.blacklist()
+        RefreshToken.for_user(user)
+
+        for name in ('purge_expired_tokens', 'refresh_priorities', 'purge_deleted', 'apply_retention', 'archive_requests'):
+            self.assertEqual(scheduler.run_now(name).status, 'succes', name)
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertEqual(JobRun.objects.get(job='purge_expired_tokens').result, '1 jetons expirés supprimés')
+
+        admin = make_user('admin@example.com', role='admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+        jobs = {job['name']: job for job in client.get('/api/jobs/').json()}
+        self.assertEqual(jobs['apply_retention']['schedule'], '0 3 * * *')
+        self.assertEqual(jobs['archive_requests']['last_status'], 'succes')
+        self.assertEqual(len(client.get('/api/jobs/refresh_priorities/runs/').json()), 1)
+        client.force_authenticate(user)
+        self.assertEqual(client.get('/api/jobs/').status_code, 403)
@@ -0,0 +1,40 @@
+"""
+Outils de texte partagés par l'index FAQ, la détection des doublons et le
+classement automatique : découpage en mots normalisés (minuscules, sans
+accents ni mots vides) et hachage stable des mots.
+
+Le hachage repose sur crc32 et non sur ``hash()`` : les valeurs doivent
+être identiques d'un processus à l'autre.
+"""
+import re
+import unicodedata
+import zlib
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+STOPWORDS = frozenset("""
+a ai au aux avec ce ces cette dans de des du elle en est et etre il ils je
+la le les leur lui ma mais me mes mon ne nos notre nous on ou par pas pour
+qu que qui sa se ses son sur ta te tes ton tu un une vos votre vous y
+bonjour merci svp
+""".split())
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in text if not unicodedata.combining(char)).lower()
+
+
+def tokenize(text):
+    """Mots significatifs de ``text``, dans l'ordre."""
+    return [word for word in WORD_RE.findall(normalize(text)) if len(word) > 1 and word not in STOPWORDS]
+
+
+def token_hash(token):
+    return zlib.crc32(token.encode())
+
+
+def features(text):
+    """Mots et paires de mots consécutifs de ``text``."""
+    words = tokenize(text)
+    return words + [f'{first} {second}' for first, second in zip(words, words[1:])]
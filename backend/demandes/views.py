@@ -11,10 +11,20 @@ from django.contrib.auth import get_user_model
 from rest_framework.decorators import api_view
 from django.http import JsonResponse
 from rest_framework import viewsets, mixins 
+from .query_budget import query_budget
+from .idempotency import idempotent
+from .fast_serializers import (
+    RequestReadSerializer, FeedbackReadSerializer, NotificationReadSerializer,
+    UserDirectorySerializer, AIConversationReadSerializer,
+)
+from .renderers import FAST_RENDERER_CLASSES
+import logging
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 class LoginView(APIView):
+    @query_budget(max_queries=3)
     def post(self, request):
         email = request.data.get('email')
         password = request.data.get('password')
@@ -42,6 +52,7 @@ class LoginView(APIView):
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @query_budget(max_queries=0)
     def get(self, request):
         user = request.user
         return Response({
@@ -53,6 +64,7 @@ class UserProfileView(APIView):
             "created_at": user.date_joined
         })
 
+    @query_budget(max_queries=2)
     def put(self, request):
         user = request.user
         data = request.data
@@ -80,6 +92,7 @@ class UserProfileView(APIView):
 from rest_framework.validators import ValidationError
 
 class RegisterView(APIView):
+    @query_budget(max_queries=3)
     def post(self, request):
         name = request.data.get('name')
         email = request.data.get('email')
@@ -105,6 +118,7 @@ class RegisterView(APIView):
     
 
 @api_view(['POST'])
+@query_budget(max_queries=4)
 def logout_view(request):
     try:
         refresh_token = request.data["refresh"]
@@ -121,19 +135,35 @@ from .serializers import CustomTokenObtainPairSerializer
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
+    @query_budget(max_queries=4)
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
 
 from rest_framework import viewsets
 from rest_framework.permissions import AllowAny
-from .models import Request
+from .models import Request, InvalidTransition
 from .serializers import RequestSerializer
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])  # optionnel si tu veux sécuriser
+@renderer_classes(FAST_RENDERER_CLASSES)
+@query_budget(max_queries=1)
 def get_all_requests(request):
-    requests = Request.objects.all().order_by('-created_at')
-    serializer = RequestSerializer(requests, many=True)
-    return Response(serializer.data)
+    requests = Request.objects.order_by('-created_at')
+    return Response(RequestReadSerializer.serialize(requests))
+
+from .duplicates import duplicate_index
+
+
+def add_possible_duplicates(data, user):
+    # Demandes ouvertes du même client qui ressemblent à celle qui vient d'être créée.
+    data['possible_duplicates'] = duplicate_index.similar(
+        data['title'], data.get('description'), user_id=user.id, exclude=data['id'],
+    )
+    return data
+
 
 class RequestViewSet(
     mixins.ListModelMixin,
@@ -144,15 +174,36 @@ class RequestViewSet(
 ):
     serializer_class = RequestSerializer
     permission_classes = [AllowAny]
+    renderer_classes = FAST_RENDERER_CLASSES
 
     def get_queryset(self):
         user = self.request.user
-        print(f"User authentifié : {user} (ID: {user.id})")
+        logger.debug("Liste des demandes", extra={'user_id': user.id})
 
         if user.is_anonymous:
             return Request.objects.none()
 
-        return Request.objects.filter(user=user)
+        return Request.objects.filter(user=user).select_related('user', 'category', 'feedback__user')
+
+    @query_budget(max_queries=1)
+    def list(self, request, *args, **kwargs):
+        return Response(RequestReadSerializer.serialize(self.get_queryset()))
+
+    # Catégorie, compteur de catégorie et construction éventuelle de l'index des doublons.
+    @idempotent('request-create')
+    @query_budget(max_queries=6)
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        add_possible_duplicates(response.data, request.user)
+        return response
+
+    @query_budget(max_queries=3)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @query_budget(max_queries=6)
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         # Enregistre la demande avec l'utilisateur connecté
@@ -165,10 +216,11 @@ class RequestViewSet(
 class RequestUpdateView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @query_budget(max_queries=6)
     def put(self, request, pk):
         try:
             # Fetch request owned by the user
-            request_obj = Request.objects.get(pk=pk, user=request.user)
+            request_obj = Request.objects.select_related('user', 'category').get(pk=pk, user=request.user)
         except Exception:
             return Response({"status": 400, "message": "Request not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -178,11 +230,13 @@ class RequestUpdateView(APIView):
             return Response({"status": 200, "message": "Request updated successfully", "data": serializer.data}, status=status.HTTP_200_OK)
         return Response({"status": 400, "message": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
+@query_budget(max_queries=5)
 def get_stats(request):
     try:
         # Exemple de statistiques
-        total_requests = Request.objects.count()  # Nombre total de demandes
-        resolved_requests = Request.objects.filter(status='resolue').count()  # Nombre de demandes résolues
+        archived = archive.rollup_totals()  # Demandes archivées, par statut
+        total_requests = Request.objects.count() + sum(t['archived_requests'] for t in archived.values())  # Nombre total de demandes
+        resolved_requests = Request.objects.filter(status='resolue').count() + archived.get('resolue', {}).get('archived_requests', 0)  # Nombre de demandes résolues
         total_users = User.objects.count()  # Nombre total d'utilisateurs
         pending_requests = Request.objects.filter(status='en_attente').count()  # Nombre de demandes en attente
 
@@ -205,6 +259,9 @@ from rest_framework.permissions import IsAuthenticated
 class CreateRequestAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
+    # Même portée que RequestViewSet.create : une clé rejouée sur l'autre endpoint ne recrée rien.
+    @idempotent('request-create')
+    @query_budget(max_queries=6)
     def post(self, request):
         # Crée la demande avec le serializer
         serializer = RequestSerializer(data=request.data, context={"request": request})
@@ -213,7 +270,7 @@ class CreateRequestAPIView(APIView):
         if serializer.is_valid():
             # Sauvegarde la demande avec l'utilisateur connecté
             serializer.save(user=request.user)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(add_possible_duplicates(serializer.data, request.user), status=status.HTTP_201_CREATED)
         
         # Si les données du serializer sont invalides, retourne une erreur
         return Response(
@@ -227,9 +284,11 @@ from .serializers import FeedbackSerializer
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent('feedback')
+@query_budget(max_queries=6)
 def add_feedback(request, request_id):
     try:
-        req = Request.objects.get(pk=request_id, user=request.user)
+        req = Request.objects.select_related('user', 'category').get(pk=request_id, user=request.user)
         if req.status != 'resolue':
             return Response({"error": "La demande doit être résolue pour être évaluée"}, status=status.HTTP_400_BAD_REQUEST)
         if hasattr(req, 'feedback') and req.feedback:
@@ -248,70 +307,93 @@ def add_feedback(request, request_id):
 
 
 from django.views.decorators.http import require_http_methods
+from .detail_cache import request_details
+from . import archive, feedback_stats, routers
 
 @require_http_methods(["GET"])  # On accepte uniquement les requêtes GET
 @api_view(['GET'])
+@query_budget(max_queries=2)
 def get_request_by_id(request, request_id):
-    try:
-        request_obj = Request.objects.get(id=request_id)
-        serializer = RequestSerializer(request_obj)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    except Request.DoesNotExist:
-        return Response({"error": "Demande introuvable"}, status=status.HTTP_404_NOT_FOUND)
+    # Version lue avant la base : une invalidation concurrente rend la réponse calculée obsolète.
+    version = request_details.version(request_id)
+    payload = request_details.get(request_id, version)
+    if payload is None:
+        # Le cache ne doit pas être rempli depuis un réplica en retard.
+        with routers.use_primary():
+            request_obj = Request.objects.select_related('user', 'category', 'feedback__user').filter(id=request_id).first()
+            if request_obj is not None:
+                payload = dict(RequestSerializer(request_obj).data)
+            else:
+                payload = archive.request_detail(request_id)
+        if payload is None:
+            return Response({"error": "Demande introuvable"}, status=status.HTTP_404_NOT_FOUND)
+        request_details.set(request_id, version, payload)
+    return Response(payload, status=status.HTTP_200_OK)
     
 class UpdateRequestStatusView(APIView):
     permission_classes = [IsAuthenticated]  # Empêche accès sans token JWT valide
 
+    # Dont la relecture du statut sous verrou et la mise à jour des compteurs de la catégorie.
+    @query_budget(max_queries=8)
     def put(self, request, request_id):
         try:
-            request_data = Request.objects.get(id=request_id)
+            request_data = Request.objects.select_related('user').get(id=request_id)
             new_status = request.data.get('status')  # On récupère les données JSON
 
             if new_status:
-                request_data.status = new_status
-                request_data.save()
+                request_data.transition_to(new_status, actor=request.user)
                 return Response({"message": "Request status updated successfully"}, status=status.HTTP_200_OK)
             else:
                 return Response({"error": "Status is required"}, status=status.HTTP_400_BAD_REQUEST)
         except Request.DoesNotExist:
             return Response({"error": "Request not found"}, status=status.HTTP_404_NOT_FOUND)
+        except InvalidTransition as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     
 
 from rest_framework.response import Response
-from django.db.models import Count, Avg
+from django.db.models import Count, Sum, F, DurationField, ExpressionWrapper
 from .models import Request
 
 class StatsView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @query_budget(max_queries=5)
     def get(self, request):
-        total_requests = Request.objects.count()
+        # Totaux des demandes archivées (voir archive.py)
+        archived = archive.rollup_totals()
 
         # Comptage par statut
-        status_counts = Request.objects.values('status').annotate(count=Count('status'))
+        status_counts = Request.objects.values('status').annotate(count=Count('status')).order_by()
         status_dict = {'en_attente': 0, 'en_cours': 0, 'resolue': 0, 'rejetee': 0}
         for item in status_counts:
             status_dict[item['status']] = item['count']
-
-        # Moyenne des notes
-        avg_rating = Feedback.objects.aggregate(Avg('rating'))['rating__avg'] or 0
-
-        # Moyenne du temps de résolution (calculé en Python)
-        resolved_requests = Request.objects.filter(status='resolue', resolved_at__isnull=False)
-        total_seconds = 0
-        count = resolved_requests.count()
-
-        for req in resolved_requests:
-            delta = req.resolved_at - req.created_at
-            total_seconds += delta.total_seconds()
-
-        avg_resolution_time = (total_seconds / count / 86400) if count > 0 else 0
+        for status_name, totals in archived.items():
+            status_dict[status_name] += totals['archived_requests']
+        total_requests = sum(status_dict.values())
+
+        # Moyenne des notes, archives comprises (agrégats tenus à jour)
+        rating_count, rating_sum = feedback_stats.averages()
+        avg_rating = rating_sum / rating_count if rating_count else 0
+
+        # Moyenne du temps de résolution (calculée par la base)
+        resolution = Request.objects.filter(status='resolue', resolved_at__isnull=False).aggregate(
+            total=Sum(ExpressionWrapper(F('resolved_at') - F('created_at'), output_field=DurationField())),
+            count=Count('id'),
+        )
+        resolution_seconds = resolution['total'].total_seconds() if resolution['total'] else 0
+        resolution_seconds += sum(t['resolution_seconds'] for t in archived.values())
+        resolved_count = resolution['count'] + sum(t['resolved_requests'] for t in archived.values())
+        avg_resolution_time = resolution_seconds / resolved_count / 86400 if resolved_count else 0
 
         # Requêtes récentes
-        recent_requests = Request.objects.order_by('-created_at')[:5].values(
-            'id', 'title', 'status', 'created_at', 'category'
-        )
+        recent_requests = [
+            {'id': pk, 'title': title, 'status': status_name, 'created_at': created_at, 'category': category}
+            for pk, title, status_name, created_at, category in Request.objects.order_by('-created_at').values_list(
+                'id', 'title', 'status', 'created_at', 'category__name',
+            )[:5]
+        ]
 
         stats = {
             'total': total_requests,
@@ -323,25 +405,194 @@ class StatsView(APIView):
         return Response(stats)
 
 
+from django.utils.dateparse import parse_datetime
+from . import sla
+
+class SLAStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @query_budget(max_queries=2)
+    def get(self, request):
+        since = parse_datetime(request.query_params.get('since', '') or '')
+        until = parse_datetime(request.query_params.get('until', '') or '')
+        time_in_state = {
+            status_name: {
+                'count': values['count'],
+                'avgHours': round(values['avg_seconds'] / 3600, 2),
+                'totalHours': round(values['total_seconds'] / 3600, 2),
+            }
+            for status_name, values in sla.time_in_state(since, until).items()
+        }
+        return Response({
+            'timeInState': time_in_state,
+            'transitions': sla.transition_counts(since, until),
+        })
+
+
+from . import changes, deletion
+
+class ChangesView(APIView):
+    """Synchronisation incrémentale : /api/changes/?since=<curseur>."""
+    permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    @query_budget(max_queries=4)
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', 500)), 2000)
+            payload = changes.changes_since(request.user, request.query_params.get('since'), limit)
+        except ValueError:
+            return Response({"error": "Curseur invalide"}, status=status.HTTP_400_BAD_REQUEST)
+        except changes.CursorExpired:
+            return Response(
+                {"error": "Curseur expiré, resynchronisation complète requise"},
+                status=status.HTTP_410_GONE,
+            )
+        if payload is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(payload)
+
+
+from . import batch
+
+class BatchView(APIView):
+    """
+    Plusieurs appels d'API en un aller-retour :
+    {"requests": [{"id": "profil", "method": "GET", "path": "/api/users/me/"}, ...], "parallel": false}
+    Une écriture peut porter sa clé d'idempotence ("idempotency_key") ; celle
+    de la requête de lot n'est pas transmise aux sous-requêtes.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    # Chaque sous-requête est contrôlée par le budget de sa propre vue.
+    @query_budget(max_repeats=0)
+    def post(self, request):
+        try:
+            operations = batch.parse_operations(request.data)
+        except batch.BatchError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        results = batch.run(request, operations, parallel=bool(request.data.get('parallel')))
+        return Response({'responses': results})
+
+
+class HistoryView(APIView):
+    """
+    Liste paginée couvrant les tables chaudes et les archives (?before=&limit=).
+    ``before`` vaut le ``next`` de la page précédente (``<date en µs>_<id>``)
+    ou une date ISO.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
+    # Fonction d'archive.py appelée avec (utilisateur, position, limite).
+    history_function = staticmethod(archive.history)
+    # Un admin lit les lignes de tous les utilisateurs (utilisateur None).
+    admin_sees_all = True
+
+    @query_budget(max_queries=2)
+    def get(self, request):
+        before = request.query_params.get('before')
+        if before:
+            micros, _, last_id = before.partition('_')
+            try:
+                before = (changes.decode_cursor(micros), int(last_id)) if last_id else (parse_datetime(before), None)
+            except ValueError:
+                before = (None, None)
+            if before[0] is None:
+                return Response({"error": "Position invalide pour 'before'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', 100)), 1000)
+        except ValueError:
+            return Response({"error": "Limite invalide"}, status=status.HTTP_400_BAD_REQUEST)
+        user = None if self.admin_sees_all and request.user.role == 'admin' else request.user
+        results = self.history_function(user, before or None, limit)
+        next_before = None
+        if len(results) == limit:
+            next_before = f"{changes.encode_cursor(results[-1]['created_at'])}_{results[-1]['id']}"
+        return Response({'results': results, 'next': next_before})
+
+
+class RequestHistoryView(HistoryView):
+    history_function = staticmethod(archive.history)
+
+
+class NotificationHistoryView(HistoryView):
+    history_function = staticmethod(archive.notification_history)
+    admin_sees_all = False
+
+
 class RequestDeleteView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @query_budget(max_queries=0)
     def get(self, request, request_id):
         return Response({"message": "GET fonctionne"})
 
+    # Décompte par catégorie et mise à jour des compteurs avant le marquage.
+    @query_budget(max_queries=3)
     def delete(self, request, request_id):
-        request_data = Request.objects.get(id = request_id)
-        request_data.delete()
+        # Marquage immédiat ; les dépendants sont supprimés en arrière-plan.
+        if not deletion.mark_request_deleted(request_id):
+            return Response({"error": "Demande introuvable"}, status=status.HTTP_404_NOT_FOUND)
         return Response({"message": "DELETE fonctionne"})
     
-class FeedbackListView(APIView):
+from django.db.models import Q
+from .fast_serializers import CategoryReadSerializer
+from .models import Category
+
+class CategoryListView(APIView):
+    """Catégories et leurs compteurs de demandes ouvertes et résolues (lecture d'une petite table)."""
     permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
 
+    @query_budget(max_queries=1)
     def get(self, request):
-        feedbacks = Feedback.objects.select_related('user', 'request').all().order_by('-created_at')
-        serializer = FeedbackSerializer(feedbacks, many=True)
-        return Response(serializer.data)
+        return Response(CategoryReadSerializer.serialize(Category.objects.all()))
 
+
+class FeedbackListView(APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    @query_budget(max_queries=1)
+    def get(self, request):
+        """
+        Avis du plus récent au plus ancien, par pages de ``limit`` :
+        ?cursor=&limit=&rating=&min_rating=&max_rating=&since=&until=&category=
+        """
+        params = request.query_params
+        feedbacks = Feedback.objects.all()
+        try:
+            limit = min(max(int(params.get('limit', 50)), 1), 200)
+            for param, lookup in (('rating', 'rating'), ('min_rating', 'rating__gte'), ('max_rating', 'rating__lte')):
+                if params.get(param):
+                    feedbacks = feedbacks.filter(**{lookup: int(params[param])})
+            for param, lookup in (('since', 'created_at__gte'), ('until', 'created_at__lt')):
+                if params.get(param):
+                    moment = parse_datetime(params[param])
+                    if moment is None:
+                        raise ValueError(param)
+                    feedbacks = feedbacks.filter(**{lookup: moment})
+            if params.get('cursor'):
+                # Curseur « <created_at en µs>_<id> » du dernier avis de la page précédente.
+                micros, _, last_id = params['cursor'].partition('_')
+                created_at = changes.decode_cursor(micros)
+                feedbacks = feedbacks.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=int(last_id))
+                )
+        except ValueError:
+            return Response({"error": "Paramètres de filtre invalides"}, status=status.HTTP_400_BAD_REQUEST)
+        if params.get('category'):
+            feedbacks = feedbacks.filter(request__category__key=Category.key_of(params['category']))
+
+        rows = FeedbackReadSerializer.serialize(feedbacks.order_by('-created_at', '-id')[:limit + 1])
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f"{changes.encode_cursor(rows[-1]['created_at'])}_{rows[-1]['id']}"
+        return Response({'results': rows, 'next': next_cursor})
+
+    @query_budget(max_queries=5)
     def post(self, request, request_id=None):
         data = request.data.copy()
         data['user'] = request.user.id
@@ -360,13 +611,11 @@ from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import authenticate
 from .models import User  # Replace with your app's name
 import re
-import logging
-
-logger = logging.getLogger(__name__)
 
 class ChangePasswordView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @query_budget(max_queries=3)
     def post(self, request):
         try:
             current_password = request.data.get('currentPassword')
@@ -423,15 +672,17 @@ from .serializers import NotificationSerializer
 
 class NotificationListView(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
 
+    @query_budget(max_queries=1)
     def get(self, request):
         notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-        serializer = NotificationSerializer(notifications, many=True)
-        return Response(serializer.data)
+        return Response(NotificationReadSerializer.serialize(notifications))
 
+    @query_budget(max_queries=2)
     def put(self, request, pk=None):
         try:
-            notification = Notification.objects.get(pk=pk, user=request.user)
+            notification = Notification.objects.select_related('request').get(pk=pk, user=request.user)
             notification.is_read = True
             notification.save()
             serializer = NotificationSerializer(notification)
@@ -439,6 +690,7 @@ class NotificationListView(APIView):
         except Notification.DoesNotExist:
             return Response({"error": "Notification introuvable ou non autorisée"}, status=status.HTTP_404_NOT_FOUND)
 
+    @query_budget(max_queries=2)
     def delete(self, request, pk=None):
         try:
             notification = Notification.objects.get(pk=pk, user=request.user)
@@ -456,7 +708,11 @@ class NotificationUpdateView(generics.UpdateAPIView):
     queryset = Notification.objects.all()
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user)
+        return Notification.objects.filter(user=self.request.user).select_related('request')
+
+    @query_budget(max_queries=2)
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
 
 from rest_framework.permissions import IsAuthenticated, BasePermission
 
@@ -464,16 +720,222 @@ class IsAdminUser(BasePermission):
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.role == 'admin'
 
+from django.db.models import OuterRef, Subquery
+from django.utils.dateparse import parse_date
+from django.db.models.functions import Coalesce
 from .serializers import UserSerializer
+from . import compression
+
+class FeedbackSummaryView(APIView):
+    """Agrégats d'avis (?since=AAAA-MM&until=AAAA-MM&category=), sans lire la table des avis."""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    @query_budget(max_queries=1)
+    def get(self, request):
+        months = {}
+        for param in ('since', 'until'):
+            value = request.query_params.get(param)
+            if value:
+                months[param] = parse_date(f'{value}-01') if len(value) == 7 else parse_date(value)
+                if months[param] is None:
+                    return Response({"error": f"Mois invalide pour '{param}'"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(feedback_stats.summary(category=request.query_params.get('category'), **months))
+
+
+class DuplicateClustersView(APIView):
+    """Groupes de demandes ouvertes quasi identiques, pour les fusionner ou les clore."""
+    permission_classes = [IsAdminUser]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    @query_budget(max_queries=1)
+    def get(self, request):
+        clusters = duplicate_index.clusters()
+        return Response({'count': len(clusters), 'clusters': clusters})
+
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from . import priority
+from .fast_serializers import QueueItemReadSerializer
+
+
+class QueueView(APIView):
+    """
+    File de travail des admins : demandes ouvertes par score de priorité décroissant.
+
+    GET renvoie les ``limit`` prochaines demandes libres ou prises en charge
+    par l'admin courant ; POST prend en charge les ``limit`` prochaines
+    demandes libres (SELECT ... FOR UPDATE SKIP LOCKED : deux admins ne
+    reçoivent jamais la même demande) ; DELETE /api/queue/<id>/ la rend.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    def get_limit(self, request):
+        maximum = getattr(settings, 'PRIORITY_QUEUE_MAX_LIMIT', 50)
+        # Le corps peut être une liste JSON : seul un objet porte 'limit'.
+        body = request.data if isinstance(request.data, dict) else {}
+        return min(max(int(request.query_params.get('limit', body.get('limit', 10))), 1), maximum)
+
+    def ordered(self, queryset):
+        return queryset.filter(priority_score__isnull=False).order_by('-priority_score', 'id')
+
+    @query_budget(max_queries=1)
+    def get(self, request):
+        try:
+            limit = self.get_limit(request)
+        except (TypeError, ValueError):
+            return Response({"error": "Paramètre 'limit' invalide"}, status=status.HTTP_400_BAD_REQUEST)
+        available = Q(claimed_by__isnull=True) | Q(claimed_at__lt=priority.claim_expiry()) | Q(claimed_by=request.user)
+        queue = self.ordered(Request.objects.filter(available))[:limit]
+        return Response(QueueItemReadSerializer.serialize(queue))
+
+    @query_budget(max_queries=3)
+    def post(self, request):
+        try:
+            limit = self.get_limit(request)
+        except (TypeError, ValueError):
+            return Response({"error": "Paramètre 'limit' invalide"}, status=status.HTTP_400_BAD_REQUEST)
+        now = timezone.now()
+        with transaction.atomic():
+            # Les lignes verrouillées par une prise en charge concurrente sont sautées.
+            pks = list(
+                self.ordered(Request.objects.select_for_update(skip_locked=True))
+                .filter(Q(claimed_by__isnull=True) | Q(claimed_at__lt=priority.claim_expiry(now)))
+                .values_list('pk', flat=True)[:limit]
+            )
+            Request.objects.filter(pk__in=pks).update(claimed_by=request.user, claimed_at=now)
+        claimed = QueueItemReadSerializer.serialize(self.ordered(Request.objects.filter(pk__in=pks)))
+        return Response(claimed, status=status.HTTP_200_OK)
+
+    @query_budget(max_queries=1)
+    def delete(self, request, request_id=None):
+        released = Request.objects.filter(pk=request_id, claimed_by=request.user).update(claimed_by=None, claimed_at=None)
+        if not released:
+            return Response({"error": "Demande non prise en charge par vous"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+from django.http import FileResponse, Http404
+from . import profiling
+
+
+class ProfileTokenView(APIView):
+    """Jeton à envoyer dans l'en-tête X-Profile pour profiler une requête (voir profiling.py)."""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @query_budget(max_queries=0)
+    def post(self, request):
+        if not profiling.enabled():
+            return Response({"error": "Profilage désactivé"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'token': profiling.make_token(request.user),
+            'header': 'X-Profile',
+            'expires_in': getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 600),
+        })
+
+
+class ProfileListView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    @query_budget(max_queries=0)
+    def get(self, request):
+        return Response(profiling.list_profiles())
+
+
+class ProfileDownloadView(APIView):
+    """Fichier .prof d'un profil, ou son détail (SQL, fonctions) avec ?format=json."""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @query_budget(max_queries=0)
+    def get(self, request, profile_id):
+        if request.query_params.get('format') == 'json':
+            path = profiling.profile_path(profile_id, '.json')
+            if path is None:
+                raise Http404
+            return FileResponse(open(path, 'rb'), content_type='application/json')
+        path = profiling.profile_path(profile_id, '.prof')
+        if path is None:
+            raise Http404
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{profile_id}.prof')
+
+
+from .models import JobRun
+from .scheduler import scheduler
+
+
+class JobListView(APIView):
+    """Tâches du planificateur : planification, prochaine et dernière exécution (voir scheduler.py)."""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    @query_budget(max_queries=1)
+    def get(self, request):
+        return Response(scheduler.status())
+
+
+class JobRunListView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    @query_budget(max_queries=1)
+    def get(self, request, name):
+        runs = JobRun.objects.filter(job=name).order_by('-started_at').values(
+            'id', 'worker', 'started_at', 'finished_at', 'duration_ms', 'status', 'result',
+        )[:50]
+        return Response(list(runs))
+
+
+class CompressionStatsView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @query_budget(max_queries=0)
+    def get(self, request):
+        return Response(compression.stats.snapshot())
+
 
 class UserListCreateView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
+    renderer_classes = FAST_RENDERER_CLASSES
 
+    @query_budget(max_queries=2)
     def get(self, request):
-        users = User.objects.all()
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data)
+        """Annuaire paginé : ?page=&page_size=&search=<préfixe>&role="""
+        users = User.objects.filter(deleted_at__isnull=True)
+        search = request.query_params.get('search', '').strip()
+        if search:
+            # Recherche par préfixe : servie par les index, contrairement à icontains.
+            users = users.filter(
+                Q(email__istartswith=search) | Q(username__istartswith=search) | Q(first_name__istartswith=search)
+            )
+        role = request.query_params.get('role')
+        if role:
+            users = users.filter(role=role)
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', 25)), 1), 100)
+        except ValueError:
+            return Response({"error": "Pagination invalide"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Nombre de demandes par utilisateur : sous-requête groupée, évaluée
+        # seulement pour les lignes de la page.
+        request_counts = Request.objects.filter(user=OuterRef('pk')).order_by().values('user').annotate(
+            total=Count('pk')
+        ).values('total')
+        rows = users.annotate(
+            request_count=Coalesce(Subquery(request_counts), 0)
+        ).order_by('id')[(page - 1) * page_size:page * page_size]
+        return Response({
+            'count': users.count(),
+            'page': page,
+            'page_size': page_size,
+            'results': UserDirectorySerializer.serialize(rows),
+        })
 
+    @query_budget(max_queries=4)
     def post(self, request):
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
@@ -484,6 +946,7 @@ class UserListCreateView(APIView):
 class UserDetailView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
+    @query_budget(max_queries=1)
     def get(self, request, pk):
         try:
             user = User.objects.get(pk=pk)
@@ -492,6 +955,7 @@ class UserDetailView(APIView):
         except User.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
+    @query_budget(max_queries=4)
     def put(self, request, pk):
         try:
             user = User.objects.get(pk=pk)
@@ -503,13 +967,13 @@ class UserDetailView(APIView):
         except User.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
+    # Dont le décompte par catégorie des demandes et la mise à jour des compteurs.
+    @query_budget(max_queries=5)
     def delete(self, request, pk):
-        try:
-            user = User.objects.get(pk=pk)
-            user.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        except User.DoesNotExist:
+        # Compte désactivé tout de suite, données supprimées en arrière-plan.
+        if not deletion.mark_user_deleted(pk):
             return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 # ai_assistant/views.py
@@ -522,36 +986,46 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.conf import settings
 from .models import AIConversation
-from .serializers import AIConversationSerializer
 from rest_framework.permissions import IsAuthenticated
+from .faq_index import faq_index
+
 
 class AIAssistantView(APIView):
     permission_classes = [IsAuthenticated]
 
+    # Construction éventuelle de l'index FAQ : demandes actives et archivées.
+    @query_budget(max_queries=4)
     def post(self, request):
-        print("Utilisateur connecté:", request.user.email)
         message = request.data.get('message')
         if not message:
-            print("Erreur: aucun message fourni")
+            logger.info("Assistant : aucun message fourni", extra={'user_id': request.user.id})
             return Response({'error': 'Message requis'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            print("Sauvegarde du message utilisateur:", message)
             AIConversation.objects.create(
                 user=request.user,
                 message=message,
                 sender='user'
             )
         except Exception as e:
-            print("Erreur lors de la sauvegarde du message utilisateur:", str(e))
+            logger.exception("Assistant : échec de la sauvegarde du message", extra={'user_id': request.user.id})
             return Response(
                 {'error': f'Erreur lors de la sauvegarde du message: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        # Question déjà traitée dans une demande résolue : réponse locale.
+        faq = faq_index.answer(message)
+        if faq is not None:
+            AIConversation.objects.create(user=request.user, message=faq['answer'], sender='ai')
+            # L'index couvre les demandes de tous les clients : seul un admin voit laquelle a servi.
+            if request.user.role != 'admin':
+                faq = {'answer': faq['answer'], 'score': faq['score']}
+            return Response({'response': faq['answer'], 'source': faq}, status=status.HTTP_200_OK)
+
         # Vérifier si la clé API Mistral est définie
         if not settings.MISTRAL_API_KEY:
-            print("Erreur: MISTRAL_API_KEY non configurée")
+            logger.error("Assistant : MISTRAL_API_KEY non configurée")
             return Response(
                 {'error': 'Clé API Mistral non configurée. Veuillez ajouter MISTRAL_API_KEY dans .env.'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -568,7 +1042,10 @@ class AIAssistantView(APIView):
                     'Content-Type': 'application/json',
                     'Accept': 'application/json',
                 }
-                print("Envoi de la requête à Mistral AI (tentative {}): {}".format(attempt + 1, message))
+                logger.debug(
+                    "Assistant : appel à Mistral",
+                    extra={'user_id': request.user.id, 'attempt': attempt + 1, 'message_length': len(message)},
+                )
                 response = requests.post(
                     'https://api.mistral.ai/v1/chat/completions',
                     json={
@@ -580,7 +1057,11 @@ class AIAssistantView(APIView):
                     headers=headers,
                     timeout=10  # Ajout d'un timeout de 10 secondes
                 )
-                print("Réponse Mistral AI:", response.status_code, response.text)
+                # Statut et taille seulement : le corps de la réponse peut être volumineux.
+                logger.debug(
+                    "Assistant : réponse de Mistral",
+                    extra={'status_code': response.status_code, 'response_length': len(response.content)},
+                )
 
                 if response.status_code == 400:
                     return Response(
@@ -594,7 +1075,7 @@ class AIAssistantView(APIView):
                     )
                 if response.status_code == 429:
                     if attempt < max_retries - 1:
-                        print(f"Erreur 429: Quota dépassé, réessai dans {retry_delay} secondes...")
+                        logger.warning("Assistant : quota Mistral dépassé, réessai dans %s s", retry_delay)
                         time.sleep(retry_delay)
                         retry_delay *= 2  # Backoff exponentiel
                         continue
@@ -611,7 +1092,6 @@ class AIAssistantView(APIView):
                 response.raise_for_status()
                 ai_response = response.json()['choices'][0]['message']['content']
 
-                print("Sauvegarde de la réponse AI:", ai_response)
                 AIConversation.objects.create(
                     user=request.user,
                     message=ai_response,
@@ -619,13 +1099,13 @@ class AIAssistantView(APIView):
                 )
                 return Response({'response': ai_response}, status=status.HTTP_200_OK)
             except requests.Timeout:
-                print("Erreur: Timeout lors de l'appel à l'API Mistral")
+                logger.warning("Assistant : délai dépassé lors de l'appel à Mistral")
                 return Response(
                     {'error': 'Délai d\'attente dépassé lors de l\'appel à l\'API Mistral.'},
                     status=status.HTTP_504_GATEWAY_TIMEOUT
                 )
             except requests.RequestException as e:
-                print("Erreur Mistral AI:", str(e))
+                logger.exception("Assistant : échec de l'appel à Mistral")
                 return Response(
                     {'error': f'Erreur lors de l\'appel à l\'API Mistral: {str(e)}'},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -633,15 +1113,15 @@ class AIAssistantView(APIView):
 
 class AIAssistantHistoryView(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
 
+    @query_budget(max_queries=1)
     def get(self, request):
         try:
-            print("Récupération de l'historique pour:", request.user.email)
             conversations = AIConversation.objects.filter(user=request.user).order_by('created_at')
-            serializer = AIConversationSerializer(conversations, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response(AIConversationReadSerializer.serialize(conversations), status=status.HTTP_200_OK)
         except Exception as e:
-            print("Erreur lors de la récupération de l'historique:", str(e))
+            logger.exception("Assistant : échec de la lecture de l'historique", extra={'user_id': request.user.id})
             return Response(
                 {'error': f'Erreur lors de la récupération de l\'historique: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -179,7 +179,12 @@ export const getAllRequests = async () => {
 
 
 // Fonction pour créer une requête (avec rafraîchissement auto du token si expiré)
-export const createRequest = async (requestData) => {
+// Clé Idempotency-Key d'une soumission : renvoyée telle quelle à chaque nouvel
+// essai (rafraîchissement du token, double clic), le backend rejoue alors la
+// première réponse au lieu de créer un doublon.
+export const newIdempotencyKey = () => crypto.randomUUID();
+
+export const createRequest = async (requestData, idempotencyKey = newIdempotencyKey()) => {
   let token = localStorage.getItem("access_token");
 
   if (!token) {
@@ -196,6 +201,7 @@ export const createRequest = async (requestData) => {
       headers: {
         "Content-Type": "application/json",
         Authorization: `Bearer ${accessToken}`,
+        "Idempotency-Key": idempotencyKey,
       },
       body: JSON.stringify(requestData),
     });
@@ -291,10 +297,13 @@ const getTokenConfig = () => {
   };
 };
 
-export const addFeedback = (requestId, rating, comment) => {
+export const addFeedback = (requestId, rating, comment, idempotencyKey = newIdempotencyKey()) => {
   const feedbackData = { rating, comment };
-  const sendRequest = () =>
-    axios.post(`http://localhost:8000/api/requests/${requestId}/feedback/`, feedbackData, getTokenConfig());
+  const sendRequest = () => {
+    const config = getTokenConfig();
+    config.headers["Idempotency-Key"] = idempotencyKey;
+    return axios.post(`http://localhost:8000/api/requests/${requestId}/feedback/`, feedbackData, config);
+  };
   return sendRequest()
     .then(res => {
       if (!res.data || !res.data.id) {
@@ -452,14 +461,19 @@ export const deleteRequest = async (requestId) => {
 };
 
 
-export const fetchFeedbacks = async () => {
+// Une page d'avis : { results, next }. Passer `next` comme `cursor` pour la page suivante ;
+// autres filtres possibles : limit, rating, min_rating, max_rating, since, until, category.
+export const fetchFeedbacks = async (params = {}) => {
   let token = localStorage.getItem("access_token");
   if (!token) {
     console.error("Aucun token trouvé.");
     throw new Error("Utilisateur non authentifié.");
   }
 
-  const url = "http://localhost:8000/api/feedbacks/";
+  const query = new URLSearchParams(
+    Object.entries(params).filter(([, value]) => value !== undefined && value !== null && value !== '')
+  ).toString();
+  const url = `http://localhost:8000/api/feedbacks/${query ? `?${query}` : ''}`;
 
   let response = await fetch(url, {
     method: "GET",
@@ -501,9 +515,7 @@ export const fetchFeedbacks = async () => {
   }
 
   // Tout va bien
-  const data = await response.json();
-  console.log("Feedbacks reçus :", data);
-  return data;
+  return await response.json();
 };
 
 export const changePassword = async (currentPassword, newPassword) => {
@@ -657,4 +669,93 @@ export const deleteNotification = async (notificationId) => {
     console.error('Erreur lors de la suppression de la notification:', error.message);
     throw error;
   }
-};
\ No newline at end of file
+};
+// Synchronisation incrémentale : renvoie null si rien n'a changé depuis `since`.
+// Un curseur expiré (410) impose de tout recharger puis de repartir de since = null.
+export const getChanges = async (since = null) => {
+  const url = since
+    ? `http://localhost:8000/api/changes/?since=${encodeURIComponent(since)}`
+    : 'http://localhost:8000/api/changes/';
+  let token = localStorage.getItem("access_token");
+  try {
+    let response = await fetch(url, {
+      headers: { 'Authorization': `Bearer ${token}` },
+    });
+    if (response.status === 401) {
+      token = await refreshAccessToken();
+      response = await fetch(url, {
+        headers: { 'Authorization': `Bearer ${token}` },
+      });
+    }
+    if (response.status === 204) {
+      return null;
+    }
+    if (response.status === 410) {
+      return { expired: true };
+    }
+    if (!response.ok) {
+      throw new Error('Erreur lors de la synchronisation');
+    }
+    return await response.json();
+  } catch (error) {
+    console.error('Erreur lors de la synchronisation:', error.message);
+    throw error;
+  }
+};
+
+// Plusieurs appels en un aller-retour : batch([{ id: 'profil', path: '/api/users/me/' }, ...]).
+// Renvoie { [id]: { status, body } }. `parallel` exécute ensemble les lectures consécutives,
+// dans des threads qui ouvrent chacun leur propre connexion à la base au lieu de partager
+// celle de la requête : à réserver aux lectures lentes, pas aux petites listes.
+export const batch = async (requests, { parallel = false } = {}) => {
+  const send = (token) =>
+    fetch('http://localhost:8000/api/batch/', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${token}`,
+      },
+      body: JSON.stringify({ requests, parallel }),
+    });
+
+  try {
+    let response = await send(localStorage.getItem("access_token"));
+    if (response.status === 401) {
+      response = await send(await refreshAccessToken());
+    }
+    if (!response.ok) {
+      const errorData = await response.json();
+      throw new Error(errorData.error || 'Erreur lors de l\'appel groupé');
+    }
+    const data = await response.json();
+    return Object.fromEntries(data.responses.map(({ id, status, body }) => [id, { status, body }]));
+  } catch (error) {
+    console.error('Erreur lors de l\'appel groupé:', error.message);
+    throw error;
+  }
+};
+
+// Lectures regroupées : les appels lancés pendant le même rendu (effets de la page, du
+// layout et de l'assistant) partent ensemble dans un seul /api/batch/.
+let pendingGets = null;
+
+export const batchedGet = (path) => {
+  if (!pendingGets) {
+    const operations = [];
+    const responses = Promise.resolve().then(() => {
+      pendingGets = null;
+      return batch(operations);
+    });
+    pendingGets = { operations, responses };
+  }
+  const { operations, responses } = pendingGets;
+  const id = String(operations.length);
+  operations.push({ id, path });
+  return responses.then((results) => {
+    const { status, body } = results[id];
+    if (status >= 400) {
+      throw new Error(body?.error || body?.detail || `Erreur HTTP: ${status}`);
+    }
+    return body;
+  });
+};
@@ -5,7 +5,7 @@ import { useTheme } from '../context/ThemeContext';
 import {
   Sun, Moon, ChevronDown, LogOut, User, Home, Menu, X, MessageSquare, Bell, Send, Loader2, Trash2
 } from 'lucide-react';
-import { getNotifications, markNotificationAsRead, deleteNotification } from '../api/requests';
+import { batchedGet, markNotificationAsRead, deleteNotification } from '../api/requests';
 import { toast } from 'react-toastify';
 import { debounce } from 'lodash';
 
@@ -78,9 +78,7 @@ const AIAssistant = () => {
   useEffect(() => {
     const fetchMessages = async () => {
       try {
-        const data = await fetchWithAuth(`http://localhost:8000/api/ai-assistant/history/`, {
-          headers: {},
-        });
+        const data = await batchedGet('/api/ai-assistant/history/');
         const mappedMessages = data.map(msg => ({
           sender: msg.sender,
           text: msg.message,
@@ -220,7 +218,7 @@ const Layout = () => {
     if (user) {
       const fetchNotifications = async () => {
         try {
-          const data = await getNotifications();
+          const data = await batchedGet('/notifications/');
           setNotifications(data);
         } catch (error) {
           console.error('Erreur lors de la récupération des notifications:', error);
@@ -18,14 +18,20 @@ const Satisfaction = () => {
   const [error, setError] = useState(null);
   const [loading, setLoading] = useState(true);
   const [currentPage, setCurrentPage] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
   const feedbacksPerPage = 4;
 
+  // Les avis arrivent par pages du serveur, chargées à la demande.
+  const loadMore = async (cursor) => {
+    const data = await fetchFeedbacks({ cursor, limit: 40 });
+    setFeedbacks((prev) => (cursor ? [...prev, ...data.results] : data.results));
+    setNextCursor(data.next);
+  };
+
   useEffect(() => {
     const loadFeedbacks = async () => {
       try {
-        const data = await fetchFeedbacks();
-        console.log('Données reçues :', data);
-        setFeedbacks(data);
+        await loadMore(null);
       } catch (err) {
         console.error('Erreur chargement feedbacks :', err);
         setError(err.message || 'Impossible de charger les évaluations');
@@ -44,7 +50,16 @@ const Satisfaction = () => {
     setCurrentPage((prev) => (prev === 0 ? totalPages - 1 : prev - 1));
   };
 
-  const handleNextPage = () => {
+  const handleNextPage = async () => {
+    if (currentPage === totalPages - 1 && nextCursor) {
+      try {
+        await loadMore(nextCursor);
+        setCurrentPage((prev) => prev + 1);
+      } catch (err) {
+        setError(err.message || 'Impossible de charger les évaluations');
+      }
+      return;
+    }
     setCurrentPage((prev) => (prev === totalPages - 1 ? 0 : prev + 1));
   };
 
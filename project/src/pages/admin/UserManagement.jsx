@@ -53,7 +53,7 @@ async function makeAuthenticatedRequest(url, options = {}) {
 
 const UserManagement = () => {
   const [users, setUsers] = useState([]);
-  const [filteredUsers, setFilteredUsers] = useState([]);
+  const [totalPages, setTotalPages] = useState(1);
   const [searchQuery, setSearchQuery] = useState('');
   const [newUser, setNewUser] = useState({ first_name: '', email: '', password: '', role: 'client' });
   const [editingUser, setEditingUser] = useState(null);
@@ -71,8 +71,10 @@ const UserManagement = () => {
       setNotification({ type: 'error', message: 'Aucun token d’authentification trouvé. Veuillez vous reconnecter.' });
       return;
     }
-    fetchUsers();
-  }, []);
+    // Recherche et pagination faites par le serveur
+    const timer = setTimeout(fetchUsers, searchQuery ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [currentPage, searchQuery]);
 
   useEffect(() => {
     if (notification) {
@@ -86,13 +88,16 @@ const UserManagement = () => {
   const fetchUsers = async () => {
     setLoading(true);
     try {
-      const response = await makeAuthenticatedRequest('http://localhost:8000/api/users/', {
+      const params = new URLSearchParams({ page: currentPage, page_size: usersPerPage });
+      if (searchQuery) {
+        params.set('search', searchQuery);
+      }
+      const response = await makeAuthenticatedRequest(`http://localhost:8000/api/users/?${params}`, {
         method: 'GET',
       });
       const data = await response.json();
-      console.log('Users API response:', data);
-      setUsers(data);
-      setFilteredUsers(data);
+      setUsers(data.results);
+      setTotalPages(Math.max(1, Math.ceil(data.count / usersPerPage)));
       setNotification(null);
     } catch (error) {
       console.error('Erreur lors de la récupération des utilisateurs:', error);
@@ -210,22 +215,11 @@ const UserManagement = () => {
   };
 
   const handleSearch = (e) => {
-    const query = e.target.value.toLowerCase();
-    setSearchQuery(query);
-    setFilteredUsers(
-      users.filter(
-        (user) =>
-          user.email.toLowerCase().includes(query) ||
-          (user?.first_name && user.first_name.toLowerCase().includes(query))
-      )
-    );
+    setSearchQuery(e.target.value);
     setCurrentPage(1);
   };
 
-  const indexOfLastUser = currentPage * usersPerPage;
-  const indexOfFirstUser = indexOfLastUser - usersPerPage;
-  const currentUsers = filteredUsers.slice(indexOfFirstUser, indexOfLastUser);
-  const totalPages = Math.ceil(filteredUsers.length / usersPerPage);
+  const currentUsers = users;
 
   const paginate = (pageNumber) => {
     setCurrentPage(pageNumber);
@@ -316,7 +310,7 @@ const UserManagement = () => {
         <div className="relative max-w-md">
           <input
             type="text"
-            placeholder="Rechercher par email ou nom..."
+            placeholder="Rechercher par début d'email ou de nom..."
             value={searchQuery}
             onChange={handleSearch}
             className="w-full px-4 py-2 pl-10 bg-white/60 dark:bg-gray-700/60 border border-gray-200 dark:border-gray-600 rounded-full text-gray-900 dark:text-gray-100 focus:ring-2 focus:ring-blue-500 dark:focus:ring-blue-400 focus:border-transparent transition-all duration-300 text-sm placeholder:font-light group-hover:shadow-md"
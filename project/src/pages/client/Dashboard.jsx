@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useMemo } from 'react';
 import { useAuth } from '../../context/AuthContext';
 import { Link } from 'react-router-dom';
-import { getUserRequests } from '../../api/requests';
+import { batchedGet } from '../../api/requests';
 import { PlusCircle, AlertCircle, Eye, Grid, Table, Circle, ChevronRight } from 'lucide-react';
 import RequestCard from '../../components/RequestCard';
 
@@ -19,7 +19,8 @@ const Dashboard = () => {
         return;
       }
       try {
-        const data = await getUserRequests(user.id);
+        // Même aller-retour que les notifications et l'historique de l'assistant (Layout).
+        const data = await batchedGet('/api/requests/');
         console.log('Données des demandes:', data); // For debugging
         if (!Array.isArray(data)) {
           console.error('Les données reçues ne sont pas un tableau:', data);
@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import { Link, useLocation } from 'react-router-dom';
 import { useAuth } from '../../context/AuthContext';
-import { getUserRequests } from '../../api/requests';
+import { batchedGet } from '../../api/requests';
 import StatusBadge from '../../components/StatusBadge';
 import { PlusCircle, Search, AlertTriangle, CheckCircle2, ChevronDown, ChevronUp, X, ListFilter, Archive } from 'lucide-react';
 import { Pie } from 'react-chartjs-2';
@@ -53,7 +53,7 @@ const Demandes = () => {
     try {
       if (user) {
         setLoading(true);
-        const data = await getUserRequests();
+        const data = await batchedGet('/api/requests/');
         console.log('Raw Requests:', data);
         console.log('Feedback Structures:', data.map(r => ({ id: r.id, feedback: r.feedback })));
         setRequests(data);
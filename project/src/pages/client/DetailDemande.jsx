@@ -1,7 +1,7 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { useAuth } from '../../context/AuthContext';
-import { getRequestById, addFeedback, updateRequest } from '../../api/requests';
+import { getRequestById, addFeedback, updateRequest, newIdempotencyKey } from '../../api/requests';
 import StatusBadge from '../../components/StatusBadge';
 import { Clock, ArrowLeft, MessageSquare, AlertTriangle, Star, CheckCircle2, Pencil, X } from 'lucide-react';
 
@@ -53,6 +53,9 @@ const DetailDemande = () => {
     fetchRequest();
   }, [id]);
 
+  // Conservée entre deux envois de l'évaluation tant que l'un n'a pas abouti.
+  const feedbackKey = useRef(newIdempotencyKey());
+
   const handleSubmitFeedback = async (e) => {
     e.preventDefault();
     if (rating === 0) {
@@ -61,7 +64,8 @@ const DetailDemande = () => {
     }
     try {
       setSubmittingFeedback(true);
-      const updatedRequest = await addFeedback(id, rating, feedbackComment);
+      const updatedRequest = await addFeedback(id, rating, feedbackComment, feedbackKey.current);
+      feedbackKey.current = newIdempotencyKey();
       console.log('Updated request:', updatedRequest);
       setRequest(updatedRequest);
       setSuccess('Évaluation envoyée avec succès. La demande a été archivée.');
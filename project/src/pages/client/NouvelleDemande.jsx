@@ -1,7 +1,7 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../../context/AuthContext';
-import { createRequest } from '../../api/requests';
+import { createRequest, newIdempotencyKey } from '../../api/requests';
 import { AlertCircle, CheckCircle2 } from 'lucide-react';
 
 const categories = [
@@ -22,6 +22,9 @@ const NouvelleDemande = () => {
   const [success, setSuccess] = useState('');
   const [loading, setLoading] = useState(false);
 
+  // Conservée entre deux clics sur « Envoyer » tant que la création n'a pas abouti.
+  const idempotencyKey = useRef(newIdempotencyKey());
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     setError('');
@@ -35,9 +38,15 @@ const NouvelleDemande = () => {
     try {
       setLoading(true);
       const requestData = { title, description, category, first_name:user.first_name, };
-      const newRequest = await createRequest(requestData);
+      const newRequest = await createRequest(requestData, idempotencyKey.current);
+      idempotencyKey.current = newIdempotencyKey();
       console.log('New Request:', newRequest);
-      setSuccess('Demande créée avec succès');
+      const duplicates = newRequest.possible_duplicates || [];
+      setSuccess(
+        duplicates.length
+          ? `Demande créée avec succès. Elle ressemble à : ${duplicates.map((d) => `#${d.id} « ${d.title} »`).join(', ')}`
+          : 'Demande créée avec succès'
+      );
 
       setTitle('');
       setDescription('');